@@ -0,0 +1,60 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the per-call overhead that injector.needs adds to a function."""
+
+import timeit
+
+from hotline import injector
+
+NUMBER = 500_000
+
+
+def _per_call_ns(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 1e9
+
+
+def main():
+    injector.set(
+        "secrets",
+        {"nexmo": {"api_key": "key", "api_secret": "secret"}, "database": "db"},
+    )
+    injector.set("nexmo.client", object)
+
+    def plain(sender, to, api_key, api_secret, client):
+        return sender
+
+    injected = injector.needs(
+        "secrets.nexmo.api_key", "secrets.nexmo.api_secret", "nexmo.client"
+    )(plain)
+
+    client = injector.get("nexmo.client")
+
+    baseline = _per_call_ns(lambda: plain("a", "b", "key", "secret", client))
+    resolved = _per_call_ns(lambda: injected("a", "b"))
+    explicit = _per_call_ns(
+        lambda: injected("a", "b", api_key="key", api_secret="secret", client=client)
+    )
+
+    print(f"plain call:              {baseline:8.1f} ns")
+    print(
+        f"needs, injected values:  {resolved:8.1f} ns (+{resolved - baseline:.1f} ns)"
+    )
+    print(
+        f"needs, explicit values:  {explicit:8.1f} ns (+{explicit - baseline:.1f} ns)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures encoding and decoding typical webhook payloads, NCCOs, and
+chatrooms with each installed JSON backend.
+
+Install orjson to compare it with the standard library.
+"""
+
+import timeit
+
+from hotline import chatroom, jsoncodec
+
+NUMBER = 20000
+
+INBOUND_SMS = {
+    "msisdn": "14155550100",
+    "to": "14155550199",
+    "messageId": "0A0000000123ABCD1",
+    "text": "Someone is being harassed near the registration desk.",
+    "type": "text",
+    "keyword": "SOMEONE",
+    "message-timestamp": "2019-05-01 12:00:00",
+}
+
+INBOUND_CALL = {
+    "from": "14155550100",
+    "to": "14155550199",
+    "uuid": "aaaaaaaa-bbbb-cccc-dddd-0123456789ab",
+    "conversation_uuid": "CON-aaaaaaaa-bbbb-cccc-dddd-0123456789ab",
+}
+
+NCCO = [
+    {
+        "action": "talk",
+        "text": (
+            "Thank you for calling the Code of Conduct hotline for PyCon US. "
+            "This will dial all of the hotline members and put you on hold."
+        ),
+    },
+    {
+        "action": "conversation",
+        "name": "CON-aaaaaaaa-bbbb-cccc-dddd-0123456789ab",
+        "eventMethod": "POST",
+        "musicOnHoldUrl": ["https://example.com/hold.mp3"],
+        "startOnEnter": False,
+        "endOnExit": True,
+    },
+]
+
+
+def _chatroom() -> chatroom.Chatroom:
+    room = chatroom.Chatroom()
+    for n in range(6):
+        room.add_user(
+            name=f"Member {n}", number=f"+1415555010{n}", relay="+14155550199"
+        )
+    return room
+
+
+def main():
+    room = _chatroom()
+    payloads = {
+        "inbound sms": INBOUND_SMS,
+        "inbound call": INBOUND_CALL,
+        "ncco": NCCO,
+    }
+
+    print(f"{'backend':<8} {'payload':<14} {'dumps':>10} {'loads':>10}")
+    for backend in jsoncodec.available_backends():
+        jsoncodec.use(backend)
+
+        for name, payload in payloads.items():
+            encoded = jsoncodec.dumps(payload)
+            dumps = timeit.timeit(lambda: jsoncodec.dumps(payload), number=NUMBER)
+            loads = timeit.timeit(lambda: jsoncodec.loads(encoded), number=NUMBER)
+            print(
+                f"{backend:<8} {name:<14} "
+                f"{dumps / NUMBER * 1e6:8.2f}us {loads / NUMBER * 1e6:8.2f}us"
+            )
+
+        serialized = room.serialize()
+        dumps = timeit.timeit(room.serialize, number=NUMBER)
+        loads = timeit.timeit(
+            lambda: chatroom.Chatroom.deserialize(serialized), number=NUMBER
+        )
+        print(
+            f"{backend:<8} {'chatroom':<14} "
+            f"{dumps / NUMBER * 1e6:8.2f}us {loads / NUMBER * 1e6:8.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
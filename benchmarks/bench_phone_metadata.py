@@ -0,0 +1,72 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the resident memory that phonenumbers metadata costs a worker,
+and how long the first parse takes, depending on which regions are loaded.
+
+Each mode runs in a new interpreter, as a new worker would.
+"""
+
+import json
+import subprocess
+import sys
+
+MODES = {
+    "lazy": "pass",
+    "preload US": "lowlevel.preload_number_metadata(['US'])",
+    "preload US, GB, CA, DE": (
+        "lowlevel.preload_number_metadata(['US', 'GB', 'CA', 'DE'])"
+    ),
+    "all regions": "phonenumbers.PhoneMetadata.load_all()",
+}
+
+_PROBE = """
+import json, resource, time
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+import phonenumbers
+from hotline.telephony import lowlevel
+{load}
+loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+lowlevel.normalize_number("(555) 555-1234")
+first_parse = time.perf_counter() - start
+print(json.dumps({{
+    "rss_kb": loaded - before,
+    "first_parse_ms": first_parse * 1000,
+}}))
+"""
+
+
+def _probe(load: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(load=load)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    print(f"{'mode':<24} {'rss':>10} {'first parse':>12}")
+    for mode, load in MODES.items():
+        result = _probe(load)
+        print(
+            f"{mode:<24} {result['rss_kb'] / 1024:8.2f}MB "
+            f"{result['first_parse_ms']:10.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the import time and resident memory of the app and its modules.
+
+Each module is imported in a fresh interpreter, so the numbers are what a cold
+start pays for it. Pass ``--max-import-ms`` and/or ``--max-rss-mb`` to fail
+(exit non-zero) when importing ``hotline.app`` goes over budget. It also fails
+if importing the app loads any of the dependencies that are supposed to be
+imported lazily.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = [
+    "hotline.app",
+    "hotline.auth.webhandlers",
+    "hotline.events.webhandlers",
+    "hotline.telephony.webhandlers",
+    "hotline.telephony.lowlevel",
+    "hotline.database.highlevel",
+    "hotline.pages.webhandlers",
+    "flask",
+    "peewee",
+    "phonenumbers",
+    "firebase_admin.auth",
+    "nexmo",
+    "cmarkgfm",
+]
+
+# Only the code paths that use these should import them.
+LAZY_MODULES = ["firebase_admin", "nexmo", "google.api_core", "grpc", "cmarkgfm"]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{import_statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "loaded": [name for name in {lazy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _probe(module: str) -> dict:
+    import_statement = f"import {module}" if module else "pass"
+    code = _PROBE.format(import_statement=import_statement, lazy=LAZY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def _slowest_imports(module: str, count: int) -> list:
+    """Returns the modules with the highest self time, from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        timings.append((int(self_us), name.strip()))
+
+    return sorted(timings, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-rss-mb", type=float)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = _probe("")
+    results = {module: _probe(module) for module in MODULES}
+
+    print(f"{'module':<32} {'import':>10} {'rss':>10}")
+    for module, result in results.items():
+        rss_mb = (result["rss_kb"] - baseline["rss_kb"]) / 1024
+        print(f"{module:<32} {result['import_ms']:8.1f}ms {rss_mb:8.1f}MB")
+
+    print("\nSlowest imports (self time) for hotline.app:")
+    for self_us, name in _slowest_imports("hotline.app", args.top):
+        print(f"  {self_us / 1000:8.1f}ms {name}")
+
+    app = results["hotline.app"]
+    app_rss_mb = (app["rss_kb"] - baseline["rss_kb"]) / 1024
+    failures = []
+
+    if args.max_import_ms is not None and app["import_ms"] > args.max_import_ms:
+        failures.append(
+            f"hotline.app took {app['import_ms']:.1f}ms to import, "
+            f"budget is {args.max_import_ms:.1f}ms."
+        )
+    if args.max_rss_mb is not None and app_rss_mb > args.max_rss_mb:
+        failures.append(
+            f"hotline.app uses {app_rss_mb:.1f}MB, budget is {args.max_rss_mb:.1f}MB."
+        )
+    if app["loaded"]:
+        failures.append(
+            f"hotline.app eagerly imports {', '.join(app['loaded'])}, "
+            "which should be imported lazily."
+        )
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
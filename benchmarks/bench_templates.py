@@ -0,0 +1,79 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how long a fresh worker takes to load every template, with and
+without the bytecode cache.
+
+Each measurement runs in a new interpreter, as a new worker would, so only
+the bytecode cache on disk carries over between them.
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+
+_PROBE = """
+import json, time
+from hotline import template_cache
+from hotline.app import app
+
+app.jinja_env.bytecode_cache = None
+if {directory!r} is not None:
+    template_cache.init_app(app, directory={directory!r})
+
+timings = {{}}
+for name in app.jinja_env.list_templates(extensions=["html"]):
+    start = time.perf_counter()
+    app.jinja_env.get_template(name)
+    timings[name] = (time.perf_counter() - start) * 1000
+
+print(json.dumps(timings))
+"""
+
+
+def _load_templates(directory) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(directory=directory)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "no cache": _load_templates(None),
+            "empty cache": _load_templates(directory),
+            "warm cache": _load_templates(directory),
+        }
+
+    names = sorted(results["no cache"])
+
+    print(f"{'template':<36}" + "".join(f"{mode:>14}" for mode in results))
+    for name in names:
+        print(
+            f"{name:<36}"
+            + "".join(f"{timings[name]:12.2f}ms" for timings in results.values())
+        )
+    print(
+        f"{'total':<36}"
+        + "".join(f"{sum(timings.values()):12.2f}ms" for timings in results.values())
+    )
+
+
+if __name__ == "__main__":
+    main()
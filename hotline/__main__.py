@@ -13,9 +13,11 @@
 # limitations under the License.
 
 import logging
+import os
 
 import hotline.config
 import hotline.injector
+import hotline.warmup
 from hotline.app import app
 
 logging.basicConfig(level=logging.INFO)
@@ -24,4 +26,9 @@ config = hotline.config.load()
 
 app.secret_key = hotline.injector.get("secrets.session_secret_key")
 
+# When gunicorn is run with --preload this happens once, before the workers
+# are forked, so they share the loaded state.
+if os.environ.get("HOTLINE_PRELOAD"):
+    hotline.warmup.preload(app)
+
 __all__ = ["app"]
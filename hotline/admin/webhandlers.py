@@ -0,0 +1,83 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+import flask
+import hotline.database.ext
+from hotline import compression
+from hotline.auth import super_admin_required
+from hotline.database import highlevel, instrumentation
+from hotline.events import webhandlers as events
+from hotline.telephony import lowlevel
+
+blueprint = flask.Blueprint("admin", __name__, template_folder="templates")
+hotline.database.ext.init_app(blueprint)
+
+
+@blueprint.route("/admin/slow-queries")
+@super_admin_required
+def slow_queries():
+    return flask.render_template(
+        "admin/slow_queries.html",
+        queries=instrumentation.get_slow_queries(),
+        enabled=instrumentation.get_slow_query_log() is not None,
+    )
+
+
+CacheStats = collections.namedtuple(
+    "CacheStats", ["name", "size", "maxsize", "hits", "misses", "hit_rate"]
+)
+
+
+def _lru_cache_stats(name, info) -> CacheStats:
+    lookups = info.hits + info.misses
+    return CacheStats(
+        name=name,
+        size=info.currsize,
+        maxsize=info.maxsize,
+        hits=info.hits,
+        misses=info.misses,
+        hit_rate=info.hits / lookups if lookups else None,
+    )
+
+
+def _cache_stats(name, cache) -> CacheStats:
+    # cachetools caches don't count hits and misses.
+    return CacheStats(
+        name=name,
+        size=len(cache),
+        maxsize=cache.maxsize,
+        hits=None,
+        misses=None,
+        hit_rate=None,
+    )
+
+
+@blueprint.route("/admin/caches")
+@super_admin_required
+def caches():
+    stats = [
+        _lru_cache_stats(name, info)
+        for name, info in lowlevel.number_cache_info().items()
+    ]
+    stats.extend(
+        [
+            _cache_stats("organizers", highlevel._organizer_cache),
+            _cache_stats("event pages", events._rendered_event_pages),
+            _cache_stats("compressed responses", compression._compressed),
+        ]
+    )
+
+    return flask.render_template("admin/caches.html", caches=stats)
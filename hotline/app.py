@@ -18,17 +18,26 @@ import click
 
 import flask
 import flask_talisman
+import hotline.admin.webhandlers
 import hotline.auth.webhandlers
+import hotline.compression
 import hotline.csrf
 import hotline.events.webhandlers
 import hotline.numberadmin.webhandlers
 import hotline.pages.webhandlers
+import hotline.static_assets
+import hotline.telephony.lowlevel
 import hotline.telephony.webhandlers
+import hotline.template_cache
+import hotline.warmup
 import jinja2
 import phonenumbers
 
 app = flask.Flask(__name__)
 hotline.csrf.init_app(app)
+hotline.compression.init_app(app)
+hotline.static_assets.init_app(app)
+hotline.template_cache.init_app(app)
 
 flask_talisman.Talisman(
     app,
@@ -66,15 +75,14 @@ app.register_blueprint(hotline.auth.webhandlers.blueprint)
 app.register_blueprint(hotline.events.webhandlers.blueprint)
 app.register_blueprint(hotline.pages.webhandlers.blueprint)
 app.register_blueprint(hotline.numberadmin.webhandlers.blueprint)
+app.register_blueprint(hotline.admin.webhandlers.blueprint)
+app.register_blueprint(hotline.warmup.blueprint)
 
 
 @app.template_filter("phone")
 def phone_format_filter(s):
     try:
-        number = phonenumbers.parse(s, "US")
-        return phonenumbers.format_number(
-            number, phonenumbers.PhoneNumberFormat.INTERNATIONAL
-        )
+        return hotline.telephony.lowlevel.pretty_print_number(s)
     except phonenumbers.NumberParseException:
         return s
 
@@ -139,6 +147,23 @@ def reset_database():
     create_tables()
 
 
+@app.cli.command()
+@click.argument("directory", required=False)
+def export_static_site(directory):
+    import hotline.injector
+    import hotline.static_export
+    from hotline.database import models
+
+    directory = directory or hotline.injector.get("secrets.static_export.directory")
+
+    with models.db:
+        written = hotline.static_export.export_all(app, directory)
+
+    print(f"Exported to {directory}, {len(written)} file(s) changed:")
+    for path in written:
+        print(" * ", path)
+
+
 @app.cli.command()
 @click.argument("number")
 @click.argument("country")
@@ -154,7 +179,7 @@ def manual_add_number(number, country, features, sms_callback_url):
         number_entry = models.Number()
         number_entry.number = hotline.telephony.lowlevel.normalize_e164_number(number)
         number_entry.country = country
-        number_entry.features = features
+        number_entry.features = models.NumberFeature.from_names(features.split(","))
         number_entry.save()
 
 
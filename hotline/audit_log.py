@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import enum
+from typing import Any
 
 from hotline.database import models
 
@@ -35,19 +36,74 @@ class Kind(enum.IntEnum):
     NUMBER_UNBLOCKED = 13
     CHAT_DELETED = 14
     PARTICIPANT_LEFT_CHAT = 15
+    SHIFT_ADDED = 16
+    SHIFT_REMOVED = 17
+
+
+# Descriptions are rendered from the structured fields stored with each entry
+# when the log is displayed, rather than being formatted when it's written.
+_DESCRIPTIONS = {
+    Kind.MEMBER_ADDED: "{user_name} added {member_name}.",
+    Kind.MEMBER_REMOVED: "{user_name} removed {member_name}.",
+    Kind.EVENT_MODIFIED: "{user_name} {change} the event.",
+    Kind.MEMBER_NUMBER_VERIFIED: "{member_name}'s number was verified {method}.",
+    Kind.SMS_CONVERSATION_STARTED: "A new sms conversation was started. Last 4 digits of number is {reporter_suffix}.",
+    Kind.VOICE_CONVERSATION_STARTED: "A new voice conversation was started. UUID is {conversation}. Last four digits of number is {reporter_suffix}.",
+    Kind.NUMBER_ACQUIRED: "{user_name} acquired the number {number}.",
+    Kind.NUMBER_RELEASED: "{user_name} released the number {number}.",
+    Kind.ORGANIZER_ADDED: "{user_name} invited {organizer_email}.",
+    Kind.ORGANIZER_REMOVED: "{user_name} removed {organizer_email}.",
+    Kind.VOICE_CONVERSATION_ANSWERED: "{member_name} answered {conversation}.",
+    Kind.NUMBER_BLOCKED: "{user_name} blocked the number ending in {number_suffix}.",
+    Kind.NUMBER_UNBLOCKED: "{user_name} unblocked the number ending in {number_suffix}.",
+    Kind.CHAT_DELETED: "{user_name} deleted the chat with the relay number {relay_number}.",
+    Kind.PARTICIPANT_LEFT_CHAT: "{participant_name} has left the chat room with relay number {relay_number}. The last 4 digits of their number is {number_suffix}.",
+    Kind.SHIFT_ADDED: "{user_name} put {member_name} on call from {start} to {end}.",
+    Kind.SHIFT_REMOVED: "{user_name} removed {member_name}'s shift from {start} to {end}.",
+}
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return "unknown"
 
 
 def log(
     kind: Kind,
-    description: str,
     event: models.Event = None,
     user: str = None,
     reporter_number: str = None,
+    **fields: Any,
 ) -> None:
+    """Records an audit log entry.
+
+    Any extra keyword arguments are stored as the entry's metadata and are used
+    to render its description, see :func:`describe`.
+    """
     audit_log = models.AuditLog()
     audit_log.kind = kind
-    audit_log.description = description
     audit_log.event = event
     audit_log.user = user
     audit_log.reporter_number = reporter_number
+    audit_log.metadata = fields or None
     audit_log.save()
+
+
+def describe(entry: models.AuditLog) -> str:
+    """Renders the human-readable description for an audit log entry."""
+    # Entries written before structured metadata was introduced have their
+    # description stored verbatim.
+    if entry.description is not None:
+        return entry.description
+
+    fields = _Fields(entry.metadata or {})
+
+    if entry.reporter_number:
+        fields.setdefault("reporter_suffix", entry.reporter_number[-4:])
+
+    try:
+        template = _DESCRIPTIONS[Kind(entry.kind)]
+    except (KeyError, ValueError):
+        return ""
+
+    return template.format_map(fields)
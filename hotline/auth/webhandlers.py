@@ -14,16 +14,24 @@
 
 import datetime
 import functools
+import hashlib
+import threading
+import time
 
-import firebase_admin
-import firebase_admin.auth
-import firebase_admin.credentials
+import cachetools
 import flask
+import hotline.database.ext
 from hotline import injector
+from hotline.database import highlevel as db
+
+# firebase_admin pulls in grpc and most of google-cloud, which is slow to
+# import. It's imported by the functions that use it so that it's only loaded
+# once a request actually needs it.
 
 _COOKIE_NAME = "auth-session"
 
 blueprint = flask.Blueprint("auth", __name__, template_folder="templates")
+hotline.database.ext.init_app(blueprint)
 
 
 @injector.needs("secrets.firebase")
@@ -35,6 +43,9 @@ def _is_development_auth(firebase):
 
 @injector.provides(needs=["secrets.firebase.service_account"])
 def firebase_admin_app(service_account):
+    import firebase_admin
+    import firebase_admin.credentials
+
     try:
         return firebase_admin.get_app()
     except ValueError:
@@ -44,6 +55,75 @@ def firebase_admin_app(service_account):
     )
 
 
+@injector.provides("auth.session_cache", needs=["secrets.firebase"])
+def _make_session_cache(firebase):
+    # Entries expire after the revocation check interval, which forces the
+    # session cookie to be verified (and checked for revocation) with Firebase
+    # again.
+    return cachetools.TTLCache(
+        maxsize=firebase.get("session_cache_size", 1024),
+        ttl=firebase.get("revocation_check_interval", 60),
+    )
+
+
+_session_cache_lock = threading.Lock()
+
+
+def _session_cache_key(session_cookie: str) -> str:
+    return hashlib.sha256(session_cookie.encode("utf-8")).hexdigest()
+
+
+def _verify_session_cookie(session_cookie, firebase_admin_app) -> dict:
+    """Verifies the session cookie and returns its claims.
+
+    Claims are cached for a short while so that most requests don't need a
+    round trip to Firebase to check whether the session has been revoked.
+    Logging out is recorded in the database, which is checked on every
+    request, so every worker stops accepting the session right away. Sessions
+    revoked some other way, such as from the Firebase console, are accepted
+    until their claims expire from the cache, which takes at most
+    revocation_check_interval seconds (60 by default).
+    """
+    if not session_cookie:
+        raise ValueError("No session cookie.")
+
+    session_cache = injector.get("auth.session_cache")
+    key = _session_cache_key(session_cookie)
+
+    with _session_cache_lock:
+        claims = session_cache.get(key)
+
+    if claims is None or claims["exp"] <= time.time():
+        import firebase_admin.auth
+
+        claims = firebase_admin.auth.verify_session_cookie(
+            session_cookie, check_revoked=True, app=firebase_admin_app
+        )
+
+        with _session_cache_lock:
+            session_cache[key] = claims
+
+    revoked = db.get_sessions_revoked(claims["user_id"])
+    auth_time = datetime.datetime.utcfromtimestamp(claims["auth_time"])
+
+    if revoked is not None and auth_time < revoked:
+        _evict_session(session_cookie)
+        raise ValueError("Session revoked.")
+
+    # Callers modify the claims, so don't hand out the cached copy.
+    return dict(claims)
+
+
+def _evict_session(session_cookie) -> None:
+    if not session_cookie:
+        return
+
+    session_cache = injector.get("auth.session_cache")
+
+    with _session_cache_lock:
+        session_cache.pop(_session_cache_key(session_cookie), None)
+
+
 def auth_required(f):
     @functools.wraps(f)
     def auth_required_view(*args, **kwargs):
@@ -60,10 +140,10 @@ def auth_required(f):
         firebase_admin_app = injector.get("firebase_admin_app")
         session_cookie = flask.request.cookies.get(_COOKIE_NAME)
 
+        import firebase_admin.auth
+
         try:
-            decoded_claims = firebase_admin.auth.verify_session_cookie(
-                session_cookie, check_revoked=True, app=firebase_admin_app
-            )
+            decoded_claims = _verify_session_cookie(session_cookie, firebase_admin_app)
         except ValueError as exc:
             # Session cookie is unavailable or invalid. Force user to login.
             return flask.redirect(flask.url_for("auth.login", next=flask.request.path))
@@ -106,6 +186,8 @@ def config(config):
 @blueprint.route("/auth/token-login", methods=["POST"])
 @injector.needs("firebase_admin_app")
 def token_login(firebase_admin_app):
+    import firebase_admin.auth
+
     id_token = flask.request.headers["Authentication"].split(" ")[1]
 
     # Set session expiration to 5 days.
@@ -133,11 +215,15 @@ def token_login(firebase_admin_app):
 @blueprint.route("/auth/logout")
 @injector.needs("firebase_admin_app")
 def logout(firebase_admin_app):
+    import firebase_admin.auth
+
     session_cookie = flask.request.cookies.get(_COOKIE_NAME)
 
     response = flask.make_response(flask.redirect(flask.url_for("auth.login")))
     response.set_cookie(_COOKIE_NAME, expires=0)
 
+    _evict_session(session_cookie)
+
     try:
         decoded_claims = firebase_admin.auth.verify_session_cookie(
             session_cookie, app=firebase_admin_app
@@ -145,6 +231,7 @@ def logout(firebase_admin_app):
         firebase_admin.auth.revoke_refresh_tokens(
             decoded_claims["sub"], app=firebase_admin_app
         )
+        db.revoke_sessions(decoded_claims["user_id"])
     except ValueError:
         # The token was invalid for one reason or another. Doesn't matter,
         # just clear the session and redirect.
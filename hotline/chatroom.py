@@ -28,12 +28,13 @@ function that can send messages. This keeps it decoupled from any particular
 way of sending or receiving messages.
 """
 
-import json
 from collections import namedtuple
 from typing import Any, Optional
 
 from typing_extensions import Protocol
 
+from hotline import jsoncodec
+
 _User = namedtuple("_User", ["name", "number", "relay"])
 
 
@@ -78,11 +79,16 @@ class Chatroom:
         return f"<Chatroom users=[{', '.join(users)}]>"
 
     def serialize(self) -> str:
-        return json.dumps({"__class__": self.__class__.__name__, "_users": self._users})
+        # Not every JSON backend serializes namedtuples, so store the users
+        # as plain lists.
+        users = {key: list(user) for key, user in self._users.items()}
+        return jsoncodec.dumps(
+            {"__class__": self.__class__.__name__, "_users": users}
+        ).decode("utf-8")
 
     @classmethod
     def deserialize(cls, data: str):
-        loaded_data = json.loads(data)
+        loaded_data = jsoncodec.loads(data)
         instance = cls()
         instance._users = {
             key: _User(*value) for key, value in loaded_data["_users"].items()
@@ -0,0 +1,121 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compresses text responses with brotli, if it's installed, or gzip.
+
+Responses with a strong ETag (cached pages and static files) are the same
+every time, so their compressed bodies are cached by ETag.
+"""
+
+import gzip
+import threading
+from typing import Optional
+
+import cachetools
+import flask
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Smaller responses don't get meaningfully smaller, and can even grow.
+MIN_SIZE = 500
+
+# Static files are read into memory to be compressed, so large ones are left
+# alone.
+MAX_SIZE = 1024 * 1024
+
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+_compressed = cachetools.LRUCache(maxsize=128)
+_compressed_lock = threading.Lock()
+
+
+def _choose_encoding(accept_encoding) -> Optional[str]:
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _compress_response(response: flask.Response) -> flask.Response:
+    if not response.mimetype.startswith(_COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    if (
+        response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or flask.request.method == "HEAD"
+    ):
+        return response
+
+    encoding = _choose_encoding(flask.request.accept_encodings)
+    if encoding is None:
+        return response
+
+    # Static files are streamed from disk.
+    if response.direct_passthrough:
+        if response.content_length is None or response.content_length > MAX_SIZE:
+            return response
+        response.direct_passthrough = False
+
+    etag, weak = response.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+
+    compressed = None
+    if key is not None:
+        with _compressed_lock:
+            compressed = _compressed.get(key)
+
+    if compressed is None:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+
+        compressed = _compress(data, encoding)
+
+        if key is not None:
+            with _compressed_lock:
+                _compressed[key] = compressed
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body isn't byte-for-byte the same as the uncompressed
+    # one, so the ETag can only be a weak validator. If-None-Match uses weak
+    # comparison, so conditional requests still work.
+    if etag:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def init_app(app: flask.Flask) -> None:
+    app.after_request(_compress_response)
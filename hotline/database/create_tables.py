@@ -21,11 +21,15 @@ models = [
     db.Number,
     db.Event,
     db.EventMember,
+    db.OnCallShift,
     db.EventOrganizer,
+    db.RevokedSession,
     db.SmsChat,
     db.SmsChatConnection,
     db.AuditLog,
     db.BlockList,
+    db.Conversation,
+    db.CallLeg,
 ]
 
 
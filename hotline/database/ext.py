@@ -15,14 +15,23 @@
 """Flask extension for database stuff."""
 
 
-from hotline.database import models
+import flask
+from hotline import injector
+from hotline.database import instrumentation, models
 
 
 def _db_connect():
+    if injector.get("secrets.query_stats", None) is not None:
+        instrumentation.start()
+
     models.db.connect()
 
 
 def _db_close(response):
+    stats = instrumentation.stop()
+    if stats is not None:
+        instrumentation.report(stats, flask.request.path)
+
     if not models.db.is_closed():
         models.db.close()
 
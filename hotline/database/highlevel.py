@@ -14,18 +14,25 @@
 
 """High-level database operations."""
 
-from typing import Iterable, List, Optional
+import collections
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+import cachetools
 import hotline.chatroom
 import peewee
-import playhouse.db_url
 from hotline import audit_log, injector
-from hotline.database import models
+from hotline.database import instrumentation, models
 
 
 @injector.needs("secrets.database")
 def initialize_db(database):
-    models.db.initialize(playhouse.db_url.connect(database))
+    models.db.initialize(instrumentation.connect(database))
+
+    slow_query_log = injector.get("secrets.slow_query_log", None)
+    if slow_query_log is not None:
+        instrumentation.enable_slow_query_log(**slow_query_log)
 
 
 def list_events_for_user(user_id: str) -> Iterable[models.Event]:
@@ -53,11 +60,81 @@ def check_if_user_is_organizer(event_slug, user_id) -> Optional[models.Event]:
         return None
 
 
+# Maps user ids to the slugs, ids and versions of the events they organize, so
+# that moving between an event's management pages doesn't repeat the organizer
+# join. This is per-process, so removing an organizer bumps the event's
+# version, and entries are only used while the version still matches.
+_organizer_cache = cachetools.LRUCache(maxsize=1024)
+_organizer_cache_lock = threading.Lock()
+
+
+def _invalidate_organizer_cache(user_id: Optional[str]) -> None:
+    with _organizer_cache_lock:
+        _organizer_cache.pop(user_id, None)
+
+
+def get_event_for_organizer(event_slug, user_id) -> Optional[models.Event]:
+    """Like check_if_user_is_organizer, but remembers which events the user
+    organizes."""
+    with _organizer_cache_lock:
+        cached = _organizer_cache.get(user_id, {}).get(event_slug)
+
+    if cached is not None:
+        event_id, version = cached
+
+        try:
+            event = models.Event.get_by_id(event_id)
+        except peewee.DoesNotExist:
+            event = None
+
+        # The event has been changed since it was cached, maybe by another
+        # process removing the organizer, so check again.
+        if event is not None and event.slug == event_slug and event.version == version:
+            return event
+
+    event = check_if_user_is_organizer(event_slug, user_id)
+
+    if event is not None:
+        with _organizer_cache_lock:
+            events = _organizer_cache.get(user_id, {})
+            events[event_slug] = (event.id, event.version)
+            _organizer_cache[user_id] = events
+
+    return event
+
+
+def prime_organizer_cache() -> None:
+    """Loads every organizer's events into the organizer cache with a single
+    query."""
+    query = models.EventOrganizer.select(
+        models.EventOrganizer.user_id,
+        models.Event.slug,
+        models.Event.id,
+        models.Event.version,
+    ).join(models.Event)
+
+    organizers: dict = {}
+    for row in query.where(models.EventOrganizer.user_id.is_null(False)).tuples():
+        user_id, slug, event_id, version = row
+        organizers.setdefault(user_id, {})[slug] = (event_id, version)
+
+    with _organizer_cache_lock:
+        _organizer_cache.update(organizers)
+
+
 def new_event() -> models.Event:
     event = models.Event()
     return event
 
 
+def get_number_countries() -> Set[str]:
+    """Returns the countries of the hotline's numbers and events."""
+    numbers = models.Number.select(models.Number.country).distinct()
+    events = models.Event.select(models.Event.country).distinct()
+
+    return {country for country, in numbers.union(events).tuples() if country}
+
+
 def get_event_by_slug(event_slug: str) -> Optional[models.Event]:
     try:
         return models.Event.get(models.Event.slug == event_slug)
@@ -85,6 +162,8 @@ def add_event_organizer(event: models.Event, user: dict) -> None:
     organizer_entry.user_email = user["email"]
     organizer_entry.save()
 
+    _invalidate_organizer_cache(user["user_id"])
+
 
 def add_pending_event_organizer(event: models.Event, user_email: str) -> None:
     organizer_entry = models.EventOrganizer()
@@ -108,19 +187,52 @@ def accept_organizer_invitation(
     organizer_entry.user_name = user["name"]
     organizer_entry.save()
 
+    _invalidate_organizer_cache(user["user_id"])
+
     return organizer_entry.event
 
 
 def remove_event_organizer(organizer_id: str) -> None:
-    models.EventOrganizer.get(
+    organizer_entry = models.EventOrganizer.get(
         models.EventOrganizer.id == int(organizer_id)
-    ).delete_instance()
+    )
+    with models.db.atomic():
+        organizer_entry.delete_instance()
+        # Other processes may have cached the organizer's access to the event.
+        models.Event.update(version=models.Event.version + 1).where(
+            models.Event.id == organizer_entry.event_id
+        ).execute()
+
+    _invalidate_organizer_cache(organizer_entry.user_id)
 
 
 def get_event_organizer(organizer_id: str) -> models.EventOrganizer:
     return models.EventOrganizer.get_by_id(organizer_id)
 
 
+def revoke_sessions(user_id: str) -> None:
+    # Session claims only record the time to the second.
+    revoked = datetime.datetime.utcnow().replace(microsecond=0)
+
+    with models.db.atomic():
+        updated = (
+            models.RevokedSession.update(revoked=revoked)
+            .where(models.RevokedSession.user_id == user_id)
+            .execute()
+        )
+
+        if not updated:
+            models.RevokedSession.create(user_id=user_id, revoked=revoked)
+
+
+def get_sessions_revoked(user_id: str) -> Optional[datetime.datetime]:
+    """Returns when the user's sessions were last revoked, if ever."""
+    try:
+        return models.RevokedSession.get_by_id(user_id).revoked
+    except peewee.DoesNotExist:
+        return None
+
+
 def get_event_members(event) -> Iterable[models.EventMember]:
     query = event.members
     yield from query
@@ -131,6 +243,60 @@ def get_verified_event_members(event) -> Iterable[models.EventMember]:
     yield from query
 
 
+def get_on_call_event_members(
+    event, now: Optional[datetime.datetime] = None
+) -> List[models.EventMember]:
+    """Returns the verified members who are on call now. If nobody is on
+    call, every verified member is returned."""
+    if now is None:
+        now = datetime.datetime.utcnow()
+
+    query = (
+        models.EventMember.select()
+        .join(models.OnCallShift)
+        .where(
+            models.OnCallShift.event == event,
+            models.OnCallShift.start <= now,
+            models.OnCallShift.end > now,
+            models.EventMember.verified == True,  # noqa
+        )
+        .distinct()
+    )
+    members = list(query)
+
+    if not members:
+        members = list(get_verified_event_members(event))
+
+    return members
+
+
+def get_shifts_for_event(event: models.Event) -> Iterable[models.OnCallShift]:
+    query = (
+        models.OnCallShift.select(models.OnCallShift, models.EventMember)
+        .join(models.EventMember)
+        .where(models.OnCallShift.event == event)
+        .order_by(models.OnCallShift.start, models.OnCallShift.end)
+    )
+    yield from query
+
+
+def add_shift(
+    event: models.Event,
+    member: models.EventMember,
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> models.OnCallShift:
+    return models.OnCallShift.create(event=event, member=member, start=start, end=end)
+
+
+def remove_shift(event: models.Event, shift_id: str) -> models.OnCallShift:
+    shift = models.OnCallShift.get(
+        models.OnCallShift.id == int(shift_id), models.OnCallShift.event == event
+    )
+    shift.delete_instance()
+    return shift
+
+
 def new_event_member(event: models.Event) -> models.EventMember:
     member = models.EventMember()
     member.event = event
@@ -139,7 +305,9 @@ def new_event_member(event: models.Event) -> models.EventMember:
 
 
 def remove_event_member(member_id: str) -> None:
-    models.EventMember.get(models.EventMember.id == int(member_id)).delete_instance()
+    models.EventMember.get(models.EventMember.id == int(member_id)).delete_instance(
+        recursive=True
+    )
 
 
 def get_member(member_id: str) -> models.EventMember:
@@ -153,6 +321,28 @@ def get_member_by_number(member_number) -> Optional[models.EventMember]:
         return None
 
 
+def get_member_and_event_by_numbers(
+    member_number: str, event_number: str
+) -> Optional[Tuple[models.EventMember, models.Event]]:
+    """Finds the member with the given number in the event with the given
+    number. Members can be part of multiple events, so both are needed to
+    find the right member."""
+    member = (
+        models.EventMember.select(models.EventMember, models.Event)
+        .join(models.Event)
+        .where(
+            models.Event.primary_number == event_number,
+            models.EventMember.number == member_number,
+        )
+        .first()
+    )
+
+    if member is None:
+        return None
+
+    return member, member.event
+
+
 def find_pending_member_by_number(member_number) -> Optional[models.EventMember]:
     try:
         return models.EventMember.get(
@@ -163,7 +353,15 @@ def find_pending_member_by_number(member_number) -> Optional[models.EventMember]
         return None
 
 
-def find_unused_event_numbers(country: str) -> List[models.Number]:
+def _has_features(features: models.NumberFeature):
+    return models.Number.features.bin_and(features) == features
+
+
+def find_unused_event_numbers(
+    country: str, features: models.NumberFeature = models.NumberFeature.VOICE
+) -> List[models.Number]:
+    """Finds unused event numbers that have at least the given features,
+    preferring ones that can also send SMS."""
     return list(
         models.Number.select()
         .join(
@@ -174,6 +372,8 @@ def find_unused_event_numbers(country: str) -> List[models.Number]:
         .where(models.Event.primary_number_id.is_null())
         .where(models.Number.pool == models.NumberPool.EVENT)
         .where(models.Number.country == country)
+        .where(_has_features(features))
+        .order_by(models.Number.features.bin_and(models.NumberFeature.SMS).desc())
         .limit(5)
     )
 
@@ -224,6 +424,7 @@ def get_unused_relay_numbers_for_event(
         models.Number.select(models.Number.number)
         .where(models.Number.pool == models.NumberPool.SMS_RELAY)
         .where(models.Number.country == event.country)
+        .where(_has_features(models.NumberFeature.SMS))
         .where(models.Number.number.not_in(used_relay_numbers))
         .limit(limit)
     )
@@ -297,9 +498,10 @@ def remove_event_chat(event: models.Event, chat_id: str, user: dict):
 
     audit_log.log(
         kind=audit_log.Kind.CHAT_DELETED,
-        description=f"{user['name']} deleted the chat with the relay number {item.relay_number}.",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        relay_number=item.relay_number,
     )
 
 
@@ -338,9 +540,10 @@ def create_blocklist_item(event: models.Event, log_id: str, user: dict):
 
     audit_log.log(
         kind=audit_log.Kind.NUMBER_BLOCKED,
-        description=f"{user['name']} blocked the number ending in {log.reporter_number[-4:]}.",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        number_suffix=log.reporter_number[-4:],
     )
 
 
@@ -353,9 +556,10 @@ def remove_blocklist_item(event: models.Event, blocklist_id: str, user: dict):
 
     audit_log.log(
         kind=audit_log.Kind.NUMBER_UNBLOCKED,
-        description=f"{user['name']} unblocked the number ending in {item.number[-4:]}.",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        number_suffix=item.number[-4:],
     )
 
 
@@ -367,3 +571,339 @@ def check_if_blocked(event: models.Event, number: str):
         return True
     except peewee.DoesNotExist:
         return False
+
+
+def create_conversation(
+    event: models.Event, conversation_uuid: str, call_uuid: str, answer_url: str
+) -> models.Conversation:
+    return models.Conversation.create(
+        uuid=conversation_uuid,
+        event=event,
+        call_uuid=call_uuid,
+        answer_url=answer_url,
+        rotation=event.conversations.count(),
+    )
+
+
+def get_conversation(conversation_uuid: str) -> Optional[models.Conversation]:
+    return models.Conversation.get_or_none(
+        models.Conversation.uuid == conversation_uuid
+    )
+
+
+def get_conversation_by_call(call_uuid: str) -> Optional[models.Conversation]:
+    return models.Conversation.get_or_none(models.Conversation.call_uuid == call_uuid)
+
+
+def finish_conversation(conversation: models.Conversation) -> None:
+    conversation.finished = datetime.datetime.utcnow()
+    conversation.save(only=[models.Conversation.finished])
+
+
+# How long a claim on a conversation lasts, in case the worker holding it dies
+# without releasing it.
+DIALING_CLAIM_DURATION = datetime.timedelta(minutes=1)
+
+
+def _try_claim_conversation(conversation_uuid: str) -> bool:
+    now = datetime.datetime.utcnow()
+    query = models.Conversation.update(
+        dialing_until=now + DIALING_CLAIM_DURATION, redial=False
+    ).where(
+        models.Conversation.uuid == conversation_uuid,
+        models.Conversation.dialing_until.is_null()
+        | (models.Conversation.dialing_until < now),
+    )
+    return query.execute() > 0
+
+
+def claim_conversation(conversation_uuid: str) -> bool:
+    """Claims the conversation for dialing members into it, so that only one
+    worker does at a time.
+
+    If another worker has claimed it, that worker is asked to check the
+    conversation again before releasing it, and False is returned.
+    """
+    if _try_claim_conversation(conversation_uuid):
+        return True
+
+    models.Conversation.update(redial=True).where(
+        models.Conversation.uuid == conversation_uuid
+    ).execute()
+
+    # The other worker may have released the conversation before the request
+    # to check it again was made.
+    return _try_claim_conversation(conversation_uuid)
+
+
+def release_conversation(conversation_uuid: str, force: bool = False) -> bool:
+    """Releases the claim on the conversation. If another worker asked for
+    the conversation to be checked again, the claim is kept and False is
+    returned, unless force is set."""
+    query = models.Conversation.update(dialing_until=None).where(
+        models.Conversation.uuid == conversation_uuid
+    )
+
+    if not force:
+        query = query.where(models.Conversation.redial == False)  # noqa
+
+    if query.execute() > 0:
+        return True
+
+    # Keep the claim so the caller can check the conversation again.
+    dialing_until = datetime.datetime.utcnow() + DIALING_CLAIM_DURATION
+    models.Conversation.update(dialing_until=dialing_until, redial=False).where(
+        models.Conversation.uuid == conversation_uuid
+    ).execute()
+
+    return False
+
+
+# Nexmo's events for a call can go missing, so calls and conversations older
+# than this are assumed to be over.
+ACTIVE_CALL_WINDOW = datetime.timedelta(hours=1)
+
+
+def get_waiting_conversations(limit: Optional[int] = None) -> List[models.Conversation]:
+    """Returns the conversations where no member has answered and no member
+    is being called, oldest first."""
+    since = datetime.datetime.utcnow() - ACTIVE_CALL_WINDOW
+
+    # Checked per conversation, so that only the conversation's own call legs
+    # are looked at.
+    busy = models.CallLeg.select(peewee.SQL("1")).where(
+        models.CallLeg.conversation_uuid == models.Conversation.uuid,
+        models.CallLeg.status.in_(["started", "ringing"])
+        | models.CallLeg.answered.is_null(False),
+        models.CallLeg.created > since,
+    )
+
+    query = (
+        models.Conversation.select()
+        .where(
+            models.Conversation.finished.is_null(),
+            models.Conversation.created > since,
+            ~peewee.fn.EXISTS(busy),
+        )
+        .order_by(models.Conversation.created)
+        .limit(limit)
+    )
+
+    return list(query)
+
+
+def add_call_leg(
+    event: models.Event, conversation_uuid: str, member_number: str, call_uuid: str
+) -> models.CallLeg:
+    return models.CallLeg.create(
+        uuid=call_uuid,
+        conversation_uuid=conversation_uuid,
+        event=event,
+        member_number=member_number,
+    )
+
+
+CallEvent = collections.namedtuple(
+    "CallEvent", ["call_uuid", "status", "timestamp", "duration"]
+)
+
+# The order that a call's statuses progress in. Nexmo's call events can arrive
+# out of order, so a leg's status only ever moves forward.
+_CALL_LEG_STATUS_ORDER = ["started", "ringing", "answered"]
+
+
+def _preceding_call_leg_statuses(status: str) -> List[str]:
+    if status in models.CallLeg.FINISHED_STATUSES:
+        return _CALL_LEG_STATUS_ORDER
+    if status in _CALL_LEG_STATUS_ORDER:
+        return _CALL_LEG_STATUS_ORDER[: _CALL_LEG_STATUS_ORDER.index(status)]
+    return []
+
+
+def _call_leg_timestamp_field(status: str) -> Optional[peewee.Field]:
+    if status in models.CallLeg.FINISHED_STATUSES:
+        return models.CallLeg.ended
+    if status == "ringing":
+        return models.CallLeg.ringing
+    if status == "answered":
+        return models.CallLeg.answered
+    return None
+
+
+def update_call_leg_status(call_uuid: str, status: str) -> bool:
+    """Records a call leg's new status. Returns False if the call isn't a leg,
+    or the status is stale."""
+    preceding = _preceding_call_leg_statuses(status)
+
+    if not preceding:
+        return False
+
+    values = {models.CallLeg.status: status}
+    timestamp_field = _call_leg_timestamp_field(status)
+    if timestamp_field is not None:
+        values[timestamp_field] = datetime.datetime.utcnow()
+
+    query = models.CallLeg.update(values).where(
+        models.CallLeg.uuid == call_uuid, models.CallLeg.status.in_(preceding)
+    )
+
+    return query.execute() > 0
+
+
+def record_call_events(events: Iterable[CallEvent]) -> int:
+    """Applies a batch of Nexmo's call events to the legs they're for, with
+    one update per leg. Returns the number of legs updated.
+
+    Each timestamp is only recorded the first time a leg reaches that state,
+    and the updates are conditional, so they never clobber states that the
+    voice handlers have recorded in the meantime.
+    """
+    legs: Dict[str, dict] = {}
+
+    for event in sorted(events, key=lambda event: event.timestamp):
+        preceding = _preceding_call_leg_statuses(event.status)
+        if not preceding:
+            continue
+
+        leg = legs.setdefault(event.call_uuid, {"status": None, "timestamps": {}})
+
+        if leg["status"] is None or leg["status"] in preceding:
+            leg["status"] = event.status
+
+        timestamp_field = _call_leg_timestamp_field(event.status)
+        if timestamp_field is not None:
+            leg["timestamps"].setdefault(timestamp_field, event.timestamp)
+
+        if event.duration is not None:
+            leg["timestamps"][models.CallLeg.duration] = event.duration
+
+    updated = 0
+
+    with models.db.atomic():
+        for call_uuid, leg in legs.items():
+            values = {
+                field: peewee.fn.COALESCE(field, value)
+                for field, value in leg["timestamps"].items()
+            }
+            values[models.CallLeg.status] = peewee.Case(
+                None,
+                [
+                    (
+                        models.CallLeg.status.in_(
+                            _preceding_call_leg_statuses(leg["status"])
+                        ),
+                        leg["status"],
+                    )
+                ],
+                models.CallLeg.status,
+            )
+
+            updated += (
+                models.CallLeg.update(values)
+                .where(models.CallLeg.uuid == call_uuid)
+                .execute()
+            )
+
+    return updated
+
+
+def get_call_leg(call_uuid: str) -> Optional[models.CallLeg]:
+    return models.CallLeg.get_or_none(models.CallLeg.uuid == call_uuid)
+
+
+def get_dialed_numbers(conversation_uuid: str) -> Set[str]:
+    query = models.CallLeg.select(models.CallLeg.member_number).where(
+        models.CallLeg.conversation_uuid == conversation_uuid
+    )
+    return {leg.member_number for leg in query}
+
+
+def count_active_call_legs() -> int:
+    """Counts the calls to members that are ringing or in progress, across
+    every event."""
+    return (
+        models.CallLeg.select()
+        .where(
+            models.CallLeg.status.in_(["started", "ringing", "answered"]),
+            models.CallLeg.created > datetime.datetime.utcnow() - ACTIVE_CALL_WINDOW,
+        )
+        .count()
+    )
+
+
+def count_answered_call_legs(conversation_uuid: str) -> int:
+    return (
+        models.CallLeg.select()
+        .where(
+            models.CallLeg.conversation_uuid == conversation_uuid,
+            models.CallLeg.answered.is_null(False),
+        )
+        .count()
+    )
+
+
+def get_unanswered_call_legs(conversation_uuid: str) -> List[models.CallLeg]:
+    """Returns the legs of the conversation that are still ringing."""
+    query = models.CallLeg.select().where(
+        models.CallLeg.conversation_uuid == conversation_uuid,
+        models.CallLeg.status.in_(["started", "ringing"]),
+    )
+    return list(query)
+
+
+CallMetrics = collections.namedtuple(
+    "CallMetrics",
+    ["calls", "answered_calls", "average_answer_time", "average_ring_time"],
+)
+
+
+def _seconds_between(start, end) -> peewee.Node:
+    """An SQL expression for the number of seconds from start to end."""
+    if isinstance(models.db.obj, peewee.SqliteDatabase):
+        return (peewee.fn.julianday(end) - peewee.fn.julianday(start)) * 86400
+    return peewee.fn.date_part("epoch", end - start)
+
+
+def get_call_metrics(event: models.Event) -> CallMetrics:
+    """Summarizes how quickly the event's hotline is answered.
+
+    The answer time is how long reporters waited for the first member to
+    answer, and the ring time is how long members' phones rang before they
+    answered or the call ended. Both are computed by the database, so that
+    the event's call legs aren't loaded.
+    """
+    ring_time = _seconds_between(
+        models.CallLeg.ringing,
+        peewee.fn.COALESCE(models.CallLeg.answered, models.CallLeg.ended),
+    )
+    conversations = (
+        models.CallLeg.select(
+            models.CallLeg.conversation_uuid,
+            peewee.fn.MIN(models.CallLeg.created).alias("started"),
+            peewee.fn.MIN(models.CallLeg.answered).alias("answered"),
+            peewee.fn.SUM(ring_time).alias("ring_time"),
+            peewee.fn.COUNT(ring_time).alias("rings"),
+        )
+        .where(models.CallLeg.event == event)
+        .group_by(models.CallLeg.conversation_uuid)
+        .alias("conversations")
+    )
+
+    query = models.CallLeg.select(
+        peewee.fn.COUNT(conversations.c.conversation_uuid),
+        peewee.fn.COUNT(conversations.c.answered),
+        peewee.fn.AVG(
+            _seconds_between(conversations.c.started, conversations.c.answered)
+        ),
+        peewee.fn.SUM(conversations.c.ring_time),
+        peewee.fn.SUM(conversations.c.rings),
+    ).from_(conversations)
+
+    calls, answered_calls, average_answer_time, ring_time, rings = query.tuples().get()
+
+    return CallMetrics(
+        calls=calls,
+        answered_calls=answered_calls,
+        average_answer_time=average_answer_time,
+        average_ring_time=float(ring_time) / int(rings) if rings else None,
+    )
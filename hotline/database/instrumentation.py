@@ -0,0 +1,208 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Counts and times the SQL queries issued while handling a request.
+
+Databases created with :func:`connect` record every query into the current
+thread's :class:`QueryStats`, if there is one. Recording is started and
+stopped per-request by :mod:`hotline.database.ext`, so outside of a request
+the only overhead is a thread-local lookup.
+
+Queries slower than a threshold can also be captured, along with their query
+plan, into a bounded in-memory log by :func:`enable_slow_query_log`.
+"""
+
+import collections
+import datetime
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import peewee
+import playhouse.db_url
+from hotline import injector
+
+_local = threading.local()
+_instrumented_classes: Dict[type, type] = {}
+
+# Statements that EXPLAIN can describe without executing them.
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+SlowQuery = collections.namedtuple(
+    "SlowQuery", ["timestamp", "sql", "params", "duration", "plan"]
+)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Queries are counted by their SQL, without parameters, so that
+        # repeated lookups of the same shape can be detected.
+        self.shapes: collections.Counter = collections.Counter()
+
+    def record(self, sql: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.shapes[sql] += 1
+
+    def repeated_queries(self, threshold: int) -> List[Tuple[str, int]]:
+        return [
+            (sql, count) for sql, count in self.shapes.items() if count >= threshold
+        ]
+
+
+def start() -> None:
+    _local.stats = QueryStats()
+
+
+def stop() -> Optional[QueryStats]:
+    stats = getattr(_local, "stats", None)
+    _local.stats = None
+    return stats
+
+
+class SlowQueryLog:
+    def __init__(self, threshold: float, size: int):
+        self.threshold = threshold
+        self.entries: Deque[SlowQuery] = collections.deque(maxlen=size)
+
+    def record(self, database, sql: str, params, duration: float) -> None:
+        try:
+            plan = database.explain(sql, params)
+        except Exception as exc:
+            plan = f"Unable to explain query: {exc}"
+
+        self.entries.appendleft(
+            SlowQuery(
+                timestamp=datetime.datetime.utcnow(),
+                sql=sql,
+                # Only record the types of the parameters, as the values are
+                # often phone numbers.
+                params=[type(param).__name__ for param in params or ()],
+                duration=duration,
+                plan=plan,
+            )
+        )
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+
+
+def enable_slow_query_log(threshold_ms: float = 100, size: int = 50) -> None:
+    global _slow_query_log
+    _slow_query_log = SlowQueryLog(threshold=threshold_ms / 1000, size=size)
+
+
+def disable_slow_query_log() -> None:
+    global _slow_query_log
+    _slow_query_log = None
+
+
+def get_slow_query_log() -> Optional[SlowQueryLog]:
+    return _slow_query_log
+
+
+def get_slow_queries() -> List[SlowQuery]:
+    if _slow_query_log is None:
+        return []
+    return list(_slow_query_log.entries)
+
+
+# The mixin is only ever combined with a database class, by _instrumented.
+if TYPE_CHECKING:  # pragma: no cover
+    _DatabaseBase = peewee.Database
+else:
+    _DatabaseBase = object
+
+
+class InstrumentedDatabaseMixin(_DatabaseBase):
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        stats = getattr(_local, "stats", None)
+        slow_query_log = _slow_query_log
+
+        if stats is None and slow_query_log is None:
+            return super().execute_sql(sql, params, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            cursor = super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            if stats is not None:
+                stats.record(sql, duration)
+
+        if slow_query_log is not None and duration >= slow_query_log.threshold:
+            slow_query_log.record(self, sql, params, duration)
+
+        return cursor
+
+    def explain(self, sql: str, params=None) -> str:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return ""
+
+        if isinstance(self, peewee.SqliteDatabase):
+            explain_sql = f"EXPLAIN QUERY PLAN {sql}"
+        else:
+            explain_sql = f"EXPLAIN {sql}"
+
+        # Bypass the instrumentation so that explaining a slow query can't
+        # itself be recorded.
+        cursor = super().execute_sql(explain_sql, params)
+        return "\n".join(
+            " ".join(str(column) for column in row) for row in cursor.fetchall()
+        )
+
+
+def _instrumented(database_class: type) -> type:
+    if database_class not in _instrumented_classes:
+        _instrumented_classes[database_class] = type(
+            f"Instrumented{database_class.__name__}",
+            (InstrumentedDatabaseMixin, database_class),
+            {},
+        )
+    return _instrumented_classes[database_class]
+
+
+def connect(url: str):
+    """Like ``playhouse.db_url.connect``, but returns an instrumented
+    database."""
+    parsed = urlparse(url)
+    database_class = playhouse.db_url.schemes.get(parsed.scheme)
+
+    if database_class is None:
+        raise RuntimeError(f'Unrecognized or unsupported scheme: "{parsed.scheme}".')
+
+    connect_kwargs = playhouse.db_url.parseresult_to_dict(parsed)
+    return _instrumented(database_class)(**connect_kwargs)
+
+
+def report(stats: QueryStats, path: str) -> None:
+    """Logs requests that issued too many queries, spent too long in the
+    database, or repeated the same query enough times to look like an N+1."""
+    max_queries = injector.get("secrets.query_stats.max_queries", 20)
+    max_duration_ms = injector.get("secrets.query_stats.max_duration_ms", 250)
+    repeated_threshold = injector.get("secrets.query_stats.repeated_threshold", 5)
+
+    duration_ms = stats.duration * 1000
+
+    if stats.count > max_queries or duration_ms > max_duration_ms:
+        logging.warning(
+            f"{path} issued {stats.count} queries taking {duration_ms:.1f}ms."
+        )
+
+    for sql, count in stats.repeated_queries(repeated_threshold):
+        logging.warning(f"Possible N+1 on {path}, query repeated {count} times: {sql}")
@@ -0,0 +1,62 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import peewee
+from hotline.database import models
+
+NUMBER_COLUMNS = [
+    ("number", "number", False),
+    ("event", "primary_number", True),
+    ("eventmember", "number", False),
+    ("smschat", "relay_number", False),
+    ("smschatconnection", "user_number", False),
+    ("smschatconnection", "relay_number", False),
+    ("auditlog", "reporter_number", True),
+    ("blocklist", "number", False),
+]
+
+
+class ConvertNumberColumn:
+    """Converts a text column holding E.164 numbers to an integer column."""
+
+    method = "convert_number_column"
+
+    def __init__(self, migrator, table, column, null):
+        self.migrator = migrator
+        self.args = [table, column]
+        self.null = null
+
+    def run(self):
+        table, column = self.args
+
+        # Strip the leading "+" so that the values can be cast to integers.
+        models.db.execute_sql(
+            f'UPDATE "{table}" SET "{column}" = LTRIM("{column}", \'+\')'
+        )
+
+        if isinstance(models.db.obj, peewee.SqliteDatabase):
+            self.migrator.alter_column_type(
+                table, column, models.PhoneNumberField(null=self.null)
+            ).run()
+        else:
+            models.db.execute_sql(
+                f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE BIGINT USING "{column}"::bigint'
+            )
+
+
+def migrate(migrator):
+    return [
+        ConvertNumberColumn(migrator, table, column, null)
+        for table, column, null in NUMBER_COLUMNS
+    ]
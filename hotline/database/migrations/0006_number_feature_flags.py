@@ -0,0 +1,45 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from hotline.database import models
+
+
+class PopulateFeatureFlags:
+    """Converts the comma-separated feature names into a bitmask."""
+
+    method = "populate_feature_flags"
+    args = ["number", "feature_flags"]
+
+    def run(self):
+        cases = " + ".join(
+            f"(CASE WHEN \"features\" LIKE '%{feature.name}%' THEN {feature.value} ELSE 0 END)"
+            for feature in models.NumberFeature
+        )
+        models.db.execute_sql(f'UPDATE "number" SET "feature_flags" = {cases}')
+
+
+def migrate(migrator):
+    return [
+        migrator.add_column(
+            "number",
+            "feature_flags",
+            models.NumberFeatureField(
+                default=models.NumberFeature.SMS | models.NumberFeature.VOICE
+            ),
+        ),
+        PopulateFeatureFlags(),
+        migrator.drop_column("number", "features"),
+        migrator.rename_column("number", "feature_flags", "features"),
+        migrator.add_index("number", ("pool", "country", "features")),
+    ]
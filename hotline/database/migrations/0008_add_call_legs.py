@@ -0,0 +1,46 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import peewee
+from hotline.database import models
+
+
+class CallLeg(models.BaseModel):
+    """The call leg table as this migration creates it. Later migrations
+    change the table, so the current model can't be used here."""
+
+    uuid = peewee.CharField(primary_key=True)
+    conversation_uuid = peewee.CharField()
+    event = peewee.ForeignKeyField(models.Event, backref="+")
+    member_number = models.PhoneNumberField()
+    status = peewee.CharField(default="started")
+    created = peewee.DateTimeField(default=datetime.datetime.utcnow)
+    answered = peewee.DateTimeField(null=True)
+
+
+CallLeg.add_index(CallLeg.conversation_uuid, CallLeg.status)
+
+
+class CreateModels:
+    method = "create_tables"
+    args = [CallLeg]
+
+    def run(self):
+        models.db.create_tables(self.args)
+
+
+def migrate(migrator):
+    return [CreateModels()]
@@ -0,0 +1,58 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import peewee
+from hotline.database import models
+
+
+class Conversation(models.BaseModel):
+    """The conversation table as this migration creates it. Later migrations
+    change the table, so the current model can't be used here."""
+
+    uuid = peewee.CharField(primary_key=True)
+    event = peewee.ForeignKeyField(models.Event, backref="+")
+    call_uuid = peewee.CharField()
+    answer_url = peewee.TextField()
+    rotation = peewee.IntegerField(default=0)
+    created = peewee.DateTimeField(default=datetime.datetime.utcnow)
+    finished = peewee.DateTimeField(null=True)
+
+
+Conversation.add_index(Conversation.call_uuid)
+Conversation.add_index(Conversation.finished, Conversation.created)
+
+
+class CreateModels:
+    method = "create_tables"
+    args = [Conversation]
+
+    def run(self):
+        models.db.create_tables(self.args)
+
+
+def migrate(migrator):
+    return [
+        migrator.add_column(
+            "event", "dialing_strategy", peewee.CharField(default="all")
+        ),
+        migrator.add_column(
+            "event", "dialing_wave_size", peewee.IntegerField(default=3)
+        ),
+        migrator.add_column(
+            "event", "dialing_timeout", peewee.IntegerField(default=20)
+        ),
+        CreateModels(),
+    ]
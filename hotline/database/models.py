@@ -17,6 +17,8 @@ stuff into the higher-level interface."""
 
 import datetime
 import enum
+import json
+from typing import Iterable, List
 
 import hotline.chatroom
 import peewee
@@ -41,19 +43,87 @@ class SerializableField(peewee.TextField):
         return self._cls.deserialize(value)
 
 
+class JSONField(peewee.TextField):
+    def db_value(self, value):
+        if value is None:
+            return None
+        return json.dumps(value, separators=(",", ":"))
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return json.loads(value)
+
+
+class PhoneNumberField(peewee.BigIntegerField):
+    """Stores E.164 phone numbers as integers.
+
+    Numbers are stored without their leading "+", which keeps the indexes on
+    these columns narrow and makes comparisons cheap. Values read back are in
+    the same "+<digits>" form that ``lowlevel.normalize_e164_number`` produces.
+    """
+
+    def db_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        return int(value.lstrip("+"))
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return f"+{value}"
+
+
 class NumberPool(enum.IntEnum):
     EVENT = 1
     SMS_RELAY = 2
 
 
+class NumberFeature(enum.IntFlag):
+    SMS = 1
+    VOICE = 2
+    MMS = 4
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "NumberFeature":
+        """Builds a feature set from names like the ones Nexmo returns, for
+        example ``["SMS", "VOICE"]``. Unknown names are ignored."""
+        features = cls(0)
+        for name in names:
+            features |= cls.__members__.get(name.strip().upper(), 0)
+        return features
+
+    def names(self) -> List[str]:
+        return [feature.name for feature in NumberFeature if feature in self]
+
+
+class NumberFeatureField(peewee.IntegerField):
+    def python_value(self, value):
+        if value is None:
+            return None
+        return NumberFeature(value)
+
+
 class Number(BaseModel):
-    number = peewee.TextField()
+    number = PhoneNumberField()
     country = peewee.CharField(default="US")
     pool = peewee.IntegerField(default=NumberPool.EVENT)
-    features = peewee.TextField(index=False)
+    features = NumberFeatureField(default=NumberFeature.SMS | NumberFeature.VOICE)
 
 
 Number.add_index(Number.number)
+Number.add_index(Number.pool, Number.country, Number.features)
+
+
+class DialingStrategy(str, enum.Enum):
+    """How members are dialed when someone calls the hotline."""
+
+    # Every member at once.
+    ALL = "all"
+    # A few members at a time, moving on to the next few if none answer.
+    WAVES = "waves"
+    # One member at a time, starting with a different member for each call.
+    ROUND_ROBIN = "round_robin"
 
 
 class Event(BaseModel):
@@ -63,7 +133,7 @@ class Event(BaseModel):
 
     # Number assignement.
     # Stored as destructured as well to speed things up a little.
-    primary_number = peewee.TextField(null=True)
+    primary_number = PhoneNumberField(null=True)
     primary_number_id = peewee.ForeignKeyField(Number, null=True)
     country = peewee.CharField(default="US")
 
@@ -77,6 +147,40 @@ class Event(BaseModel):
     voice_greeting = peewee.TextField(null=True, index=False)
     sms_greeting = peewee.TextField(null=True, index=False)
 
+    # Dialing.
+    dialing_strategy = peewee.CharField(default=DialingStrategy.ALL.value)
+    dialing_wave_size = peewee.IntegerField(default=3)
+    dialing_timeout = peewee.IntegerField(default=20)
+
+    # Bumped whenever the event is saved or an organizer is removed, so that
+    # cached copies of anything derived from it can be invalidated.
+    version = peewee.IntegerField(default=0)
+    modified = peewee.DateTimeField(default=datetime.datetime.utcnow)
+
+    def save(self, *args, **kwargs):
+        self.modified = datetime.datetime.utcnow()
+
+        if self.id is None:
+            self.version = 1
+            return super().save(*args, **kwargs)
+
+        # Bump the version in the UPDATE itself, so that concurrent saves
+        # each get a new version. If the save fails, the event keeps its
+        # version rather than the expression.
+        version = self.version
+        try:
+            with db.atomic():
+                self.version = Event.version + 1
+                result = super().save(*args, **kwargs)
+                self.version = (
+                    Event.select(Event.version).where(Event.id == self.id).scalar()
+                )
+        except Exception:
+            self.version = version
+            raise
+
+        return result
+
 
 Event.add_index(Event.slug)
 Event.add_index(Event.primary_number)
@@ -88,12 +192,26 @@ class EventMember(BaseModel):
 
     event = peewee.ForeignKeyField(Event, backref="members")
     name = peewee.TextField()
-    number = peewee.TextField()
+    number = PhoneNumberField()
     verified = peewee.BooleanField()
 
 
 EventMember.add_index(EventMember.event, EventMember.verified)
 EventMember.add_index(EventMember.number, EventMember.verified)
+EventMember.add_index(EventMember.event, EventMember.number)
+
+
+class OnCallShift(BaseModel):
+    """A window of time when a member is on call. While any of an event's
+    members are on call, only they are contacted."""
+
+    event = peewee.ForeignKeyField(Event, backref="shifts")
+    member = peewee.ForeignKeyField(EventMember, backref="shifts")
+    start = peewee.DateTimeField()
+    end = peewee.DateTimeField()
+
+
+OnCallShift.add_index(OnCallShift.event, OnCallShift.start, OnCallShift.end)
 
 
 class EventOrganizer(BaseModel):
@@ -109,19 +227,27 @@ class EventOrganizer(BaseModel):
 EventOrganizer.add_index(EventOrganizer.user_id)
 
 
+class RevokedSession(BaseModel):
+    """Records when a user last logged out. Their sessions from before then
+    are no longer accepted, by any worker."""
+
+    user_id = peewee.CharField(primary_key=True)
+    revoked = peewee.DateTimeField()
+
+
 class SmsChat(BaseModel):
     timestamp = peewee.DateTimeField(default=datetime.datetime.utcnow)
     event = peewee.ForeignKeyField(Event)
     room = SerializableField(hotline.chatroom.Chatroom)
-    relay_number = peewee.CharField()
+    relay_number = PhoneNumberField()
 
 
 class SmsChatConnection(BaseModel):
     """Model used for looking up SMS chats based on a combination of the
     user's number and the relay number."""
 
-    user_number = peewee.CharField()
-    relay_number = peewee.CharField()
+    user_number = PhoneNumberField()
+    relay_number = PhoneNumberField()
     user_name = peewee.CharField()
     smschat = peewee.ForeignKeyField(SmsChat, backref="connections")
 
@@ -132,14 +258,72 @@ class SmsChatConnection(BaseModel):
 SmsChatConnection.add_index(SmsChatConnection.user_number)
 
 
+class Conversation(BaseModel):
+    """A reporter's call, which members are dialed into."""
+
+    uuid = peewee.CharField(primary_key=True)
+    event = peewee.ForeignKeyField(Event, backref="conversations")
+    # The reporter's call.
+    call_uuid = peewee.CharField()
+    answer_url = peewee.TextField()
+    # Where round-robin dialing starts in the event's list of members.
+    rotation = peewee.IntegerField(default=0)
+    created = peewee.DateTimeField(default=datetime.datetime.utcnow)
+    # Set once the reporter hangs up, or there's nobody left to dial.
+    finished = peewee.DateTimeField(null=True)
+    # Set while a worker has claimed the conversation to dial members into it,
+    # until the claim expires.
+    dialing_until = peewee.DateTimeField(null=True)
+    # Set when another worker needs the claimed conversation checked again.
+    redial = peewee.BooleanField(default=False)
+
+
+Conversation.add_index(Conversation.call_uuid)
+Conversation.add_index(Conversation.finished, Conversation.created)
+
+
+class CallLeg(BaseModel):
+    """A call placed to an event member to connect them to a reporter's
+    conversation. The status is the one Nexmo last reported for the call, and
+    the timestamps record when the call reached each state."""
+
+    # Statuses after which the call is over.
+    FINISHED_STATUSES = (
+        "busy",
+        "cancelled",
+        "completed",
+        "failed",
+        "machine",
+        "rejected",
+        "timeout",
+        "unanswered",
+    )
+
+    uuid = peewee.CharField(primary_key=True)
+    conversation_uuid = peewee.CharField()
+    event = peewee.ForeignKeyField(Event, backref="call_legs")
+    member_number = PhoneNumberField()
+    status = peewee.CharField(default="started")
+    created = peewee.DateTimeField(default=datetime.datetime.utcnow)
+    ringing = peewee.DateTimeField(null=True)
+    answered = peewee.DateTimeField(null=True)
+    ended = peewee.DateTimeField(null=True)
+    # How long the member was on the call, in seconds, as billed by Nexmo.
+    duration = peewee.IntegerField(null=True)
+
+
+CallLeg.add_index(CallLeg.conversation_uuid, CallLeg.status)
+CallLeg.add_index(CallLeg.status, CallLeg.created)
+
+
 class AuditLog(BaseModel):
     timestamp = peewee.DateTimeField(default=datetime.datetime.utcnow)
     kind = peewee.IntegerField()
     description = peewee.TextField(null=True)
     event = peewee.ForeignKeyField(Event, backref="auditlogs", null=True)
     user = peewee.CharField(null=True)
-    metadata = peewee.TextField(null=True)
-    reporter_number = peewee.TextField(null=True, index=False)
+    metadata = JSONField(null=True)
+    reporter_number = PhoneNumberField(null=True, index=False)
 
 
 AuditLog.add_index(AuditLog.event, AuditLog.timestamp)
@@ -148,5 +332,5 @@ AuditLog.add_index(AuditLog.event, AuditLog.timestamp)
 class BlockList(BaseModel):
     timestamp = peewee.DateTimeField(default=datetime.datetime.utcnow)
     event = peewee.ForeignKeyField(Event, backref="blocklist")
-    number = peewee.TextField()
+    number = PhoneNumberField()
     blocked_by = peewee.TextField(null=True)
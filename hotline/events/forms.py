@@ -14,7 +14,10 @@
 
 import phonenumbers
 import wtforms
+import wtforms.fields.html5
 from hotline import common_text
+from hotline.database import models
+from hotline.telephony import lowlevel
 
 
 class EventEditForm(wtforms.Form):
@@ -48,11 +51,36 @@ class EventEditForm(wtforms.Form):
     sms_greeting = wtforms.TextField(
         description=f"Sent when a person texts the hotline. By default, this is <code>{common_text.sms_default_greeting}</code>."
     )
+    dialing_strategy = wtforms.SelectField(
+        "Dialing strategy",
+        choices=[
+            (models.DialingStrategy.ALL.value, "Call every member at once"),
+            (models.DialingStrategy.WAVES.value, "Call a few members at a time"),
+            (
+                models.DialingStrategy.ROUND_ROBIN.value,
+                "Call one member at a time, taking turns",
+            ),
+        ],
+        default=models.DialingStrategy.ALL.value,
+        description="How members are called when a person calls the hotline. For large teams, calling a few members at a time avoids placing dozens of calls for every report.",
+    )
+    dialing_wave_size = wtforms.IntegerField(
+        "Members per wave",
+        default=3,
+        validators=[wtforms.validators.NumberRange(min=1)],
+        description="How many members to call at a time when calling a few members at a time.",
+    )
+    dialing_timeout = wtforms.IntegerField(
+        "Ring time",
+        default=20,
+        validators=[wtforms.validators.NumberRange(min=5, max=120)],
+        description="How many seconds to ring members before calling the next ones, when not calling every member at once.",
+    )
 
 
 def validate_phone_number(form, field):
     try:
-        number = phonenumbers.parse(field.data, "US")
+        number = lowlevel.parse_number(field.data, "US")
 
     except phonenumbers.NumberParseException:
         raise wtforms.ValidationError(
@@ -64,7 +92,7 @@ def validate_phone_number(form, field):
             f"{field.data} does not appear to be a possible number."
         )
 
-    field.data = phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+    field.data = lowlevel.normalize_number(field.data, "US")
 
 
 class AddMemberForm(wtforms.Form):
@@ -80,3 +108,25 @@ class AddOrganizerForm(wtforms.Form):
     email = wtforms.StringField(
         "Email", validators=[wtforms.validators.InputRequired()]
     )
+
+
+class AddShiftForm(wtforms.Form):
+    member = wtforms.SelectField(
+        "Member", coerce=int, validators=[wtforms.validators.InputRequired()]
+    )
+    start = wtforms.fields.html5.DateTimeLocalField(
+        "Start",
+        format="%Y-%m-%dT%H:%M",
+        validators=[wtforms.validators.InputRequired()],
+        description="In UTC.",
+    )
+    end = wtforms.fields.html5.DateTimeLocalField(
+        "End",
+        format="%Y-%m-%dT%H:%M",
+        validators=[wtforms.validators.InputRequired()],
+        description="In UTC.",
+    )
+
+    def validate_end(form, field):
+        if form.start.data is not None and field.data <= form.start.data:
+            raise wtforms.ValidationError("The shift must end after it starts.")
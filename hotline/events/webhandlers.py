@@ -12,12 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 import functools
+import hashlib
+import threading
 
+import cachetools
 import flask
 import hotline.database.ext
 import hotline.telephony.verification
-from hotline import audit_log
+from hotline import audit_log, csrf
 from hotline.auth import auth_required, super_admin_required
 from hotline.database import highlevel as db
 from hotline.events import forms
@@ -25,12 +29,21 @@ from hotline.events import forms
 blueprint = flask.Blueprint("events", __name__, template_folder="templates")
 hotline.database.ext.init_app(blueprint)
 
+# Public event pages are shared widely, so they're cacheable by browsers and
+# any CDN in front of the app for a short while.
+EVENT_INFO_MAX_AGE = 60
+
+# Rendered public event pages, keyed by event id and version. Saving an event
+# bumps its version, so stale pages are never served and just age out.
+_rendered_event_pages = cachetools.LRUCache(maxsize=256)
+_rendered_event_pages_lock = threading.Lock()
+
 
 def event_access_required(view):
     @functools.wraps(view)
     @auth_required
     def check_access_decorator(event_slug, *args, **kwargs):
-        event = db.check_if_user_is_organizer(event_slug, flask.g.user["user_id"])
+        event = db.get_event_for_organizer(event_slug, flask.g.user["user_id"])
 
         if event is None:
             flask.abort(404)
@@ -42,6 +55,9 @@ def event_access_required(view):
     return check_access_decorator
 
 
+# The page has no forms, and exempting it keeps the CSRF cookie out of the
+# response so that shared caches will store it.
+@csrf.exempt
 @blueprint.route("/e/<event_slug>")
 def info(event_slug):
     event = db.get_event_by_slug(event_slug)
@@ -49,7 +65,28 @@ def info(event_slug):
     if event is None:
         flask.abort(404)
 
-    return flask.render_template("events/info.html", event=event)
+    key = (event.id, event.version)
+
+    with _rendered_event_pages_lock:
+        rendered = _rendered_event_pages.get(key)
+
+    if rendered is None:
+        body = flask.render_template("events/info.html", event=event)
+        etag = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        rendered = (body, etag)
+
+        with _rendered_event_pages_lock:
+            _rendered_event_pages[key] = rendered
+
+    body, etag = rendered
+
+    response = flask.make_response(body)
+    response.set_etag(etag)
+    response.last_modified = event.modified
+    response.cache_control.public = True
+    response.cache_control.max_age = EVENT_INFO_MAX_AGE
+
+    return response.make_conditional(flask.request)
 
 
 @blueprint.route("/manage/events")
@@ -74,9 +111,10 @@ def add():
 
         audit_log.log(
             audit_log.Kind.EVENT_MODIFIED,
-            description=f"{flask.g.user['name']} created the event.",
             event=event,
             user=user["user_id"],
+            user_name=user["name"],
+            change="created",
         )
 
         return flask.redirect(flask.url_for(".numbers", event_slug=event.slug))
@@ -95,9 +133,10 @@ def details(event, user):
 
         audit_log.log(
             audit_log.Kind.EVENT_MODIFIED,
-            description=f"{flask.g.user['name']} updated the event details.",
             event=event,
             user=user["user_id"],
+            user_name=user["name"],
+            change="updated",
         )
 
         return flask.redirect(
@@ -120,9 +159,10 @@ def numbers(event, user):
 
         audit_log.log(
             audit_log.Kind.MEMBER_ADDED,
-            description=f"{flask.g.user['name']} added {member.name}.",
             event=event,
             user=user["user_id"],
+            user_name=user["name"],
+            member_name=member.name,
         )
 
         # Start the verification process.
@@ -146,9 +186,10 @@ def remove_member(member_id, event, user):
 
     audit_log.log(
         audit_log.Kind.MEMBER_REMOVED,
-        description=f"{flask.g.user['name']} removed {member.name}.",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        member_name=member.name,
     )
 
     return flask.redirect(flask.url_for(".numbers", event_slug=event.slug))
@@ -165,6 +206,65 @@ def verify_member(member_id, event, user):
     return flask.redirect(flask.url_for(".numbers", event_slug=event.slug))
 
 
+@blueprint.route("/manage/events/<event_slug>/schedule", methods=["GET", "POST"])
+@event_access_required
+def schedule(event, user):
+    shifts = db.get_shifts_for_event(event)
+    form = forms.AddShiftForm(flask.request.form)
+    form.member.choices = [
+        (member.id, member.name) for member in db.get_verified_event_members(event)
+    ]
+
+    if flask.request.method == "POST" and form.validate():
+        shift = db.add_shift(
+            event, member=form.member.data, start=form.start.data, end=form.end.data
+        )
+
+        audit_log.log(
+            audit_log.Kind.SHIFT_ADDED,
+            event=event,
+            user=user["user_id"],
+            user_name=user["name"],
+            member_name=shift.member.name,
+            start=_format_shift_time(shift.start),
+            end=_format_shift_time(shift.end),
+        )
+
+        return flask.redirect(
+            flask.url_for(flask.request.endpoint, event_slug=event.slug)
+        )
+
+    return flask.render_template(
+        "events/schedule.html",
+        event=event,
+        shifts=shifts,
+        form=form,
+        now=datetime.datetime.utcnow(),
+    )
+
+
+@blueprint.route("/manage/events/<event_slug>/schedule/remove/<shift_id>")
+@event_access_required
+def remove_shift(shift_id, event, user):
+    shift = db.remove_shift(event, shift_id)
+
+    audit_log.log(
+        audit_log.Kind.SHIFT_REMOVED,
+        event=event,
+        user=user["user_id"],
+        user_name=user["name"],
+        member_name=shift.member.name,
+        start=_format_shift_time(shift.start),
+        end=_format_shift_time(shift.end),
+    )
+
+    return flask.redirect(flask.url_for(".schedule", event_slug=event.slug))
+
+
+def _format_shift_time(value: datetime.datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M UTC")
+
+
 @blueprint.route("/manage/events/<event_slug>/organizers", methods=["GET", "POST"])
 @event_access_required
 def organizers(event, user):
@@ -177,9 +277,10 @@ def organizers(event, user):
 
         audit_log.log(
             audit_log.Kind.ORGANIZER_ADDED,
-            description=f"{flask.g.user['name']} invited {form.email.data}.",
             event=event,
             user=user["user_id"],
+            user_name=user["name"],
+            organizer_email=form.email.data,
         )
 
         return flask.redirect(
@@ -200,9 +301,10 @@ def remove_organizer(organizer_id, event, user):
 
     audit_log.log(
         audit_log.Kind.ORGANIZER_REMOVED,
-        description=f"{flask.g.user['name']} removed {organizer.user_email}.",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        organizer_email=organizer.user_email,
     )
 
     return flask.redirect(flask.url_for(".organizers", event_slug=event.slug))
@@ -229,9 +331,10 @@ def release(event, user):
 
     audit_log.log(
         audit_log.Kind.NUMBER_RELEASED,
-        description=f"{flask.g.user['name']} released the number {previous_number}",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        number=previous_number,
     )
 
     return flask.redirect(flask.url_for(".numbers", event_slug=event.slug))
@@ -244,9 +347,10 @@ def acquire(event, user):
 
     audit_log.log(
         audit_log.Kind.NUMBER_ACQUIRED,
-        description=f"{flask.g.user['name']} acquired the number {new_number}",
         event=event,
         user=user["user_id"],
+        user_name=user["name"],
+        number=new_number,
     )
 
     return flask.redirect(flask.url_for(".numbers", event_slug=event.slug))
@@ -274,9 +378,15 @@ def remove_chat(event, user, chat_id):
 @event_access_required
 def logs(event, user):
     logs = db.get_logs_for_event(event)
+    call_metrics = db.get_call_metrics(event)
 
     return flask.render_template(
-        "events/logs.html", event=event, logs=logs, Kind=audit_log.Kind
+        "events/logs.html",
+        event=event,
+        logs=logs,
+        call_metrics=call_metrics,
+        Kind=audit_log.Kind,
+        describe=audit_log.describe,
     )
 
 
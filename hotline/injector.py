@@ -20,10 +20,21 @@ relatively sane.
 
 import functools
 import inspect
+import threading
 from typing import Any, Dict, List
 
 _registry: Dict[str, Any] = dict()
 
+# Bumped whenever the registry is changed through set() or reset(). Functions
+# decorated with needs() cache the values they were given and throw them away
+# when this changes.
+_generation = 0
+
+# Held while invoking factories so that concurrent first calls don't create
+# the same value twice. Re-entrant because factories can need other
+# factories.
+_factory_lock = threading.RLock()
+
 
 def set(name: str, value: Any):
     """Sets a value to be injected.
@@ -32,7 +43,9 @@ def set(name: str, value: Any):
     factory function. It will be invoked *once* at runtime to create the
     needed value.
     """
+    global _generation
     _registry[name] = value
+    _generation += 1
 
 
 _default_sentinel = object()
@@ -55,9 +68,15 @@ def get(name: str, default=_default_sentinel):
         value = _dot_get(name, _registry)
 
         if callable(value):
-            value = value()
-            # Update the value so we only call factories once.
-            _registry[name] = value
+            with _factory_lock:
+                # Another thread may have invoked the factory while this one
+                # was waiting for the lock.
+                value = _dot_get(name, _registry)
+
+                if callable(value):
+                    value = value()
+                    # Update the value so we only call factories once.
+                    _registry[name] = value
 
         return value
 
@@ -68,6 +87,22 @@ def get(name: str, default=_default_sentinel):
         raise KeyError(f"{name} has not been provided.")
 
 
+class _Bindings:
+    """The values resolved for a function decorated with needs()."""
+
+    __slots__ = ("generation", "values")
+
+    def __init__(self):
+        self.generation = -1
+        self.values: Dict[str, Any] = {}
+
+    def current(self) -> Dict[str, Any]:
+        if self.generation != _generation:
+            self.values = {}
+            self.generation = _generation
+        return self.values
+
+
 def _modify_function_signature(func, injected_items: List[str]):
     """Modifies a function sigature to turn any injected items into optional
     keyword args. This makes injection play nicely with mock's autospeccing.
@@ -103,13 +138,19 @@ def needs(*things):
         requirement.rsplit(".", 1)[-1].replace("-", "_"): requirement
         for requirement in things
     }
+    requirements = list(things_parameter_names.items())
 
     def decorator(f):
+        bindings = _Bindings()
+
         @functools.wraps(f)
         def invocation(*args, **kwargs):
-            for parameter, requirement in things_parameter_names.items():
+            values = bindings.current()
+            for parameter, requirement in requirements:
                 if parameter not in kwargs:
-                    kwargs[parameter] = get(requirement)
+                    if parameter not in values:
+                        values[parameter] = get(requirement)
+                    kwargs[parameter] = values[parameter]
             return f(*args, **kwargs)
 
         _modify_function_signature(invocation, list(things_parameter_names.keys()))
@@ -137,4 +178,6 @@ def provides(name=None, needs: List[str] = None):
 
 
 def reset():
+    global _generation
     _registry.clear()
+    _generation += 1
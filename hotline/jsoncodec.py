@@ -0,0 +1,64 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Encodes and decodes JSON for the webhooks and chatrooms.
+
+orjson is used when it's installed, and the standard library otherwise. Both
+backends produce byte-for-byte identical output: compact, with keys in
+insertion order, and with non-ASCII characters encoded as UTF-8 rather than
+escaped. Key order is kept because chatrooms rely on the order of their
+users.
+"""
+
+import json
+from typing import Any, Callable, Dict, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+_BACKENDS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Any], Any]]] = {
+    "stdlib": (_stdlib_dumps, _stdlib_loads)
+}
+
+if orjson is not None:  # pragma: no cover
+    _BACKENDS["orjson"] = (orjson.dumps, orjson.loads)
+
+backend: str
+dumps: Callable[[Any], bytes]
+loads: Callable[[Union[bytes, str]], Any]
+
+
+def available_backends() -> Tuple[str, ...]:
+    return tuple(_BACKENDS)
+
+
+def use(name: str) -> None:
+    """Switches the backend used by :func:`dumps` and :func:`loads`."""
+    global backend, dumps, loads
+    dumps, loads = _BACKENDS[name]
+    backend = name
+
+
+use("orjson" if "orjson" in _BACKENDS else "stdlib")
@@ -48,7 +48,14 @@ def list():
 @blueprint.route("/admin/numbers/<number>/details")
 @super_admin_required
 def details(number):
-    number_entry = models.Number.select().where(models.Number.number == number).get()
+    try:
+        number_entry = (
+            models.Number.select().where(models.Number.number == number).get()
+        )
+    except (ValueError, peewee.DoesNotExist):
+        # Numbers are stored as integers, so anything that isn't a number
+        # can't possibly exist.
+        flask.abort(404)
 
     try:
         event = (
@@ -87,7 +94,7 @@ def rent():
     number_record.number = number["msisdn"]
     number_record.country = number["country"]
     number_record.pool = pool
-    number_record.features = ",".join(number.get("features", []))
+    number_record.features = models.NumberFeature.from_names(number.get("features", []))
     number_record.save()
 
     return flask.redirect(flask.url_for(".list"))
@@ -12,24 +12,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import hashlib
 import os
 
-import cmarkgfm
 import flask
 import flask.helpers
+from hotline import csrf
 
 HERE = os.path.dirname(__file__)
 CONTENT = os.path.join(HERE, "content")
 
+# Pages only change when the app is deployed, so browsers can use their copy
+# for a while before revalidating it with the ETag.
+MAX_AGE = 300
+
 blueprint = flask.Blueprint("pages", __name__, template_folder="templates")
 
+RenderedPage = collections.namedtuple("RenderedPage", ["mtime", "body", "etag"])
 
-@blueprint.route("/pages/<name>")
-def view_page(name):
-    markdown_file = flask.safe_join(CONTENT, f"{name}.md")
+# Rendered pages by name. Rendering the same page twice at the same time is
+# harmless, so this doesn't need a lock.
+_rendered_pages: dict = {}
 
-    if not os.path.exists(markdown_file):
-        flask.abort(404)
+
+def _render_page(markdown_file: str) -> RenderedPage:
+    import cmarkgfm
+
+    mtime = os.path.getmtime(markdown_file)
 
     with open(markdown_file, "r") as fh:
         content = cmarkgfm.markdown_to_html_with_extensions(
@@ -39,4 +49,53 @@ def view_page(name):
     # content = content.replace("<h1>", "<h1 class=\"title is-1 is-spaced\">")
     # content = content.replace("<h2>", "<h2 class=\"subtitle is-2 is-spaced\">")
 
-    return flask.render_template("page.html", content=content)
+    body = flask.render_template("page.html", content=content)
+    etag = hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    return RenderedPage(mtime=mtime, body=body, etag=etag)
+
+
+def get_page(name: str) -> RenderedPage:
+    page = _rendered_pages.get(name)
+
+    # In debug mode, check the file every time to pick up edits without a
+    # restart.
+    if page is not None and not flask.current_app.debug:
+        return page
+
+    markdown_file = flask.safe_join(CONTENT, f"{name}.md")
+
+    if not os.path.exists(markdown_file):
+        flask.abort(404)
+
+    if page is None or os.path.getmtime(markdown_file) != page.mtime:
+        page = _render_page(markdown_file)
+        _rendered_pages[name] = page
+
+    return page
+
+
+def render_all(app: flask.Flask) -> None:
+    """Renders every page ahead of the first request for it."""
+    for filename in os.listdir(CONTENT):
+        name, ext = os.path.splitext(filename)
+        if ext != ".md":
+            continue
+
+        with app.test_request_context(f"/pages/{name}"):
+            get_page(name)
+
+
+# Like the event pages, these have no forms and are exempt so that shared
+# caches will store them.
+@csrf.exempt
+@blueprint.route("/pages/<name>")
+def view_page(name):
+    page = get_page(name)
+
+    response = flask.make_response(page.body)
+    response.set_etag(page.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+
+    return response.make_conditional(flask.request)
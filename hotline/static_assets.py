@@ -0,0 +1,81 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fingerprinted URLs for static files.
+
+Templates use ``static_url("style.css")`` in place of
+``url_for("static", filename="style.css")``. This adds a hash of the file's
+content to the URL, so the file can be cached forever: when it changes, so
+does its URL.
+"""
+
+import hashlib
+import os
+from typing import Dict, Tuple
+
+import flask
+
+# A year, which is the most that's meaningful to browsers.
+FINGERPRINTED_MAX_AGE = 365 * 24 * 60 * 60
+
+# Maps filenames to their mtime and content hash.
+_fingerprints: Dict[str, Tuple[float, str]] = {}
+
+
+def _fingerprint(filename: str) -> str:
+    app = flask.current_app
+    cached = _fingerprints.get(filename)
+
+    # Static files only change when the app is deployed, except in debug mode.
+    if cached is not None and not app.debug:
+        return cached[1]
+
+    path = flask.safe_join(app.static_folder, filename)
+    mtime = os.path.getmtime(path)
+
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as fh:
+            cached = (mtime, hashlib.sha256(fh.read()).hexdigest()[:12])
+        _fingerprints[filename] = cached
+
+    return cached[1]
+
+
+def static_url(filename: str) -> str:
+    return flask.url_for("static", filename=filename, v=_fingerprint(filename))
+
+
+def _add_cache_headers(response: flask.Response) -> flask.Response:
+    if flask.request.endpoint != "static" or "v" not in flask.request.args:
+        return response
+
+    if response.status_code not in (200, 304):
+        return response
+
+    # Only the current fingerprint identifies the content being served. Any
+    # other version, stale or made up, gets the usual headers, so that it
+    # doesn't pin today's content.
+    filename = flask.request.view_args["filename"]
+    if flask.request.args["v"] == _fingerprint(filename):
+        response.headers[
+            "Cache-Control"
+        ] = f"public, max-age={FINGERPRINTED_MAX_AGE}, immutable"
+        response.headers.pop("Expires", None)
+
+    return response
+
+
+def init_app(app: flask.Flask) -> None:
+    app.add_template_global(static_url)
+    app.after_request(_add_cache_headers)
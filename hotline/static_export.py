@@ -0,0 +1,165 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Exports the public pages as static files, so that a CDN or static bucket
+can serve them without the requests reaching the app.
+
+The export directory mirrors the app's URLs: ``/e/<slug>`` is written to
+``e/<slug>/index.html``, ``/pages/<name>`` to ``pages/<name>/index.html``, and
+static files to ``static/``. A manifest of the hashes of the exported files is
+kept alongside them, so each export only writes the files that changed.
+
+Exporting is done by ``flask export-static-site`` rather than by the app
+itself, since App Engine instances don't have a durable filesystem to write
+to. Run it (and upload the result) after events change.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import List, Set
+
+import flask
+from hotline.database import models
+from hotline.pages import webhandlers as pages
+
+MANIFEST_NAME = ".manifest.json"
+
+# Guards the manifest's read-modify-write within this process. Exports from
+# other processes can still race, but that only loses manifest entries, which
+# causes the affected files to be written again by the next export.
+_manifest_lock = threading.Lock()
+
+
+def _load_manifest(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {"files": {}, "events": {}}
+
+
+def _write_atomically(filename: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "wb") as fh:
+        fh.write(content)
+    os.replace(temp_filename, filename)
+
+
+class _Export:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest = _load_manifest(directory)
+        # Every path exported, and the subset that had to be written.
+        self.exported: Set[str] = set()
+        self.written: List[str] = []
+
+    def write(self, path: str, content: bytes) -> None:
+        """Writes the file, unless it's unchanged since the last export."""
+        self.exported.add(path)
+
+        digest = hashlib.sha256(content).hexdigest()
+        filename = os.path.join(self.directory, path)
+
+        if self.manifest["files"].get(path) == digest and os.path.exists(filename):
+            return
+
+        _write_atomically(filename, content)
+        self.manifest["files"][path] = digest
+        self.written.append(path)
+
+    def remove(self, path: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, path))
+        except FileNotFoundError:
+            pass
+
+        self.manifest["files"].pop(path, None)
+
+    def save(self) -> None:
+        _write_atomically(
+            os.path.join(self.directory, MANIFEST_NAME),
+            json.dumps(self.manifest, indent=2, sort_keys=True).encode("utf-8"),
+        )
+
+
+def _export_event(app: flask.Flask, export: _Export, event: models.Event) -> None:
+    path = f"e/{event.slug}/index.html"
+
+    # If the slug changed, remove the page at the old location.
+    previous_path = export.manifest["events"].get(str(event.id))
+    if previous_path is not None and previous_path != path:
+        export.remove(previous_path)
+
+    export.manifest["events"][str(event.id)] = path
+
+    # Not the event's URL, as a request to that would close the database
+    # connection on teardown.
+    with app.test_request_context("/"):
+        body = flask.render_template("events/info.html", event=event)
+
+    export.write(path, body.encode("utf-8"))
+
+
+def _export_pages(app: flask.Flask, export: _Export) -> None:
+    for filename in sorted(os.listdir(pages.CONTENT)):
+        name, ext = os.path.splitext(filename)
+        if ext != ".md":
+            continue
+
+        with app.test_request_context(f"/pages/{name}"):
+            body = pages.get_page(name).body
+
+        export.write(f"pages/{name}/index.html", body.encode("utf-8"))
+
+
+def _export_static_files(app: flask.Flask, export: _Export) -> None:
+    for root, _, filenames in os.walk(app.static_folder):
+        for filename in sorted(filenames):
+            source = os.path.join(root, filename)
+            relative = os.path.relpath(source, app.static_folder).replace(os.sep, "/")
+
+            with open(source, "rb") as fh:
+                export.write(f"static/{relative}", fh.read())
+
+
+def export_all(app: flask.Flask, directory: str) -> List[str]:
+    """Exports every event page, markdown page and static file, and removes
+    anything exported previously that no longer exists. Returns the paths
+    that were written. Needs an open database connection."""
+    with _manifest_lock:
+        export = _Export(directory)
+
+        for event in models.Event.select():
+            _export_event(app, export, event)
+        _export_pages(app, export)
+        _export_static_files(app, export)
+
+        # Anything that wasn't exported this time, such as the page for a
+        # deleted event, is stale.
+        for path in set(export.manifest["files"]) - export.exported:
+            export.remove(path)
+
+        export.manifest["events"] = {
+            event_id: path
+            for event_id, path in export.manifest["events"].items()
+            if path in export.exported
+        }
+
+        export.save()
+
+    return export.written
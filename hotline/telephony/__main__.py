@@ -0,0 +1,39 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Serves only the telephony webhooks.
+
+Unlike ``hotline.__main__``, this doesn't set up the dashboard: there's no
+auth, CSRF protection, Talisman or template filters, so Firebase is never
+imported. This lets the webhook workers start faster, use less memory, and be
+scaled separately from the dashboard (see ``telephony.yaml`` and
+``dispatch.yaml``)::
+
+    gunicorn hotline.telephony.__main__:app
+"""
+
+import logging
+
+import flask
+import hotline.config
+import hotline.telephony.webhandlers
+
+logging.basicConfig(level=logging.INFO)
+
+app = flask.Flask("hotline.telephony", static_folder=None)
+app.register_blueprint(hotline.telephony.webhandlers.blueprint)
+
+config = hotline.config.load()
+
+__all__ = ["app"]
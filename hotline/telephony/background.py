@@ -0,0 +1,73 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs follow-up work off of the webhook's request path.
+
+Nexmo waits on its webhooks - the member who answers a call hears nothing
+until the answer webhook responds - and requests to Nexmo's API can be slow,
+so work that the response doesn't depend on, like hanging up calls, is done
+on a small pool of threads. Each task gets its own database connection.
+
+Tasks still running when the worker exits are waited for, but tasks are lost
+if the worker is killed.
+"""
+
+import concurrent.futures
+import logging
+import threading
+from typing import Callable, Optional, Set
+
+from hotline.database import models
+
+MAX_WORKERS = 8
+
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_WORKERS, thread_name_prefix="telephony-background"
+)
+_pending: Set[concurrent.futures.Future] = set()
+_pending_lock = threading.Lock()
+
+
+def _run(func: Callable, *args, **kwargs) -> None:
+    try:
+        with models.db.connection_context():
+            func(*args, **kwargs)
+    except Exception:
+        logging.exception(f"Error running {func.__name__} in the background.")
+
+
+def submit(func: Callable, *args, **kwargs) -> concurrent.futures.Future:
+    """Runs the function on the background pool. Errors are logged."""
+    # Submitted under the lock, so that wait() can't miss a task that has
+    # already started.
+    with _pending_lock:
+        future = _executor.submit(_run, func, *args, **kwargs)
+        _pending.add(future)
+
+    future.add_done_callback(_discard)
+
+    return future
+
+
+def _discard(future: concurrent.futures.Future) -> None:
+    with _pending_lock:
+        _pending.discard(future)
+
+
+def wait(timeout: Optional[float] = None) -> None:
+    """Waits for the tasks submitted so far to finish."""
+    with _pending_lock:
+        pending = set(_pending)
+
+    concurrent.futures.wait(pending, timeout=timeout)
@@ -0,0 +1,144 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Records the events that Nexmo sends as calls progress.
+
+Nexmo sends several events for every call placed to a member, so rather than
+writing each one as it arrives, they're buffered and written in batches. A
+batch is written once enough events have arrived, or at most FLUSH_INTERVAL
+seconds after the first event in it arrived, and whatever's left is written
+when the worker exits.
+
+The states that the voice handlers act on (a member answering, calls
+finishing, and the other calls being hung up) are written by the handlers
+immediately, so the buffer only delays the timings used for metrics. If the
+worker is killed rather than exiting, the timings from the last
+FLUSH_INTERVAL seconds are lost.
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import peewee
+from hotline.database import highlevel as db
+from hotline.database import models
+from hotline.telephony import background
+
+FLUSH_SIZE = 20
+FLUSH_INTERVAL = 5.0
+
+_pending: List[db.CallEvent] = []
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flush_timer: Optional[threading.Timer] = None
+
+
+def _parse_timestamp(value: Optional[str]) -> datetime.datetime:
+    if value is None:
+        return datetime.datetime.utcnow()
+
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+    except ValueError:
+        return datetime.datetime.utcnow()
+
+
+def parse(data: dict) -> Optional[db.CallEvent]:
+    """Parses the body of one of Nexmo's call events. Returns None for events
+    that aren't about a call's status."""
+    if "uuid" not in data or "status" not in data:
+        return None
+
+    try:
+        duration = int(data["duration"])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+
+    return db.CallEvent(
+        call_uuid=data["uuid"],
+        status=data["status"],
+        timestamp=_parse_timestamp(data.get("timestamp")),
+        duration=duration,
+    )
+
+
+def record(data: dict) -> None:
+    event = parse(data)
+
+    if event is None:
+        return
+
+    with _pending_lock:
+        _pending.append(event)
+        due = (
+            len(_pending) >= FLUSH_SIZE
+            or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        )
+
+        if not due:
+            _schedule_flush()
+
+    if due:
+        flush()
+
+
+def _schedule_flush() -> None:
+    """Makes sure that the pending events are written even if no more events
+    arrive. Must be called with the lock held."""
+    global _flush_timer
+
+    if _flush_timer is not None:
+        return
+
+    _flush_timer = threading.Timer(FLUSH_INTERVAL, background.submit, args=[flush])
+    _flush_timer.daemon = True
+    _flush_timer.start()
+
+
+def flush() -> int:
+    """Writes the buffered events. Returns the number of legs updated."""
+    global _pending, _last_flush, _flush_timer
+
+    with _pending_lock:
+        events, _pending = _pending, []
+        _last_flush = time.monotonic()
+
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+
+    if not events:
+        return 0
+
+    try:
+        return db.record_call_events(events)
+    except peewee.PeeweeException:
+        logging.exception(f"Unable to record {len(events)} call events.")
+        return 0
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if not _pending:
+        return
+
+    try:
+        with models.db.connection_context():
+            flush()
+    except Exception:
+        logging.exception("Unable to record call events at exit.")
@@ -0,0 +1,128 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Precomputed messages and NCCO fragments for each event.
+
+Greetings and the like only change when the event is edited, so they're built
+once per event version and only the fields that differ between calls and
+chats are filled in each time.
+"""
+
+import threading
+import types
+from typing import List, Optional
+
+import cachetools
+
+from hotline import common_text
+from hotline.database import models
+
+HOLD_MUSIC = "https://assets.ctfassets.net/j7pfe8y48ry3/530pLnJVZmiUu8mkEgIMm2/dd33d28ab6af9a2d32681ae80004886e/oaklawn-dreams.mp3"
+
+# Stands in for per-call fields when formatting, so that the text around them
+# can be precomputed.
+_PLACEHOLDER = "\0"
+
+_templates = cachetools.LRUCache(maxsize=256)
+_templates_lock = threading.Lock()
+
+
+def _split(template: str, **kwargs) -> List[str]:
+    return template.format(**kwargs).split(_PLACEHOLDER)
+
+
+class EventTemplates:
+    """The parts of an event's messages that don't change between calls and
+    chats. The dicts returned are shared, so they must not be modified."""
+
+    def __init__(self, event: models.Event):
+        if event.voice_greeting is not None and event.voice_greeting.strip():
+            voice_greeting = event.voice_greeting
+        else:
+            voice_greeting = common_text.voice_default_greeting.format(event=event)
+
+        if event.sms_greeting is not None and event.sms_greeting.strip():
+            self.sms_greeting = event.sms_greeting
+        else:
+            self.sms_greeting = common_text.sms_default_greeting.format(event=event)
+
+        self._voice_greeting = {"action": "talk", "text": voice_greeting}
+
+        # Nexmo is apparently picky about + being in the from field.
+        self.from_endpoint = {
+            "type": "phone",
+            "number": event.primary_number.strip("+"),
+        }
+
+        self._answer_greeting = _split(
+            common_text.voice_answer_greeting,
+            event=event,
+            member=types.SimpleNamespace(name=_PLACEHOLDER),
+        )
+        self._sms_introduction = _split(
+            common_text.sms_introduction, event=event, reporter_number=_PLACEHOLDER
+        )
+
+    def reporter_ncco(self, conversation_uuid: str) -> List[dict]:
+        """Greets the reporter and puts them on hold in the conversation."""
+        return [
+            self._voice_greeting,
+            {
+                "action": "conversation",
+                "name": conversation_uuid,
+                "eventMethod": "POST",
+                "musicOnHoldUrl": [HOLD_MUSIC],
+                "endOnExit": False,
+                "startOnEnter": False,
+            },
+        ]
+
+    def member_call(
+        self, member_number: str, answer_url: str, ringing_timer: Optional[int] = None
+    ) -> dict:
+        """The call to place to a member to connect them to the reporter."""
+        call: dict = {
+            "to": [{"type": "phone", "number": member_number}],
+            "from": self.from_endpoint,
+            "answer_url": [answer_url],
+            "answer_method": "POST",
+        }
+
+        if ringing_timer is not None:
+            call["ringing_timer"] = ringing_timer
+
+        return call
+
+    def answer_greeting(self, member_name: str) -> str:
+        return member_name.join(self._answer_greeting)
+
+    def sms_introduction(self, reporter_number: str) -> str:
+        return reporter_number[-4:].join(self._sms_introduction)
+
+
+def get(event: models.Event) -> EventTemplates:
+    """Returns the templates for the event. Saving the event bumps its
+    version, so edits take effect immediately."""
+    key = (event.id, event.version)
+
+    with _templates_lock:
+        templates = _templates.get(key)
+
+    if templates is None:
+        templates = EventTemplates(event)
+
+        with _templates_lock:
+            _templates[key] = templates
+
+    return templates
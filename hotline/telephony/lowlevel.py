@@ -15,33 +15,77 @@
 """Handles low-level telephony-related actions, such as renting numbers and
 sending messages."""
 
+import concurrent.futures
+import functools
 import time
+from typing import TYPE_CHECKING, Dict, Iterable, List
 
-import nexmo
 import phonenumbers
-from google.api_core import retry
 from hotline import injector
 
 import logging
 
+# nexmo (and google.api_core, used for retries) are imported by the functions
+# that use them so that importing this module - which the web handlers do just
+# to format numbers - doesn't pay for them.
+if TYPE_CHECKING:  # pragma: no cover
+    import nexmo
+
+
+# Numbers are parsed and formatted on every webhook and for every row of the
+# number admin and logs pages, but there are relatively few distinct numbers,
+# so the results are memoized. Failures aren't cached, so invalid input is
+# parsed again each time.
+@functools.lru_cache(maxsize=4096)
+def parse_number(value: str, country: str = "US") -> phonenumbers.PhoneNumber:
+    """Parses the number. The result is shared, so it must not be modified."""
+    return phonenumbers.parse(value, country)
+
+
+@functools.lru_cache(maxsize=4096)
+def format_number(value: str, country: str, number_format: int) -> str:
+    return phonenumbers.format_number(parse_number(value, country), number_format)
+
+
+def number_cache_info() -> Dict[str, tuple]:
+    return {
+        "parse_number": parse_number.cache_info(),
+        "format_number": format_number.cache_info(),
+    }
+
+
+def preload_number_metadata(countries: Iterable[str]) -> List[str]:
+    """Loads the phonenumbers metadata for the given countries.
+
+    phonenumbers loads each region's metadata the first time it's needed.
+    Preloading the countries that the hotline actually serves moves that cost
+    out of the first requests (and, before forking, shares the metadata
+    between workers) without loading every region. Numbers from any other
+    country are still loaded on demand. Returns the countries loaded.
+    """
+    loaded = []
+
+    for country in sorted(set(countries)):
+        if phonenumbers.PhoneMetadata.metadata_for_region(country) is not None:
+            loaded.append(country)
+        else:
+            logging.warning(f"No phone number metadata for {country}.")
+
+    return loaded
+
 
 def normalize_number(value: str, country: str = "US") -> str:
-    number = phonenumbers.parse(value, country)
-    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+    return format_number(value, country, phonenumbers.PhoneNumberFormat.E164)
 
 
 def normalize_e164_number(value: str) -> str:
     # Nexmo sends numbers back in e164 format but without the leading +, so adding
     # that should make the parser work regardless of the default country code.
-    number = phonenumbers.parse("+" + value, "US")
-    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+    return format_number("+" + value, "US", phonenumbers.PhoneNumberFormat.E164)
 
 
 def pretty_print_number(number: str, country: str = "US") -> str:
-    parsed = phonenumbers.parse(number, "US")
-    return phonenumbers.format_number(
-        parsed, phonenumbers.PhoneNumberFormat.INTERNATIONAL
-    )
+    return format_number(number, "US", phonenumbers.PhoneNumberFormat.INTERNATIONAL)
 
 
 @injector.provides(
@@ -54,6 +98,8 @@ def pretty_print_number(number: str, country: str = "US") -> str:
     ],
 )
 def _make_client(api_key, api_secret, private_key_location, application_id):
+    import nexmo
+
     return nexmo.Client(
         key=api_key,
         secret=api_secret,
@@ -64,7 +110,7 @@ def _make_client(api_key, api_secret, private_key_location, application_id):
 
 @injector.needs("nexmo.client")
 def setup_number(
-    number: str, country: str, sms_callback_url: str, client: nexmo.Client
+    number: str, country: str, sms_callback_url: str, client: "nexmo.Client"
 ):
     client.update_number(
         {
@@ -79,7 +125,7 @@ def setup_number(
 
 @injector.needs("nexmo.client")
 def rent_number(
-    sms_callback_url: str, client: nexmo.Client, country_code: str = "US"
+    sms_callback_url: str, client: "nexmo.Client", country_code: str = "US"
 ) -> dict:
     """Rents a number for the given country.
 
@@ -97,6 +143,8 @@ def rent_number(
             country_code, {"features": "VOICE", "type": "mobile-lvn"}
         )
 
+    import nexmo
+
     error = RuntimeError("No numbers available.")
 
     for number in numbers.get("numbers", []):
@@ -124,11 +172,43 @@ def rent_number(
 
 
 @injector.needs("nexmo.client")
-def get_number_info(number: str, client: nexmo.Client) -> dict:
+def get_number_info(number: str, client: "nexmo.Client") -> dict:
     return client.get_account_numbers(pattern=number)["numbers"][0]
 
 
+# Nexmo's API calls are slow enough that hanging up several calls one after
+# another noticeably delays connecting the member who answered.
+MAX_PARALLEL_HANGUPS = 8
+
+
+@injector.needs("nexmo.client")
+def hang_up_calls(call_uuids: List[str], client: "nexmo.Client") -> List[str]:
+    """Hangs up the calls in parallel. Returns the uuids of the calls that
+    were hung up; the others have most likely ended already."""
+    import nexmo
+
+    def hang_up(call_uuid):
+        try:
+            client.update_call(call_uuid, action="hangup")
+            return True
+        except nexmo.Error as error:
+            logging.warning(f"Unable to hang up call {call_uuid}: {error}")
+            return False
+
+    if not call_uuids:
+        return []
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(len(call_uuids), MAX_PARALLEL_HANGUPS)
+    ) as executor:
+        results = list(executor.map(hang_up, call_uuids))
+
+    return [call_uuid for call_uuid, hung_up in zip(call_uuids, results) if hung_up]
+
+
 def _send_sms_retry_predicate(error):
+    import nexmo
+
     logging.exception("Error during SMS send")
     if isinstance(error, nexmo.ClientError) and "Throughput Rate Exceeded" in str(
         error
@@ -137,9 +217,34 @@ def _send_sms_retry_predicate(error):
     return False
 
 
-@retry.Retry(predicate=_send_sms_retry_predicate, initial=1.0, maximum=1.0, deadline=30.0)
+def _retry_send_sms(f):
+    """Retries sending when Nexmo's throughput limit is hit.
+
+    The retry wrapper is built on first use, which defers importing
+    google.api_core until a message is actually sent.
+    """
+    retrying = None
+
+    @functools.wraps(f)
+    def retry_send_sms(*args, **kwargs):
+        nonlocal retrying
+        if retrying is None:
+            from google.api_core import retry
+
+            retrying = retry.Retry(
+                predicate=_send_sms_retry_predicate,
+                initial=1.0,
+                maximum=1.0,
+                deadline=30.0,
+            )(f)
+        return retrying(*args, **kwargs)
+
+    return retry_send_sms
+
+
+@_retry_send_sms
 @injector.needs("nexmo.client")
-def send_sms(sender: str, to: str, message: str, client: nexmo.Client) -> dict:
+def send_sms(sender: str, to: str, message: str, client: "nexmo.Client") -> dict:
     """Sends an SMS.
 
     ``sender`` and ``to`` must be in proper long form.
@@ -158,6 +263,8 @@ def send_sms(sender: str, to: str, message: str, client: nexmo.Client) -> dict:
     error_text = resp["messages"][0].get("error-text")
 
     if error_text:
+        import nexmo
+
         raise nexmo.ClientError(error_text)
 
     return resp
@@ -25,8 +25,7 @@ import hotline.chatroom
 from hotline import audit_log, common_text
 from hotline.database import highlevel as db
 from hotline.database import models
-from hotline.telephony import lowlevel
-import nexmo
+from hotline.telephony import event_templates, lowlevel
 
 
 class SmsChatError(Exception):
@@ -70,8 +69,8 @@ def _create_room(event_number: str, reporter_number: str) -> hotline.chatroom.Ch
     chatroom = hotline.chatroom.Chatroom()
     chatroom.add_user(name="Reporter", number=reporter_number, relay=event_number)
 
-    # Find all organizers.
-    organizers = list(db.get_verified_event_members(event))
+    # Find the organizers who are on call.
+    organizers = db.get_on_call_event_members(event)
 
     if not organizers:
         raise NoOrganizersAvailable()
@@ -96,19 +95,16 @@ def _create_room(event_number: str, reporter_number: str) -> hotline.chatroom.Ch
 
     audit_log.log(
         audit_log.Kind.SMS_CONVERSATION_STARTED,
-        description=f"A new sms conversation was started. Last 4 digits of number is {reporter_number[-4:]}",
         event=event,
         reporter_number=reporter_number,
     )
 
-    # Determine the greeting.
-    if event.sms_greeting is not None and event.sms_greeting.strip():
-        greeting = event.sms_greeting
-    else:
-        greeting = common_text.sms_default_greeting.format(event=event)
+    templates = event_templates.get(event)
 
     # Send welcome messages.
-    lowlevel.send_sms(sender=event_number, to=reporter_number, message=greeting)
+    lowlevel.send_sms(
+        sender=event_number, to=reporter_number, message=templates.sms_greeting
+    )
 
     # Send instructions for how to opt-out by replying with STOP.
     lowlevel.send_sms(
@@ -119,9 +115,7 @@ def _create_room(event_number: str, reporter_number: str) -> hotline.chatroom.Ch
         lowlevel.send_sms(
             sender=relay_number,
             to=organizer.number,
-            message=common_text.sms_introduction.format(
-                event=event, reporter_number=reporter_number[-4:]
-            ),
+            message=templates.sms_introduction(reporter_number),
         )
 
     return chatroom
@@ -130,6 +124,8 @@ def _create_room(event_number: str, reporter_number: str) -> hotline.chatroom.Ch
 def _send_sms_no_fail(*args, **kwargs):
     """Sends an SMS but does not raise an exception if an error occurs,
     instead, it just logs the exception."""
+    import nexmo
+
     try:
         hotline.telephony.lowlevel.send_sms(*args, **kwargs)
     except nexmo.ClientError:
@@ -160,11 +156,10 @@ def maybe_handle_stop(
 
     audit_log.log(
         audit_log.Kind.PARTICIPANT_LEFT_CHAT,
-        description=f"{removed_user.name} has left the chat room "
-        "with relay number"
-        "{removed_user.relay}. "
-        "The last 4 digits of the their number is {removed_user.number[-4:]}",
         event=smschat.event,
+        participant_name=removed_user.name,
+        relay_number=removed_user.relay,
+        number_suffix=removed_user.number[-4:],
     )
 
     # Notify the sender they will no longer get messages.
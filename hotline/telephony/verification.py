@@ -54,8 +54,9 @@ def maybe_handle_verification(member_number: str, message: str, manual: bool = F
 
     audit_log.log(
         audit_log.Kind.MEMBER_NUMBER_VERIFIED,
-        description=f"{pending_member_record.name} verified their number.",
         event=pending_member_record.event,
+        member_name=pending_member_record.name,
+        method="by text message",
     )
 
     sender = _get_sender_for_member(pending_member_record)
@@ -71,8 +72,9 @@ def manually_verify(member):
 
     audit_log.log(
         audit_log.Kind.MEMBER_NUMBER_VERIFIED,
-        description=f"An admin manually verified {member.name}'s number.",
         event=member.event,
+        member_name=member.name,
+        method="manually by an admin",
     )
 
     return True
@@ -15,16 +15,21 @@
 
 """Handles calling the hotline.
 
-Calling a hotline connects the caller to all of the verified event members.
+Calling a hotline connects the caller to the verified event members. Members
+are dialed according to the event's dialing strategy, either all at once or a
+few at a time, and the reporter is kept on hold in the meantime.
 """
 
-from typing import List
+import logging
+from typing import TYPE_CHECKING, List, Optional
 
-import nexmo
 from hotline import audit_log, common_text, injector
 from hotline.database import highlevel as db
+from hotline.database import models
+from hotline.telephony import background, event_templates, lowlevel
 
-HOLD_MUSIC = "https://assets.ctfassets.net/j7pfe8y48ry3/530pLnJVZmiUu8mkEgIMm2/dd33d28ab6af9a2d32681ae80004886e/oaklawn-dreams.mp3"
+if TYPE_CHECKING:  # pragma: no cover
+    import nexmo
 
 
 @injector.needs("nexmo.client")
@@ -34,7 +39,7 @@ def handle_inbound_call(
     conversation_uuid: str,
     call_uuid: str,
     host: str,
-    client: nexmo.Client,
+    client: "nexmo.Client",
 ) -> List[dict]:
     # Get the event. If there's no event, tell the user that something went
     # wrong.
@@ -49,58 +54,41 @@ def handle_inbound_call(
         error_ncco = [{"action": "talk", "text": common_text.voice_blocked}]
         return error_ncco
 
-    # Get the members for the event. If there are no members, tell the user. :(
-    event_members = list(db.get_verified_event_members(event))
+    # Get the members who are on call. If there are no members, tell the
+    # user. :(
+    event_members = db.get_on_call_event_members(event)
 
     if not event_members:
         error_ncco = [{"action": "talk", "text": common_text.voice_no_members}]
         return error_ncco
 
-    # Great, we have an event. Greet the user.
-    if event.voice_greeting is not None and event.voice_greeting.strip():
-        greeting = event.voice_greeting
-    else:
-        greeting = common_text.voice_default_greeting.format(event=event)
+    templates = event_templates.get(event)
 
-    # NCCOs to be given to the caller.
-    reporter_nccos: List[dict] = []
+    # Greet the reporter and start a "conversation" (conference call).
+    reporter_nccos = templates.reporter_ncco(conversation_uuid)
 
-    # Greet the reporter.
-    reporter_nccos.append({"action": "talk", "text": greeting})
+    answer_url = f"https://{host}/telephony/connect-to-conference/{conversation_uuid}/{call_uuid}"
 
-    # Start a "conversation" (conference call)
-    reporter_nccos.append(
-        {
-            "action": "conversation",
-            "name": conversation_uuid,
-            "eventMethod": "POST",
-            "musicOnHoldUrl": [HOLD_MUSIC],
-            "endOnExit": False,
-            "startOnEnter": False,
-        }
+    # Keep track of the conversation so that more members can be dialed into
+    # it as calls to members finish.
+    conversation = db.create_conversation(
+        event=event,
+        conversation_uuid=conversation_uuid,
+        call_uuid=call_uuid,
+        answer_url=answer_url,
     )
 
-    # Nexmo is apparently picky about + being in the from field.
-    from_number = event.primary_number.strip("+")
-
-    # Add all of the event members to the conference call.
-    for member in event_members:
-        client.create_call(
-            {
-                "to": [{"type": "phone", "number": member.number}],
-                "from": {"type": "phone", "number": from_number},
-                "answer_url": [
-                    f"https://{host}/telephony/connect-to-conference/{conversation_uuid}/{call_uuid}"
-                ],
-                "answer_method": "POST",
-            }
+    if not _dial_next_members_if_waiting(conversation.uuid, client=client):
+        logging.info(
+            f"No capacity to dial members for {conversation_uuid[-12:]}, "
+            "holding the reporter until there is."
         )
 
     audit_log.log(
         audit_log.Kind.VOICE_CONVERSATION_STARTED,
-        description=f"A new voice conversation was started. UUID is {conversation_uuid[-12:]}. Last four digits of number is {reporter_number[-4:]}",
         event=event,
         reporter_number=reporter_number,
+        conversation=conversation_uuid[-12:],
     )
 
     return reporter_nccos
@@ -112,19 +100,21 @@ def handle_member_answer(
     member_number: str,
     origin_conversation_uuid: str,
     origin_call_uuid: str,
-    client: nexmo.Client,
+    client: "nexmo.Client",
+    member_call_uuid: Optional[str] = None,
 ):
     """Connects an organizer to a call-in-progress when they answer."""
 
-    # Members can actually be part of multiple events, so look up the event
-    # separately.
-    member = db.get_member_by_number(member_number)
-    event = db.get_event_by_number(event_number)
+    # Members can actually be part of multiple events, so look up the member
+    # within the event that called them.
+    result = db.get_member_and_event_by_numbers(member_number, event_number)
 
-    if member is None or event is None:
+    if result is None:
         error_ncco = [{"action": "talk", "text": common_text.voice_answer_error}]
         return error_ncco
 
+    member, event = result
+
     client.send_speech(
         origin_call_uuid, text=common_text.voice_answer_announce.format(member=member)
     )
@@ -132,9 +122,7 @@ def handle_member_answer(
     ncco = [
         {
             "action": "talk",
-            "text": common_text.voice_answer_greeting.format(
-                member=member, event=event
-            ),
+            "text": event_templates.get(event).answer_greeting(member.name),
         },
         {
             "action": "conversation",
@@ -144,11 +132,204 @@ def handle_member_answer(
         },
     ]
 
+    # Hanging up the other calls takes a request to Nexmo per call, and the
+    # member who answered hears nothing until the NCCO is returned.
+    if member_call_uuid is not None:
+        db.update_call_leg_status(member_call_uuid, "answered")
+        background.submit(
+            _hang_up_unanswered_legs, origin_conversation_uuid, client=client
+        )
+
     audit_log.log(
         audit_log.Kind.VOICE_CONVERSATION_ANSWERED,
-        description=f"{member.name} answered {origin_conversation_uuid[-12:]}.",
-        user="{member.name}",
         event=event,
+        member_name=member.name,
+        conversation=origin_conversation_uuid[-12:],
     )
 
     return ncco
+
+
+def _hang_up_legs(legs: List[models.CallLeg], client: "nexmo.Client") -> None:
+    hung_up = lowlevel.hang_up_calls([leg.uuid for leg in legs], client=client)
+
+    for call_uuid in hung_up:
+        db.update_call_leg_status(call_uuid, "cancelled")
+
+
+def _hang_up_unanswered_legs(conversation_uuid: str, client: "nexmo.Client") -> None:
+    """Stops calling the other members once enough of them have answered."""
+    answers_before_hangup = injector.get("secrets.voice.answers_before_hangup", 1)
+
+    if db.count_answered_call_legs(conversation_uuid) < answers_before_hangup:
+        return
+
+    _hang_up_legs(db.get_unanswered_call_legs(conversation_uuid), client=client)
+
+
+def _available_capacity() -> Optional[int]:
+    """Returns how many more calls can be placed without going over the
+    concurrent call limit, or None if there's no limit."""
+    max_concurrent_calls = injector.get("secrets.voice.max_concurrent_calls", None)
+
+    if max_concurrent_calls is None:
+        return None
+
+    return max(max_concurrent_calls - db.count_active_call_legs(), 0)
+
+
+def _dial_next_members(
+    conversation: models.Conversation,
+    event: models.Event,
+    members: List[models.EventMember],
+    client: "nexmo.Client",
+) -> int:
+    """Dials the members who haven't been dialed into the conversation yet,
+    as many at a time as the event's dialing strategy and the concurrent call
+    limit allow. Returns the number of members dialed.
+
+    If every member has been dialed, the conversation is finished.
+    """
+    members = sorted(members, key=lambda member: member.id)
+
+    if event.dialing_strategy == models.DialingStrategy.ROUND_ROBIN and members:
+        offset = conversation.rotation % len(members)
+        members = members[offset:] + members[:offset]
+
+    dialed = db.get_dialed_numbers(conversation.uuid)
+    members = [member for member in members if member.number not in dialed]
+
+    if not members:
+        db.finish_conversation(conversation)
+        return 0
+
+    if event.dialing_strategy == models.DialingStrategy.WAVES:
+        wave_size = max(event.dialing_wave_size, 1)
+    elif event.dialing_strategy == models.DialingStrategy.ROUND_ROBIN:
+        wave_size = 1
+    else:
+        wave_size = None
+
+    # When dialing a few members at a time, each call only rings for so long
+    # before Nexmo gives up on it and the next members are dialed.
+    if wave_size is not None:
+        members = members[:wave_size]
+        ringing_timer = event.dialing_timeout
+    else:
+        ringing_timer = None
+
+    capacity = _available_capacity()
+    if capacity is not None:
+        members = members[:capacity]
+
+    templates = event_templates.get(event)
+
+    for member in members:
+        response = client.create_call(
+            templates.member_call(
+                member.number, conversation.answer_url, ringing_timer=ringing_timer
+            )
+        )
+        db.add_call_leg(
+            event=event,
+            conversation_uuid=conversation.uuid,
+            member_number=member.number,
+            call_uuid=response["uuid"],
+        )
+
+    return len(members)
+
+
+def _update_claimed_conversation(conversation_uuid: str, client: "nexmo.Client") -> int:
+    conversation = db.get_conversation(conversation_uuid)
+
+    if conversation is None:
+        return 0
+
+    # Calls may have been placed while the reporter was hanging up.
+    if conversation.finished is not None:
+        _hang_up_legs(db.get_unanswered_call_legs(conversation_uuid), client=client)
+        return 0
+
+    if db.count_answered_call_legs(conversation_uuid):
+        return 0
+
+    if db.get_unanswered_call_legs(conversation_uuid):
+        return 0
+
+    event = conversation.event
+    return _dial_next_members(
+        conversation, event, db.get_on_call_event_members(event), client=client
+    )
+
+
+def _dial_next_members_if_waiting(
+    conversation_uuid: str, client: "nexmo.Client"
+) -> Optional[int]:
+    """Dials the next members into the conversation if nobody has answered
+    and nobody is still being called, or hangs up the calls still ringing if
+    the conversation is finished. Returns the number of members dialed, or
+    None if another worker has the conversation.
+
+    The calls to a wave of members time out together, so workers handling
+    their events would otherwise all dial the next wave. Instead, the
+    conversation is claimed while this runs, and a worker that can't claim it
+    leaves it to the one that has it, which checks it again before letting go.
+    """
+    if not db.claim_conversation(conversation_uuid):
+        return None
+
+    dialed = 0
+
+    try:
+        while True:
+            dialed += _update_claimed_conversation(conversation_uuid, client=client)
+
+            if db.release_conversation(conversation_uuid):
+                return dialed
+    except Exception:
+        db.release_conversation(conversation_uuid, force=True)
+        raise
+
+
+# Bounds how many waiting conversations each finished call can dial into.
+MAX_WAITING_CONVERSATIONS = 10
+
+
+@injector.needs("nexmo.client")
+def handle_call_status(call_uuid: str, status: str, client: "nexmo.Client") -> None:
+    """Moves on to the next members when calls finish.
+
+    When a call to a member finishes without anyone in the conversation having
+    answered, the next members are dialed. When the reporter hangs up, the
+    calls to members that are still ringing are hung up.
+
+    This places and hangs up calls, so it's run in the background rather than
+    by the webhook.
+    """
+    if status not in models.CallLeg.FINISHED_STATUSES:
+        return
+
+    conversation = db.get_conversation_by_call(call_uuid)
+
+    if conversation is not None:
+        if conversation.finished is None:
+            db.finish_conversation(conversation)
+        _dial_next_members_if_waiting(conversation.uuid, client=client)
+
+    elif db.update_call_leg_status(call_uuid, status):
+        leg = db.get_call_leg(call_uuid)
+
+        if leg is not None:
+            _dial_next_members_if_waiting(leg.conversation_uuid, client=client)
+
+    else:
+        return
+
+    # The call that finished has freed up capacity for conversations that are
+    # waiting for it.
+    if _available_capacity() is not None:
+        for waiting in db.get_waiting_conversations(limit=MAX_WAITING_CONVERSATIONS):
+            if not _available_capacity():
+                break
+            _dial_next_members_if_waiting(waiting.uuid, client=client)
@@ -16,17 +16,35 @@ import logging
 
 import flask
 import hotline.database.ext
-from hotline import csrf, injector
-from hotline.telephony import lowlevel, smschat, verification, voice
+from hotline import csrf, injector, jsoncodec
+from hotline.telephony import (
+    background,
+    call_events,
+    lowlevel,
+    smschat,
+    verification,
+    voice,
+)
 
 blueprint = flask.Blueprint("telephony", __name__)
 hotline.database.ext.init_app(blueprint)
 
 
+def _get_json():
+    try:
+        return jsoncodec.loads(flask.request.get_data())
+    except ValueError:
+        flask.abort(400)
+
+
+def _json_response(data) -> flask.Response:
+    return flask.Response(jsoncodec.dumps(data), mimetype="application/json")
+
+
 @csrf.exempt
 @blueprint.route("/telephony/inbound-sms", methods=["POST"])
 def inbound_sms():
-    message = flask.request.get_json()
+    message = _get_json()
 
     logging.info(f"Handling message from {message['msisdn']} to {message['to']}")
 
@@ -47,14 +65,11 @@ def inbound_sms():
     return "", 204
 
 
-HOLD_MUSIC = "https://assets.ctfassets.net/j7pfe8y48ry3/530pLnJVZmiUu8mkEgIMm2/dd33d28ab6af9a2d32681ae80004886e/oaklawn-dreams.mp3"
-
-
 @csrf.exempt
 @blueprint.route("/telephony/inbound-call", methods=["POST"])
 @injector.needs("nexmo.client")
 def inbound_call(client):
-    call = flask.request.get_json()
+    call = _get_json()
     event_number = lowlevel.normalize_e164_number(call["to"])
     reporter_number = lowlevel.normalize_e164_number(call["from"])
     conversation_uuid = call["conversation_uuid"]
@@ -68,7 +83,7 @@ def inbound_call(client):
         host=flask.request.host,
     )
 
-    return flask.jsonify(ncco)
+    return _json_response(ncco)
 
 
 @csrf.exempt
@@ -78,7 +93,7 @@ def inbound_call(client):
 )
 @injector.needs("nexmo.client")
 def connect_to_conference(origin_conversation_uuid, origin_call_uuid, client):
-    call = flask.request.get_json()
+    call = _get_json()
     member_number = lowlevel.normalize_e164_number(call["to"])
     event_number = lowlevel.normalize_e164_number(call["from"])
 
@@ -87,14 +102,28 @@ def connect_to_conference(origin_conversation_uuid, origin_call_uuid, client):
         member_number=member_number,
         origin_conversation_uuid=origin_conversation_uuid,
         origin_call_uuid=origin_call_uuid,
+        member_call_uuid=call.get("uuid"),
     )
 
-    return flask.jsonify(ncco)
+    return _json_response(ncco)
 
 
 @csrf.exempt
 @blueprint.route("/telephony/event", methods=["POST"])
 def event():
-    # For now, we do nothing with these events, but this is required by
-    # nexmo.
+    # Nexmo reports the progress of every call here. Only the calls placed to
+    # members are tracked; events for other calls are ignored.
+    call_event = _get_json()
+    call_events.record(call_event)
+
+    # Finished calls can mean that the next members need to be dialed, so
+    # they're handled right away rather than when the events are written, but
+    # in the background, since placing calls can be slow.
+    if "uuid" in call_event and "status" in call_event:
+        background.submit(
+            voice.handle_call_status,
+            call_uuid=call_event["uuid"],
+            status=call_event["status"],
+        )
+
     return "", 204
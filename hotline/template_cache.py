@@ -0,0 +1,94 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Caches compiled templates on the filesystem.
+
+Without this, every worker compiles each template the first time it's
+rendered. The cache lives in Jinja's default directory, inside the temporary
+directory, which is writable on App Engine and shared by the workers of an
+instance, so each template is compiled once per instance. Set
+TEMPLATE_CACHE_DIR to use another directory. Warmup fills the cache with
+:func:`precompile`.
+
+Cached templates are loaded as code, so the directory must only be writable
+by the app. Jinja's default directory is private to the app's user, and Jinja
+refuses to use it if another user owns it.
+
+If the directory can't be written to, errors writing to the cache are ignored;
+the templates are then compiled in memory as usual.
+"""
+
+import logging
+import os
+import pickle
+from typing import Optional
+
+import flask
+import jinja2
+
+
+class _BytecodeCache(jinja2.FileSystemBytecodeCache):
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except (EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            # A corrupt entry; the template will be compiled and the entry
+            # replaced.
+            bucket.reset()
+
+    def dump_bytecode(self, bucket):
+        # Workers may share the cache, so write atomically to make sure they
+        # never load a partially written entry.
+        filename = self._get_cache_filename(bucket)
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+
+        try:
+            with open(temp_filename, "wb") as fh:
+                bucket.write_bytecode(fh)
+            os.replace(temp_filename, filename)
+        except OSError as exc:
+            logging.warning(
+                f"Unable to write {bucket.key} to the template cache: {exc}"
+            )
+
+
+def init_app(app: flask.Flask, directory: Optional[str] = None) -> None:
+    directory = directory or os.environ.get("TEMPLATE_CACHE_DIR")
+
+    if directory is None:
+        try:
+            app.jinja_env.bytecode_cache = _BytecodeCache()
+        except (OSError, RuntimeError) as exc:
+            logging.warning(f"Unable to use the template cache: {exc}")
+        return
+
+    directory = os.path.abspath(directory)
+
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError:
+        pass
+
+    app.jinja_env.bytecode_cache = _BytecodeCache(directory)
+
+
+def precompile(app: flask.Flask) -> int:
+    """Compiles every template, which fills the bytecode cache if there is
+    one. Returns the number of templates compiled."""
+    names = app.jinja_env.list_templates(extensions=["html"])
+
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    return len(names)
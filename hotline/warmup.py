@@ -0,0 +1,103 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Gets a new instance ready to serve before real requests arrive.
+
+There are two stages:
+
+* :func:`preload` loads read-only data - phonenumbers metadata, compiled
+  templates and rendered pages. It doesn't import the client libraries or open
+  any connections, so it's safe to call before gunicorn forks its workers
+  (``--preload``), which lets the workers share this data copy-on-write.
+* :func:`warmup` does everything else - importing the client libraries,
+  connecting to the database and creating the Nexmo and Firebase clients.
+  These can't be shared across a fork (grpc, which Firebase uses, doesn't
+  support it), so this runs in each worker when App Engine sends a warmup
+  request.
+"""
+
+import importlib
+import logging
+
+import flask
+import hotline.database.ext
+import hotline.pages.webhandlers
+import hotline.template_cache
+from hotline import injector
+from hotline.database import highlevel, models
+from hotline.telephony import lowlevel
+
+blueprint = flask.Blueprint("warmup", __name__)
+hotline.database.ext.init_app(blueprint)
+
+# Modules that are imported lazily by the code paths that use them.
+_LAZY_MODULES = ["firebase_admin.auth", "nexmo", "google.api_core.retry", "cmarkgfm"]
+
+
+def _import_lazy_modules() -> None:
+    for name in _LAZY_MODULES:
+        importlib.import_module(name)
+
+
+def _load_phonenumber_metadata() -> None:
+    # The countries can be configured with "phone_metadata": {"countries": [...]}
+    # in the secrets. Otherwise, just US - the default region used when parsing
+    # numbers - is loaded here, and warmup() loads the rest from the database.
+    countries = injector.get("secrets.phone_metadata.countries", ["US"])
+    lowlevel.preload_number_metadata(countries)
+
+
+def preload(app: flask.Flask) -> None:
+    _load_phonenumber_metadata()
+    hotline.template_cache.precompile(app)
+    hotline.pages.webhandlers.render_all(app)
+
+
+def _warm_clients() -> None:
+    # Warming up is best-effort: if a client can't be created here, the
+    # request that needs it will report the error.
+    try:
+        injector.get("nexmo.client")
+    except Exception:
+        logging.exception("Unable to create the Nexmo client.")
+
+    if injector.get("secrets.firebase.development_mode", False):
+        return
+
+    try:
+        injector.get("firebase_admin_app")
+    except Exception:
+        logging.exception("Unable to create the Firebase app.")
+
+
+def warmup(app: flask.Flask) -> None:
+    """Runs :func:`preload` (which is cheap if it already ran) and then opens
+    connections and primes caches. Needs an open database connection."""
+    preload(app)
+    _import_lazy_modules()
+
+    models.db.execute_sql("SELECT 1")
+    highlevel.prime_organizer_cache()
+
+    # Without configured countries, load the ones the hotline actually uses.
+    if injector.get("secrets.phone_metadata.countries", None) is None:
+        lowlevel.preload_number_metadata(highlevel.get_number_countries())
+
+    _warm_clients()
+
+
+@blueprint.route("/_ah/warmup")
+def warmup_view():
+    warmup(flask.current_app)
+    return "", 204
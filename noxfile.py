@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import glob
 import os
 
 import nox
@@ -28,8 +29,8 @@ def freeze(session):
 @nox.session(python="3.7")
 def format(session):
     session.install("black", "isort")
-    session.run("black", "hotline", "tests", "noxfile.py")
-    session.run("isort", "-rc", "hotline", "tests", "noxfile.py")
+    session.run("black", "hotline", "tests", "benchmarks", "noxfile.py")
+    session.run("isort", "-rc", "hotline", "tests", "benchmarks", "noxfile.py")
 
 
 @nox.session(python="3.7")
@@ -55,6 +56,15 @@ def test(session):
     )
 
 
+@nox.session(python="3.7")
+def benchmark(session):
+    session.install("-r", "requirements.txt")
+    env = {"PYTHONPATH": os.getcwd()}
+    scripts = session.posargs or sorted(glob.glob("benchmarks/bench_*.py"))
+    for script in scripts:
+        session.run("python", script, env=env)
+
+
 @nox.session(python="3.7")
 def cli(session):
     session.install("-r", "requirements.txt")
@@ -86,6 +96,12 @@ def serve_prod(session):
     session.run("gunicorn", "-b", ":8080", "hotline.__main__:app")
 
 
+@nox.session(python="3.7")
+def serve_telephony(session):
+    session.install("-r", "requirements.txt")
+    session.run("gunicorn", "-b", ":8081", "hotline.telephony.__main__:app")
+
+
 @nox.session(python="3.7")
 def shell(session):
     session.install("-r", "requirements.txt")
@@ -0,0 +1,114 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from unittest import mock
+
+import cachetools
+import pytest
+from hotline import injector
+from hotline.auth import webhandlers
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    with db.db:
+        yield db
+
+
+@pytest.fixture
+def session_cache(database):
+    injector.set("auth.session_cache", cachetools.TTLCache(maxsize=10, ttl=60))
+    yield
+    injector.reset()
+
+
+@pytest.fixture
+def verify_session_cookie():
+    with mock.patch(
+        "firebase_admin.auth.verify_session_cookie", autospec=True
+    ) as verify_session_cookie:
+        verify_session_cookie.return_value = {
+            "user_id": "abc123",
+            "auth_time": int(time.time()) - 60,
+            "exp": time.time() + 3600,
+        }
+        yield verify_session_cookie
+
+
+def test_verify_session_cookie_is_cached(session_cache, verify_session_cookie):
+    claims = webhandlers._verify_session_cookie("cookie", "app")
+    claims["super_admin"] = True
+
+    claims = webhandlers._verify_session_cookie("cookie", "app")
+
+    verify_session_cookie.assert_called_once_with(
+        "cookie", check_revoked=True, app="app"
+    )
+    assert claims == {"user_id": "abc123", "auth_time": mock.ANY, "exp": mock.ANY}
+
+
+def test_verify_session_cookie_expired_claims(session_cache, verify_session_cookie):
+    verify_session_cookie.return_value["exp"] = time.time() - 1
+
+    webhandlers._verify_session_cookie("cookie", "app")
+    webhandlers._verify_session_cookie("cookie", "app")
+
+    assert verify_session_cookie.call_count == 2
+
+
+def test_evict_session(session_cache, verify_session_cookie):
+    webhandlers._verify_session_cookie("cookie", "app")
+    webhandlers._evict_session("cookie")
+    webhandlers._verify_session_cookie("cookie", "app")
+
+    assert verify_session_cookie.call_count == 2
+
+
+def test_verify_session_cookie_missing(session_cache, verify_session_cookie):
+    with pytest.raises(ValueError):
+        webhandlers._verify_session_cookie(None, "app")
+
+    verify_session_cookie.assert_not_called()
+
+
+def test_verify_session_cookie_revoked(session_cache, verify_session_cookie):
+    webhandlers._verify_session_cookie("cookie", "app")
+
+    # Logging out in another worker doesn't touch this worker's cache, but the
+    # revocation is still noticed.
+    highlevel.revoke_sessions("abc123")
+
+    with pytest.raises(ValueError):
+        webhandlers._verify_session_cookie("cookie", "app")
+
+    assert verify_session_cookie.call_count == 1
+
+
+def test_verify_session_cookie_after_revocation(session_cache, verify_session_cookie):
+    highlevel.revoke_sessions("abc123")
+
+    # Logging in again after logging out creates a new session.
+    verify_session_cookie.return_value["auth_time"] = int(time.time()) + 1
+
+    claims = webhandlers._verify_session_cookie("cookie", "app")
+
+    assert claims["user_id"] == "abc123"
@@ -0,0 +1,32 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+_template_cache_dir = None
+
+
+def pytest_configure(config):
+    # Importing hotline.app sets up the template cache, which happens while
+    # tests are collected, so the cache is pointed at a directory of the test
+    # run's own before then.
+    global _template_cache_dir
+    _template_cache_dir = tempfile.mkdtemp(prefix="hotline-template-cache-")
+    os.environ["TEMPLATE_CACHE_DIR"] = _template_cache_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_template_cache_dir, ignore_errors=True)
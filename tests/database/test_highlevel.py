@@ -0,0 +1,394 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from unittest import mock
+
+import pytest
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+
+USER = {"user_id": "abc123", "name": "Alice", "email": "alice@example.com"}
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    highlevel._organizer_cache.clear()
+
+    with db.db:
+        yield db
+
+
+def create_event(slug="test"):
+    event = db.Event()
+    event.name = "Test event"
+    event.slug = slug
+    event.save()
+
+    return event
+
+
+def test_get_event_for_organizer(database):
+    event = create_event()
+    highlevel.add_event_organizer(event, USER)
+
+    with mock.patch.object(
+        highlevel,
+        "check_if_user_is_organizer",
+        wraps=highlevel.check_if_user_is_organizer,
+    ) as check_if_user_is_organizer:
+        assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+        assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+    check_if_user_is_organizer.assert_called_once_with("test", USER["user_id"])
+
+
+def test_get_event_for_organizer_not_organizer(database):
+    create_event()
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) is None
+
+
+def test_get_event_for_organizer_removed(database):
+    event = create_event()
+    highlevel.add_event_organizer(event, USER)
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+    organizer = db.EventOrganizer.get()
+    highlevel.remove_event_organizer(str(organizer.id))
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) is None
+
+
+def test_get_event_for_organizer_removed_by_another_process(database):
+    event = create_event()
+    highlevel.add_event_organizer(event, USER)
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+    # Another process removes the organizer, which doesn't touch this
+    # process's cache.
+    organizer = db.EventOrganizer.get()
+    with mock.patch.object(highlevel, "_invalidate_organizer_cache"):
+        highlevel.remove_event_organizer(str(organizer.id))
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) is None
+
+
+def test_get_event_for_organizer_slug_changed(database):
+    event = create_event()
+    highlevel.add_event_organizer(event, USER)
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+    event.slug = "renamed"
+    event.save()
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) is None
+    assert highlevel.get_event_for_organizer("renamed", USER["user_id"]) == event
+
+
+def test_accept_organizer_invitation_invalidates_cache(database):
+    event = create_event()
+    highlevel.add_pending_event_organizer(event, USER["email"])
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) is None
+
+    invitation = db.EventOrganizer.get()
+    highlevel.accept_organizer_invitation(str(invitation.id), USER)
+
+    assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+
+def test_prime_organizer_cache(database):
+    event = create_event()
+    highlevel.add_event_organizer(event, USER)
+    highlevel.add_pending_event_organizer(event, "bob@example.com")
+
+    highlevel.prime_organizer_cache()
+
+    assert highlevel._organizer_cache == {
+        USER["user_id"]: {"test": (event.id, event.version)}
+    }
+
+    with mock.patch.object(
+        highlevel, "check_if_user_is_organizer"
+    ) as check_if_user_is_organizer:
+        assert highlevel.get_event_for_organizer("test", USER["user_id"]) == event
+
+    check_if_user_is_organizer.assert_not_called()
+
+
+def test_get_number_countries(database):
+    db.Number.create(number="+15555550000", country="US")
+    db.Number.create(number="+445555550000", country="GB")
+    event = create_event()
+    event.country = "CA"
+    event.save()
+
+    assert highlevel.get_number_countries() == {"US", "GB", "CA"}
+
+
+def test_update_call_leg_status(database):
+    event = create_event()
+    highlevel.add_call_leg(event, "conversation", "+101", "leg")
+
+    assert highlevel.update_call_leg_status("leg", "ringing")
+    assert highlevel.update_call_leg_status("leg", "answered")
+
+    # Out of order events don't move the status backwards.
+    assert not highlevel.update_call_leg_status("leg", "ringing")
+    assert db.CallLeg.get_by_id("leg").status == "answered"
+
+    assert highlevel.update_call_leg_status("leg", "completed")
+    assert not highlevel.update_call_leg_status("leg", "cancelled")
+
+    leg = db.CallLeg.get_by_id("leg")
+    assert leg.status == "completed"
+    assert leg.answered is not None
+
+    # Events for calls that aren't legs are ignored.
+    assert not highlevel.update_call_leg_status("other", "completed")
+
+
+def test_answered_and_unanswered_call_legs(database):
+    event = create_event()
+    highlevel.add_call_leg(event, "conversation", "+101", "one")
+    highlevel.add_call_leg(event, "conversation", "+202", "two")
+    highlevel.add_call_leg(event, "conversation", "+303", "three")
+    highlevel.add_call_leg(event, "other", "+101", "four")
+
+    highlevel.update_call_leg_status("one", "answered")
+    highlevel.update_call_leg_status("one", "completed")
+    highlevel.update_call_leg_status("two", "ringing")
+    highlevel.update_call_leg_status("three", "busy")
+
+    assert highlevel.count_answered_call_legs("conversation") == 1
+    assert [leg.uuid for leg in highlevel.get_unanswered_call_legs("conversation")] == [
+        "two"
+    ]
+
+
+def test_record_call_events(database):
+    event = create_event()
+    highlevel.add_call_leg(event, "conversation", "+101", "one")
+    highlevel.add_call_leg(event, "conversation", "+202", "two")
+
+    start = datetime.datetime(2019, 5, 1, 12, 0, 0)
+    second = datetime.timedelta(seconds=1)
+
+    # The other leg was answered and hung up by the voice handlers while the
+    # events were buffered.
+    highlevel.update_call_leg_status("two", "answered")
+    highlevel.update_call_leg_status("two", "cancelled")
+
+    updated = highlevel.record_call_events(
+        [
+            highlevel.CallEvent("one", "answered", start + 5 * second, None),
+            highlevel.CallEvent("one", "ringing", start + 1 * second, None),
+            highlevel.CallEvent("one", "completed", start + 65 * second, 60),
+            highlevel.CallEvent("two", "ringing", start + 1 * second, None),
+            highlevel.CallEvent("other", "ringing", start, None),
+            highlevel.CallEvent("one", "machine-ish", start, None),
+        ]
+    )
+
+    assert updated == 2
+
+    one = db.CallLeg.get_by_id("one")
+    assert one.status == "completed"
+    assert one.ringing == start + 1 * second
+    assert one.answered == start + 5 * second
+    assert one.ended == start + 65 * second
+    assert one.duration == 60
+
+    two = db.CallLeg.get_by_id("two")
+    assert two.status == "cancelled"
+    assert two.ringing == start + 1 * second
+    assert two.answered is not None
+
+
+def test_get_call_metrics(database):
+    event = create_event()
+    start = datetime.datetime(2019, 5, 1, 12, 0, 0)
+    second = datetime.timedelta(seconds=1)
+
+    # Answered by the second member after 10 seconds.
+    for uuid, number in [("a1", "+101"), ("a2", "+202")]:
+        leg = highlevel.add_call_leg(event, "answered", number, uuid)
+        leg.created = start
+        leg.ringing = start + 2 * second
+        leg.save()
+
+    db.CallLeg.update(answered=start + 10 * second).where(
+        db.CallLeg.uuid == "a2"
+    ).execute()
+    db.CallLeg.update(ended=start + 12 * second).where(
+        db.CallLeg.uuid == "a1"
+    ).execute()
+
+    # Never answered.
+    leg = highlevel.add_call_leg(event, "missed", "+101", "m1")
+    leg.ringing = start
+    leg.ended = start + 30 * second
+    leg.save()
+
+    metrics = highlevel.get_call_metrics(event)
+
+    assert metrics.calls == 2
+    assert metrics.answered_calls == 1
+    assert metrics.average_answer_time == pytest.approx(10, abs=0.001)
+    assert metrics.average_ring_time == pytest.approx((8 + 10 + 30) / 3, abs=0.001)
+
+
+def test_get_call_metrics_no_calls(database):
+    metrics = highlevel.get_call_metrics(create_event())
+
+    assert metrics == highlevel.CallMetrics(0, 0, None, None)
+
+
+def add_member(event, name, number, verified=True):
+    return db.EventMember.create(
+        event=event, name=name, number=number, verified=verified
+    )
+
+
+def test_get_on_call_event_members(database):
+    event = create_event()
+    other_event = create_event(slug="other")
+    alice = add_member(event, "Alice", "+101")
+    bob = add_member(event, "Bob", "+202")
+    judy = add_member(event, "Judy", "+303", verified=False)
+    carol = add_member(other_event, "Carol", "+404")
+
+    now = datetime.datetime(2019, 5, 1, 12, 0)
+    hour = datetime.timedelta(hours=1)
+
+    highlevel.add_shift(event, alice, now - hour, now + hour)
+    highlevel.add_shift(event, alice, now, now + 2 * hour)
+    highlevel.add_shift(event, bob, now + hour, now + 2 * hour)
+    highlevel.add_shift(event, judy, now - hour, now + hour)
+    highlevel.add_shift(other_event, carol, now - hour, now + hour)
+
+    assert highlevel.get_on_call_event_members(event, now=now) == [alice]
+    assert sorted(
+        member.name
+        for member in highlevel.get_on_call_event_members(event, now=now + hour)
+    ) == ["Alice", "Bob"]
+
+
+def test_get_on_call_event_members_nobody_on_call(database):
+    event = create_event()
+    add_member(event, "Alice", "+101")
+    bob = add_member(event, "Bob", "+202")
+    add_member(event, "Judy", "+303", verified=False)
+
+    now = datetime.datetime(2019, 5, 1, 12, 0)
+    highlevel.add_shift(event, bob, now - datetime.timedelta(hours=2), now)
+
+    # When nobody is on call, every verified member is.
+    assert sorted(
+        member.name for member in highlevel.get_on_call_event_members(event, now=now)
+    ) == ["Alice", "Bob"]
+
+
+def test_remove_event_member_removes_shifts(database):
+    event = create_event()
+    alice = add_member(event, "Alice", "+101")
+    now = datetime.datetime(2019, 5, 1, 12, 0)
+    highlevel.add_shift(event, alice, now, now + datetime.timedelta(hours=1))
+
+    highlevel.remove_event_member(str(alice.id))
+
+    assert db.OnCallShift.select().count() == 0
+
+
+def test_get_member_and_event_by_numbers(database):
+    event = create_event()
+    event.primary_number = "+5678"
+    event.save()
+    other_event = create_event(slug="other")
+    other_event.primary_number = "+8765"
+    other_event.save()
+
+    # The same person is a member of both events.
+    add_member(other_event, "Alice", "+101")
+    alice = add_member(event, "Alice", "+101")
+
+    member, member_event = highlevel.get_member_and_event_by_numbers("+101", "+5678")
+
+    assert member == alice
+    assert member_event == event
+
+    assert highlevel.get_member_and_event_by_numbers("+202", "+5678") is None
+    assert highlevel.get_member_and_event_by_numbers("+101", "+1234") is None
+
+
+def test_claim_conversation(database):
+    event = create_event()
+    highlevel.create_conversation(event, "conversation", "call", "https://answer")
+
+    assert highlevel.claim_conversation("conversation")
+
+    # Another worker can't claim it, so it asks for it to be checked again,
+    # which keeps the claim when it's first released.
+    assert not highlevel.claim_conversation("conversation")
+    assert not highlevel.release_conversation("conversation")
+    assert not highlevel.claim_conversation("conversation")
+
+    assert not highlevel.release_conversation("conversation")
+    assert highlevel.release_conversation("conversation")
+
+    assert highlevel.claim_conversation("conversation")
+
+
+def test_claim_conversation_expires(database):
+    event = create_event()
+    highlevel.create_conversation(event, "conversation", "call", "https://answer")
+
+    assert highlevel.claim_conversation("conversation")
+
+    db.Conversation.update(
+        dialing_until=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    ).execute()
+
+    assert highlevel.claim_conversation("conversation")
+
+
+def test_get_waiting_conversations(database):
+    event = create_event()
+    long_ago = datetime.datetime.utcnow() - 2 * highlevel.ACTIVE_CALL_WINDOW
+
+    for uuid in ["waiting", "ringing", "answered", "stale", "finished"]:
+        highlevel.create_conversation(event, uuid, f"{uuid}-call", "https://answer")
+
+    highlevel.add_call_leg(event, "ringing", "+101", "ringing-leg")
+    highlevel.add_call_leg(event, "answered", "+101", "answered-leg")
+    highlevel.update_call_leg_status("answered-leg", "answered")
+    highlevel.update_call_leg_status("answered-leg", "completed")
+    # Nexmo never reported that this call ended.
+    leg = highlevel.add_call_leg(event, "stale", "+101", "stale-leg")
+    leg.created = long_ago
+    leg.save()
+    highlevel.finish_conversation(highlevel.get_conversation("finished"))
+
+    waiting = highlevel.get_waiting_conversations()
+
+    assert [conversation.uuid for conversation in waiting] == ["waiting", "stale"]
@@ -0,0 +1,117 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+import peewee
+import pytest
+from hotline import injector
+from hotline.database import create_tables, highlevel, instrumentation
+from hotline.database import models as db
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    with db.db:
+        yield db
+
+
+@pytest.fixture
+def query_stats_config():
+    injector.set("secrets", {"query_stats": {"max_queries": 2}})
+    yield
+    injector.reset()
+
+
+def test_connect_returns_instrumented_database(database):
+    assert isinstance(db.db.obj, peewee.SqliteDatabase)
+    assert isinstance(db.db.obj, instrumentation.InstrumentedDatabaseMixin)
+
+
+def test_not_recording_outside_of_request(database):
+    db.Event.select().count()
+
+    assert instrumentation.stop() is None
+
+
+def test_records_queries(database):
+    instrumentation.start()
+
+    for slug in ("one", "two", "three"):
+        highlevel.get_event_by_slug(slug)
+    db.Number.select().count()
+
+    stats = instrumentation.stop()
+
+    assert stats.count == 4
+    assert stats.duration > 0
+    assert len(stats.shapes) == 2
+
+    repeated = stats.repeated_queries(3)
+    assert len(repeated) == 1
+    assert repeated[0][1] == 3
+    assert "event" in repeated[0][0]
+
+
+def test_report(database, query_stats_config, caplog):
+    instrumentation.start()
+
+    for slug in ("one", "two", "three", "four", "five"):
+        highlevel.get_event_by_slug(slug)
+
+    stats = instrumentation.stop()
+
+    with caplog.at_level(logging.WARNING):
+        instrumentation.report(stats, "/e/test")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert "/e/test issued 5 queries" in messages[0]
+    assert "Possible N+1 on /e/test, query repeated 5 times" in messages[1]
+
+
+@pytest.fixture
+def slow_query_log():
+    # A threshold of zero captures every query.
+    instrumentation.enable_slow_query_log(threshold_ms=0, size=2)
+    yield
+    instrumentation.disable_slow_query_log()
+
+
+def test_slow_query_log(database, slow_query_log):
+    highlevel.get_event_by_slug("one")
+
+    queries = instrumentation.get_slow_queries()
+
+    assert len(queries) == 1
+    assert queries[0].sql.startswith("SELECT")
+    assert queries[0].params[0] == "str"
+    assert "event" in queries[0].plan
+
+
+def test_slow_query_log_is_bounded(database, slow_query_log):
+    for slug in ("one", "two", "three"):
+        highlevel.get_event_by_slug(slug)
+
+    assert len(instrumentation.get_slow_queries()) == 2
+
+
+def test_slow_query_log_disabled(database):
+    highlevel.get_event_by_slug("one")
+
+    assert instrumentation.get_slow_queries() == []
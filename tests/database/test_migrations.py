@@ -0,0 +1,150 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+import pkgutil
+
+import playhouse.migrate
+from hotline.database import create_tables, highlevel, migrations
+from hotline.database import models as db
+
+# The last migration that the baseline schema includes.
+BASELINE_MIGRATION = "0004_add_number_features"
+
+# The tables as create_tables made them before the later migrations.
+BASELINE_SCHEMA = """
+CREATE TABLE "number" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "number" TEXT NOT NULL,
+    "country" VARCHAR(255) NOT NULL,
+    "pool" INTEGER NOT NULL,
+    "features" TEXT NOT NULL
+);
+CREATE INDEX "number_number" ON "number" ("number");
+CREATE TABLE "event" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "name" TEXT NOT NULL,
+    "slug" VARCHAR(255) NOT NULL,
+    "primary_number" TEXT,
+    "primary_number_id" INTEGER,
+    "country" VARCHAR(255) NOT NULL,
+    "coc_link" TEXT,
+    "website" TEXT,
+    "contact_email" TEXT,
+    "location" TEXT,
+    "voice_greeting" TEXT,
+    "sms_greeting" TEXT,
+    FOREIGN KEY ("primary_number_id") REFERENCES "number" ("id")
+);
+CREATE UNIQUE INDEX "event_slug" ON "event" ("slug");
+CREATE INDEX "event_primary_number_id" ON "event" ("primary_number_id");
+CREATE INDEX "event_primary_number" ON "event" ("primary_number");
+CREATE TABLE "auditlog" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "timestamp" DATETIME NOT NULL,
+    "kind" INTEGER NOT NULL,
+    "description" TEXT,
+    "event_id" INTEGER,
+    "user" VARCHAR(255),
+    "metadata" TEXT,
+    "reporter_number" TEXT,
+    FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+);
+CREATE INDEX "auditlog_event_id" ON "auditlog" ("event_id");
+CREATE INDEX "auditlog_event_id_timestamp" ON "auditlog" ("event_id", "timestamp");
+CREATE TABLE "blocklist" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "timestamp" DATETIME NOT NULL,
+    "event_id" INTEGER NOT NULL,
+    "number" TEXT NOT NULL,
+    "blocked_by" TEXT,
+    FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+);
+CREATE INDEX "blocklist_event_id" ON "blocklist" ("event_id");
+CREATE TABLE "eventmember" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "event_id" INTEGER NOT NULL,
+    "name" TEXT NOT NULL,
+    "number" TEXT NOT NULL,
+    "verified" INTEGER NOT NULL,
+    FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+);
+CREATE INDEX "eventmember_event_id" ON "eventmember" ("event_id");
+CREATE INDEX "eventmember_event_id_verified" ON "eventmember" ("event_id", "verified");
+CREATE INDEX "eventmember_number_verified" ON "eventmember" ("number", "verified");
+CREATE TABLE "eventorganizer" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "event_id" INTEGER NOT NULL,
+    "user_id" VARCHAR(255),
+    "user_name" TEXT,
+    "user_email" TEXT NOT NULL,
+    FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+);
+CREATE INDEX "eventorganizer_event_id" ON "eventorganizer" ("event_id");
+CREATE INDEX "eventorganizer_user_id" ON "eventorganizer" ("user_id");
+CREATE TABLE "smschat" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "timestamp" DATETIME NOT NULL,
+    "event_id" INTEGER NOT NULL,
+    "room" TEXT NOT NULL,
+    "relay_number" VARCHAR(255) NOT NULL,
+    FOREIGN KEY ("event_id") REFERENCES "event" ("id")
+);
+CREATE INDEX "smschat_event_id" ON "smschat" ("event_id");
+CREATE TABLE "smschatconnection" (
+    "user_number" VARCHAR(255) NOT NULL,
+    "relay_number" VARCHAR(255) NOT NULL,
+    "user_name" VARCHAR(255) NOT NULL,
+    "smschat_id" INTEGER NOT NULL,
+    PRIMARY KEY ("user_number", "relay_number"),
+    FOREIGN KEY ("smschat_id") REFERENCES "smschat" ("id")
+);
+CREATE INDEX "smschatconnection_smschat_id" ON "smschatconnection" ("smschat_id");
+CREATE INDEX "smschatconnection_user_number" ON "smschatconnection" ("user_number");
+"""
+
+
+def describe_schema():
+    schema = {}
+
+    for table in db.db.get_tables():
+        columns = {column.name for column in db.db.get_columns(table)}
+        indexes = {tuple(index.columns) for index in db.db.get_indexes(table)}
+        schema[table] = (columns, indexes)
+
+    return schema
+
+
+def test_migrations_match_models(tmpdir):
+    highlevel.initialize_db(database=f"sqlite:///{tmpdir.join('created.sqlite')}")
+    create_tables.create_tables()
+    with db.db.connection_context():
+        expected = describe_schema()
+
+    highlevel.initialize_db(database=f"sqlite:///{tmpdir.join('migrated.sqlite')}")
+    with db.db.connection_context():
+        db.db.connection().executescript(BASELINE_SCHEMA)
+
+        names = sorted(
+            module.name
+            for module in pkgutil.iter_modules(migrations.__path__)
+            if module.name > BASELINE_MIGRATION
+        )
+
+        for name in names:
+            module = importlib.import_module(f"hotline.database.migrations.{name}")
+            migrator = playhouse.migrate.SqliteMigrator(db.db)
+            playhouse.migrate.migrate(*module.migrate(migrator))
+
+        assert describe_schema() == expected
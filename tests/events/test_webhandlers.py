@@ -0,0 +1,256 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from unittest import mock
+
+import peewee
+import pytest
+from hotline import csrf, injector
+from hotline.app import app
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.events import webhandlers
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    webhandlers._rendered_event_pages.clear()
+
+    yield db
+
+
+@pytest.fixture
+def client():
+    injector.set("secrets", {})
+    app.config["TESTING"] = True
+    yield app.test_client()
+    injector.reset()
+
+
+def create_event():
+    with db.db:
+        event = db.Event()
+        event.name = "Test event"
+        event.slug = "test"
+        event.save()
+
+    return event
+
+
+def test_event_version_bumped_on_save(database):
+    event = create_event()
+
+    assert event.version == 1
+    modified = event.modified
+
+    with db.db:
+        event.save()
+
+    assert event.version == 2
+    assert event.modified >= modified
+
+
+def test_event_version_bumped_by_concurrent_saves(database):
+    create_event()
+
+    with db.db:
+        # Two requests load the event and then save it.
+        first = db.Event.get()
+        second = db.Event.get()
+
+        first.save()
+        second.save()
+
+    assert first.version == 2
+    assert second.version == 3
+
+
+def test_event_version_kept_when_save_fails(database):
+    event = create_event()
+
+    with db.db, mock.patch.object(
+        peewee.Model, "save", side_effect=peewee.OperationalError("locked")
+    ):
+        with pytest.raises(peewee.OperationalError):
+            event.save()
+
+    # Not a query expression, which would compare equal to anything.
+    assert isinstance(event.version, int)
+    assert event.version == 1
+
+
+def test_info(database, client):
+    create_event()
+
+    response = client.get("/e/test", base_url="https://localhost")
+
+    assert response.status_code == 200
+    assert b"Test event" in response.data
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+    assert "public" in response.headers["Cache-Control"]
+    assert "Set-Cookie" not in response.headers
+
+
+def test_info_not_modified(database, client):
+    create_event()
+
+    etag = client.get("/e/test", base_url="https://localhost").headers["ETag"]
+    response = client.get(
+        "/e/test", base_url="https://localhost", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+
+
+def test_info_is_rendered_once_per_version(database, client):
+    event = create_event()
+
+    with mock.patch.object(
+        webhandlers.flask, "render_template", wraps=webhandlers.flask.render_template
+    ) as render_template:
+        client.get("/e/test", base_url="https://localhost")
+        client.get("/e/test", base_url="https://localhost")
+
+        assert render_template.call_count == 1
+
+        with db.db:
+            event.name = "Renamed event"
+            event.save()
+
+        response = client.get("/e/test", base_url="https://localhost")
+
+        assert render_template.call_count == 2
+
+    assert b"Renamed event" in response.data
+
+
+@pytest.fixture
+def organizer_client(database):
+    injector.set("secrets", {"firebase": {"development_mode": True}})
+    app.config["TESTING"] = True
+    with mock.patch.dict(app.config, {"SECRET_KEY": "secret"}):
+        yield app.test_client()
+    injector.reset()
+
+
+def create_event_with_member():
+    event = create_event()
+
+    with db.db:
+        db.EventOrganizer.create(
+            event=event, user_id="dev", user_email="developer@conducthotline.com"
+        )
+        member = db.EventMember.create(
+            event=event, name="Alice", number="+101", verified=True
+        )
+        db.EventMember.create(event=event, name="Judy", number="+303", verified=False)
+
+    return event, member
+
+
+def test_schedule(organizer_client):
+    event, member = create_event_with_member()
+
+    with db.db:
+        highlevel.add_shift(
+            event,
+            member,
+            datetime.datetime(2019, 5, 1, 9, 0),
+            datetime.datetime(2019, 5, 1, 17, 0),
+        )
+
+    response = organizer_client.get(
+        "/manage/events/test/schedule", base_url="https://localhost"
+    )
+
+    assert response.status_code == 200
+    assert b"2019-05-01 09:00 UTC" in response.data
+    # Only verified members can be put on call.
+    assert b'<option value="%d">Alice</option>' % member.id in response.data
+    assert b"Judy" not in response.data
+
+
+def test_schedule_add_shift(organizer_client):
+    event, member = create_event_with_member()
+
+    with mock.patch.object(csrf.seasurf, "_csrf_disable", True):
+        response = organizer_client.post(
+            "/manage/events/test/schedule",
+            data={
+                "member": member.id,
+                "start": "2019-05-01T09:00",
+                "end": "2019-05-01T17:00",
+            },
+            base_url="https://localhost",
+        )
+
+    assert response.status_code == 302
+
+    with db.db:
+        shift = db.OnCallShift.get()
+        assert shift.member == member
+        assert shift.start == datetime.datetime(2019, 5, 1, 9, 0)
+        assert shift.end == datetime.datetime(2019, 5, 1, 17, 0)
+
+        log = db.AuditLog.get()
+        assert log.metadata["start"] == "2019-05-01 09:00 UTC"
+
+
+def test_schedule_add_shift_ends_before_start(organizer_client):
+    event, member = create_event_with_member()
+
+    with mock.patch.object(csrf.seasurf, "_csrf_disable", True):
+        response = organizer_client.post(
+            "/manage/events/test/schedule",
+            data={
+                "member": member.id,
+                "start": "2019-05-01T09:00",
+                "end": "2019-05-01T08:00",
+            },
+            base_url="https://localhost",
+        )
+
+    assert response.status_code == 200
+    assert b"The shift must end after it starts." in response.data
+
+    with db.db:
+        assert db.OnCallShift.select().count() == 0
+
+
+def test_schedule_remove_shift(organizer_client):
+    event, member = create_event_with_member()
+
+    with db.db:
+        shift = highlevel.add_shift(
+            event,
+            member,
+            datetime.datetime(2019, 5, 1, 9, 0),
+            datetime.datetime(2019, 5, 1, 17, 0),
+        )
+
+    response = organizer_client.get(
+        f"/manage/events/test/schedule/remove/{shift.id}", base_url="https://localhost"
+    )
+
+    assert response.status_code == 302
+
+    with db.db:
+        assert db.OnCallShift.select().count() == 0
@@ -0,0 +1,89 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import flask
+import pytest
+from hotline import static_assets
+from hotline.pages import webhandlers
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask("hotline.app")
+    static_assets.init_app(app)
+    app.register_blueprint(webhandlers.blueprint)
+
+    webhandlers._rendered_pages.clear()
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_view_page(client):
+    response = client.get("/pages/about")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    assert "public" in response.headers["Cache-Control"]
+    assert "max-age=300" in response.headers["Cache-Control"]
+
+
+def test_view_page_not_modified(client):
+    etag = client.get("/pages/about").headers["ETag"]
+
+    response = client.get("/pages/about", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_view_page_not_found(client):
+    assert client.get("/pages/nope").status_code == 404
+
+
+def test_view_page_is_rendered_once(client):
+    with mock.patch.object(
+        webhandlers, "_render_page", wraps=webhandlers._render_page
+    ) as render_page:
+        client.get("/pages/about")
+        client.get("/pages/about")
+
+    render_page.assert_called_once()
+
+
+def test_view_page_debug_rerenders_changed_file(app, client):
+    app.debug = True
+    client.get("/pages/about")
+
+    page = webhandlers._rendered_pages["about"]
+    webhandlers._rendered_pages["about"] = page._replace(mtime=0)
+
+    with mock.patch.object(
+        webhandlers, "_render_page", wraps=webhandlers._render_page
+    ) as render_page:
+        client.get("/pages/about")
+
+    render_page.assert_called_once()
+
+
+def test_render_all(app):
+    webhandlers.render_all(app)
+
+    assert sorted(webhandlers._rendered_pages) == ["about", "faq", "privacy"]
@@ -0,0 +1,138 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import time
+from unittest import mock
+
+import peewee
+import pytest
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.telephony import background, call_events
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    call_events._pending.clear()
+    call_events.flush()
+
+    # No transaction is held open, so that flushes done in the background can
+    # write to the database.
+    db.db.connect()
+    yield db
+    call_events.flush()
+    background.wait()
+    db.db.close()
+
+
+def create_leg(uuid="leg"):
+    event = db.Event.get_or_create(name="Test event", slug="test")[0]
+    return highlevel.add_call_leg(event, "conversation", "+101", uuid)
+
+
+def test_parse():
+    event = call_events.parse(
+        {
+            "uuid": "leg",
+            "conversation_uuid": "conversation",
+            "status": "completed",
+            "timestamp": "2019-05-01T12:00:05.123Z",
+            "duration": "42",
+        }
+    )
+
+    assert event == highlevel.CallEvent(
+        call_uuid="leg",
+        status="completed",
+        timestamp=datetime.datetime(2019, 5, 1, 12, 0, 5, 123000),
+        duration=42,
+    )
+
+
+def test_parse_without_timestamp():
+    event = call_events.parse({"uuid": "leg", "status": "ringing"})
+
+    assert event.duration is None
+    assert isinstance(event.timestamp, datetime.datetime)
+
+
+def test_parse_other_events():
+    assert call_events.parse({"type": "transfer"}) is None
+
+
+@mock.patch.object(call_events, "FLUSH_INTERVAL", 3600)
+@mock.patch.object(call_events, "FLUSH_SIZE", 2)
+def test_record_flushes_in_batches(database):
+    create_leg()
+
+    call_events.record({"uuid": "leg", "status": "ringing"})
+
+    assert db.CallLeg.get_by_id("leg").ringing is None
+
+    call_events.record({"uuid": "leg", "status": "answered"})
+
+    leg = db.CallLeg.get_by_id("leg")
+    assert leg.status == "answered"
+    assert leg.ringing is not None
+    assert leg.answered is not None
+    assert not call_events._pending
+
+
+@mock.patch.object(call_events, "FLUSH_INTERVAL", 0)
+def test_record_flushes_after_interval(database):
+    create_leg()
+
+    call_events.record({"uuid": "leg", "status": "ringing"})
+
+    assert db.CallLeg.get_by_id("leg").status == "ringing"
+
+
+@mock.patch.object(call_events, "FLUSH_INTERVAL", 0.05)
+def test_record_flushes_when_idle(database):
+    create_leg()
+    call_events._last_flush = time.monotonic()
+
+    call_events.record({"uuid": "leg", "status": "ringing"})
+
+    assert db.CallLeg.get_by_id("leg").status == "started"
+
+    # No more events arrive, but the pending one is still written.
+    deadline = time.monotonic() + 5
+    while call_events._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    background.wait()
+
+    assert db.CallLeg.get_by_id("leg").status == "ringing"
+
+
+def test_flush_failure_is_logged(database):
+    call_events._pending.append(
+        highlevel.CallEvent("leg", "ringing", datetime.datetime.utcnow(), None)
+    )
+
+    with mock.patch.object(
+        highlevel,
+        "record_call_events",
+        autospec=True,
+        side_effect=peewee.OperationalError("database is locked"),
+    ):
+        assert call_events.flush() == 0
+
+    assert not call_events._pending
@@ -0,0 +1,103 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from hotline import common_text
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.telephony import event_templates
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    event_templates._templates.clear()
+
+    with db.db:
+        yield db
+
+
+def create_event():
+    number = db.Number()
+    number.number = "+5678"
+    number.country = "US"
+    number.features = db.NumberFeature.SMS | db.NumberFeature.VOICE
+    number.save()
+
+    event = db.Event()
+    event.name = "Test {event}"
+    event.slug = "test"
+    event.owner_user_id = "abc123"
+    event.primary_number = number.number
+    event.primary_number_id = number
+    event.save()
+
+    return event
+
+
+def test_templates_match_common_text(database):
+    event = create_event()
+
+    templates = event_templates.get(event)
+
+    assert templates.reporter_ncco("conversation")[0] == {
+        "action": "talk",
+        "text": common_text.voice_default_greeting.format(event=event),
+    }
+    assert templates.sms_greeting == common_text.sms_default_greeting.format(
+        event=event
+    )
+    assert templates.sms_introduction("+15555551234") == (
+        common_text.sms_introduction.format(event=event, reporter_number="1234")
+    )
+    assert templates.answer_greeting("Bob") == (
+        "Hello Bob, connecting you to Test {event}."
+    )
+
+
+def test_per_call_fields(database):
+    templates = event_templates.get(create_event())
+
+    first = templates.reporter_ncco("one")
+    second = templates.reporter_ncco("two")
+
+    assert first[1]["name"] == "one"
+    assert second[1]["name"] == "two"
+
+    call = templates.member_call("+101", "https://example.com/answer")
+
+    assert call["to"] == [{"type": "phone", "number": "+101"}]
+    assert call["from"] == {"type": "phone", "number": "5678"}
+    assert call["answer_url"] == ["https://example.com/answer"]
+
+
+def test_cached_until_event_saved(database):
+    event = create_event()
+
+    templates = event_templates.get(event)
+
+    assert event_templates.get(event) is templates
+
+    event.voice_greeting = "Ahoyhoy!"
+    event.sms_greeting = "Hi!"
+    event.save()
+
+    templates = event_templates.get(event)
+
+    assert templates.reporter_ncco("conversation")[0]["text"] == "Ahoyhoy!"
+    assert templates.sms_greeting == "Hi!"
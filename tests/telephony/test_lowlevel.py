@@ -16,6 +16,7 @@ from unittest import mock
 
 import nexmo
 import pytest
+from hotline.database import models
 from hotline.telephony import lowlevel
 
 
@@ -88,3 +89,35 @@ def test_send_sms(sleep):
     client.send_message.assert_called_once_with(
         {"from": "5678", "to": "1234", "text": "meep"}
     )
+
+
+@pytest.mark.parametrize("value", ["15555551234", "442071838750", "5215512345678"])
+def test_normalized_numbers_round_trip_through_database(value):
+    field = models.PhoneNumberField()
+    number = lowlevel.normalize_e164_number(value)
+
+    stored = field.db_value(number)
+
+    assert isinstance(stored, int)
+    assert field.python_value(stored) == number
+
+
+def test_number_parsing_is_memoized():
+    lowlevel.parse_number.cache_clear()
+    lowlevel.format_number.cache_clear()
+
+    assert lowlevel.normalize_number("(555) 555-1234") == "+15555551234"
+    assert lowlevel.normalize_number("(555) 555-1234") == "+15555551234"
+    assert lowlevel.pretty_print_number("+15555551234") == "+1 555-555-1234"
+
+    info = lowlevel.number_cache_info()
+    assert info["format_number"].hits == 1
+    assert info["format_number"].misses == 2
+    assert info["parse_number"].misses == 2
+
+
+def test_preload_number_metadata(caplog):
+    loaded = lowlevel.preload_number_metadata(["US", "GB", "US", "XX"])
+
+    assert loaded == ["GB", "US"]
+    assert "No phone number metadata for XX." in caplog.text
@@ -0,0 +1,49 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+
+
+def test_telephony_entry_point(tmpdir):
+    secrets_file = tmpdir.join("secrets.json")
+    secrets_file.write(
+        json.dumps({"database": f"sqlite:///{tmpdir.join('database.sqlite')}"})
+    )
+
+    # This has to happen in a fresh interpreter, as other tests import the
+    # dashboard.
+    code = (
+        "import json, sys; "
+        "from hotline.telephony.__main__ import app; "
+        "print(json.dumps({"
+        "'rules': sorted(rule.rule for rule in app.url_map.iter_rules()), "
+        "'loaded': sorted(name for name in "
+        "('firebase_admin', 'flask_talisman', 'hotline.auth', 'hotline.app') "
+        "if name in sys.modules)}))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, SECRETS_FILE=str(secrets_file)),
+    ).stdout
+    result = json.loads(output)
+
+    assert result["loaded"] == []
+    assert all(rule.startswith("/telephony/") for rule in result["rules"])
+    assert "/telephony/inbound-sms" in result["rules"]
@@ -12,12 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 from unittest import mock
 
 import pytest
 from hotline.database import create_tables, highlevel
 from hotline.database import models as db
-from hotline.telephony import smschat
+from hotline.telephony import event_templates, smschat
 
 
 @pytest.fixture
@@ -27,15 +28,17 @@ def database(tmpdir):
 
     create_tables.create_tables()
 
+    event_templates._templates.clear()
+
     with db.db:
         yield db
 
 
-EVENT_NUMBER = "5678"
+EVENT_NUMBER = "+5678"
 EVENT_NAME = "Test event"
-EVENT_NUMBER_2 = "8765"
+EVENT_NUMBER_2 = "+8765"
 EVENT_NAME_2 = "Test event 2"
-REPORTER_NUMBER = "1234"
+REPORTER_NUMBER = "+1234"
 REPORTER_NAME = "Reporter"
 
 
@@ -52,7 +55,7 @@ def create_event(name=EVENT_NAME, number=EVENT_NUMBER):
     number_ = db.Number()
     number_.number = number
     number_.country = "US"
-    number_.features = ""
+    number_.features = db.NumberFeature.SMS | db.NumberFeature.VOICE
     number_.save()
 
     event = db.Event()
@@ -77,9 +80,9 @@ def test_handle_message_no_organizers(send_sms, database):
 
 
 BOB_ORGANIZER_NAME = "Bob"
-BOB_ORGANIZER_NUMBER = "101"
+BOB_ORGANIZER_NUMBER = "+101"
 ALICE_ORGANIZER_NAME = "Alice"
-ALICE_ORGANIZER_NUMBER = "202"
+ALICE_ORGANIZER_NUMBER = "+202"
 
 
 def create_organizers(event):
@@ -99,7 +102,7 @@ def create_organizers(event):
 
     member = db.EventMember()
     member.name = "Judy"
-    member.number = "303"
+    member.number = "+303"
     member.event = event
     member.verified = False
     member.save()
@@ -118,28 +121,44 @@ def test_handle_message_no_relays(send_sms, database):
     send_sms.assert_not_called()
 
 
-RELAY_NUMBER = "1111"
-RELAY_NUMBER_2 = "2222"
+RELAY_NUMBER = "+1111"
+RELAY_NUMBER_2 = "+2222"
 
 
 def create_relays():
     number = db.Number()
     number.number = RELAY_NUMBER
     number.country = "US"
-    number.features = ""
+    number.features = db.NumberFeature.SMS
     number.pool = db.NumberPool.SMS_RELAY
     number.save()
 
     number = db.Number()
     number.number = RELAY_NUMBER_2
     number.country = "US"
-    number.features = ""
+    number.features = db.NumberFeature.SMS
     number.pool = db.NumberPool.SMS_RELAY
     number.save()
 
     return list(db.Number.select())
 
 
+@mock.patch("hotline.telephony.lowlevel.send_sms", autospec=True)
+def test_handle_message_no_sms_capable_relays(send_sms, database):
+    event = create_event()
+    create_organizers(event)
+    create_relays()
+
+    db.Number.update(features=db.NumberFeature.VOICE).where(
+        db.Number.pool == db.NumberPool.SMS_RELAY
+    ).execute()
+
+    with pytest.raises(smschat.NoRelaysAvailable):
+        smschat.handle_message(REPORTER_NUMBER, EVENT_NUMBER, "Hello")
+
+    send_sms.assert_not_called()
+
+
 @mock.patch("hotline.telephony.lowlevel.send_sms", autospec=True)
 def test_handle_message_new_chat(send_sms, database):
     event = create_event()
@@ -171,13 +190,13 @@ def test_handle_message_new_chat(send_sms, database):
             mock.call(
                 sender=RELAY_NUMBER,
                 to=BOB_ORGANIZER_NUMBER,
-                message=f"This is the beginning of a new chat for {EVENT_NAME}, the last 4 digits of the reporter's number are {REPORTER_NUMBER}. "
+                message=f"This is the beginning of a new chat for {EVENT_NAME}, the last 4 digits of the reporter's number are {REPORTER_NUMBER[-4:]}. "
                 "Reply STOP at any time to opt-out of receiving messages from this conversation.",
             ),
             mock.call(
                 sender=RELAY_NUMBER,
                 to=ALICE_ORGANIZER_NUMBER,
-                message=f"This is the beginning of a new chat for {EVENT_NAME}, the last 4 digits of the reporter's number are {REPORTER_NUMBER}. "
+                message=f"This is the beginning of a new chat for {EVENT_NAME}, the last 4 digits of the reporter's number are {REPORTER_NUMBER[-4:]}. "
                 "Reply STOP at any time to opt-out of receiving messages from this conversation.",
             ),
             mock.call(
@@ -208,12 +227,40 @@ def test_handle_message_new_chat(send_sms, database):
     assert connections[0].user_name == BOB_ORGANIZER_NAME
     assert connections[0].user_number == BOB_ORGANIZER_NUMBER
     assert connections[0].relay_number == RELAY_NUMBER
-    assert connections[1].user_name == REPORTER_NAME
-    assert connections[1].user_number == REPORTER_NUMBER
-    assert connections[1].relay_number == EVENT_NUMBER
-    assert connections[2].user_name == ALICE_ORGANIZER_NAME
-    assert connections[2].user_number == ALICE_ORGANIZER_NUMBER
-    assert connections[2].relay_number == RELAY_NUMBER
+    assert connections[1].user_name == ALICE_ORGANIZER_NAME
+    assert connections[1].user_number == ALICE_ORGANIZER_NUMBER
+    assert connections[1].relay_number == RELAY_NUMBER
+    assert connections[2].user_name == REPORTER_NAME
+    assert connections[2].user_number == REPORTER_NUMBER
+    assert connections[2].relay_number == EVENT_NUMBER
+
+
+@mock.patch("hotline.telephony.lowlevel.send_sms", autospec=True)
+def test_handle_message_new_chat_organizers_on_call(send_sms, database):
+    event = create_event()
+    bob, alice, judy = create_organizers(event)
+    create_relays()
+
+    now = datetime.datetime.utcnow()
+    highlevel.add_shift(
+        event,
+        alice,
+        now - datetime.timedelta(hours=1),
+        now + datetime.timedelta(hours=1),
+    )
+
+    smschat.handle_message(REPORTER_NUMBER, EVENT_NUMBER, "Hello")
+
+    # Only Alice is on call, so Bob isn't introduced to the chat.
+    organizer_numbers = {
+        call[2]["to"]
+        for call in send_sms.mock_calls
+        if call[2]["to"] != REPORTER_NUMBER
+    }
+    assert organizer_numbers == {ALICE_ORGANIZER_NUMBER}
+
+    room = db.SmsChat.get().room
+    assert [user.name for user in room.users] == [REPORTER_NAME, ALICE_ORGANIZER_NAME]
 
 
 def create_chatroom(send_sms, number=EVENT_NUMBER):
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import datetime
+import itertools
+import threading
 from unittest import mock
 
 import nexmo
 import pytest
+from hotline import injector
 from hotline.database import create_tables, highlevel
 from hotline.database import models as db
-from hotline.telephony import voice
+from hotline.telephony import background, event_templates, voice
 
 
 @pytest.fixture
@@ -28,8 +33,14 @@ def database(tmpdir):
 
     create_tables.create_tables()
 
-    with db.db:
-        yield db
+    event_templates._templates.clear()
+
+    # No transaction is held open, so that work done in the background can
+    # write to the database.
+    db.db.connect()
+    yield db
+    background.wait()
+    db.db.close()
 
 
 def test_handle_inbound_call_no_event(database):
@@ -52,7 +63,7 @@ def create_event():
     number = db.Number()
     number.number = "+5678"
     number.country = "US"
-    number.features = ""
+    number.features = db.NumberFeature.SMS | db.NumberFeature.VOICE
     number.save()
 
     event = db.Event()
@@ -90,7 +101,7 @@ def test_handle_inbound_call_blocked(database):
 def add_unverfied_members(event):
     member = db.EventMember()
     member.name = "Unverified Judy"
-    member.number = "303"
+    member.number = "+303"
     member.event = event
     member.verified = False
     member.save()
@@ -118,14 +129,14 @@ def test_handle_inbound_call_no_members(database):
 def add_members(event):
     member = db.EventMember()
     member.name = "Bob"
-    member.number = "101"
+    member.number = "+101"
     member.event = event
     member.verified = True
     member.save()
 
     member = db.EventMember()
     member.name = "Alice"
-    member.number = "202"
+    member.number = "+202"
     member.event = event
     member.verified = True
     member.save()
@@ -136,6 +147,7 @@ def test_handle_inbound_call(database):
     add_members(event)
 
     nexmo_client = mock.create_autospec(nexmo.Client)
+    nexmo_client.create_call.side_effect = [{"uuid": "leg-1"}, {"uuid": "leg-2"}]
 
     ncco = voice.handle_inbound_call(
         reporter_number="1234",
@@ -159,19 +171,28 @@ def test_handle_inbound_call(database):
 
     calls_created = [call[1][0] for call in nexmo_client.create_call.mock_calls]
 
-    assert calls_created[0]["to"] == [{"type": "phone", "number": "101"}]
+    assert calls_created[0]["to"] == [{"type": "phone", "number": "+101"}]
     assert calls_created[0]["from"] == {"type": "phone", "number": "5678"}
     assert "example.com" in calls_created[0]["answer_url"][0]
-    assert calls_created[1]["to"] == [{"type": "phone", "number": "202"}]
+    assert calls_created[1]["to"] == [{"type": "phone", "number": "+202"}]
     assert calls_created[1]["from"] == {"type": "phone", "number": "5678"}
     assert "example.com" in calls_created[1]["answer_url"][0]
 
+    # The calls should be tracked as legs of the conversation.
+    legs = db.CallLeg.select().order_by(db.CallLeg.uuid)
+    assert [(leg.uuid, leg.member_number, leg.status) for leg in legs] == [
+        ("leg-1", "+101", "started"),
+        ("leg-2", "+202", "started"),
+    ]
+    assert all(leg.conversation_uuid == "conversation" for leg in legs)
+
 
 def test_handle_inbound_call_custom_greeting(database):
     event = create_event()
     add_members(event)
 
     nexmo_client = mock.create_autospec(nexmo.Client)
+    nexmo_client.create_call.side_effect = [{"uuid": "leg-1"}, {"uuid": "leg-2"}]
 
     event.voice_greeting = "Ahoyhoy!"
     event.save()
@@ -195,7 +216,7 @@ def test_handle_member_answer_no_event(database):
 
     ncco = voice.handle_member_answer(
         event_number="+5678",
-        member_number="202",
+        member_number="+202",
         origin_conversation_uuid="conversation",
         origin_call_uuid="call",
         client=nexmo_client,
@@ -214,7 +235,7 @@ def test_handle_member_answer(database):
 
     ncco = voice.handle_member_answer(
         event_number="+5678",
-        member_number="202",
+        member_number="+202",
         origin_conversation_uuid="conversation",
         origin_call_uuid="call",
         client=nexmo_client,
@@ -232,3 +253,405 @@ def test_handle_member_answer(database):
 
     # The conference call should have been notified that the member is joining.
     nexmo_client.send_speech.assert_called_once_with("call", text=mock.ANY)
+
+
+def test_handle_member_answer_member_of_another_event(database):
+    event = create_event()
+    add_members(event)
+
+    other_event = db.Event()
+    other_event.name = "Other event"
+    other_event.slug = "other"
+    other_event.primary_number = "+8765"
+    other_event.save()
+
+    member = db.EventMember()
+    member.name = "Mallory"
+    member.number = "+303"
+    member.event = other_event
+    member.verified = True
+    member.save()
+
+    nexmo_client = mock.create_autospec(nexmo.Client)
+
+    ncco = voice.handle_member_answer(
+        event_number="+5678",
+        member_number="+303",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        client=nexmo_client,
+    )
+
+    assert len(ncco) == 1
+    assert "error" in ncco[0]["text"]
+    nexmo_client.send_speech.assert_not_called()
+
+
+def add_call_legs(event):
+    for uuid, number in [("leg-1", "+101"), ("leg-2", "+202"), ("leg-3", "+303")]:
+        highlevel.add_call_leg(event, "conversation", number, uuid)
+
+
+def test_handle_member_answer_hangs_up_other_legs(database):
+    event = create_event()
+    add_members(event)
+    add_call_legs(event)
+    highlevel.update_call_leg_status("leg-3", "rejected")
+
+    nexmo_client = mock.create_autospec(nexmo.Client)
+
+    voice.handle_member_answer(
+        event_number="+5678",
+        member_number="+202",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        member_call_uuid="leg-2",
+        client=nexmo_client,
+    )
+    background.wait()
+
+    # Only the leg that's still ringing should have been hung up.
+    nexmo_client.update_call.assert_called_once_with("leg-1", action="hangup")
+
+    statuses = {leg.uuid: leg.status for leg in db.CallLeg.select()}
+    assert statuses == {
+        "leg-1": "cancelled",
+        "leg-2": "answered",
+        "leg-3": "rejected",
+    }
+
+
+def test_handle_member_answer_does_not_wait_for_hang_ups(database):
+    event = create_event()
+    add_members(event)
+    add_call_legs(event)
+
+    nexmo_client = mock.create_autospec(nexmo.Client)
+    hang_up_allowed = threading.Event()
+    nexmo_client.update_call.side_effect = lambda *args, **kwargs: (
+        hang_up_allowed.wait(5)
+    )
+
+    ncco = voice.handle_member_answer(
+        event_number="+5678",
+        member_number="+202",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        member_call_uuid="leg-2",
+        client=nexmo_client,
+    )
+
+    # The answer NCCO is returned while the other calls are being hung up.
+    assert ncco[1]["action"] == "conversation"
+    assert db.CallLeg.get_by_id("leg-1").status == "started"
+
+    hang_up_allowed.set()
+    background.wait()
+
+    assert db.CallLeg.get_by_id("leg-1").status == "cancelled"
+
+
+def test_handle_member_answer_hang_up_failed(database):
+    event = create_event()
+    add_members(event)
+    add_call_legs(event)
+
+    nexmo_client = mock.create_autospec(nexmo.Client)
+    nexmo_client.update_call.side_effect = [nexmo.ClientError("Gone"), {}]
+
+    voice.handle_member_answer(
+        event_number="+5678",
+        member_number="+202",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        member_call_uuid="leg-2",
+        client=nexmo_client,
+    )
+    background.wait()
+
+    assert nexmo_client.update_call.call_count == 2
+
+    # The leg that couldn't be hung up is left for Nexmo's events to update.
+    statuses = sorted(leg.status for leg in db.CallLeg.select())
+    assert statuses == ["answered", "cancelled", "started"]
+
+
+def test_handle_member_answer_waits_for_answers(database):
+    event = create_event()
+    add_members(event)
+    add_call_legs(event)
+
+    nexmo_client = mock.create_autospec(nexmo.Client)
+
+    injector.set("secrets", {"voice": {"answers_before_hangup": 2}})
+
+    try:
+        voice.handle_member_answer(
+            event_number="+5678",
+            member_number="+202",
+            origin_conversation_uuid="conversation",
+            origin_call_uuid="call",
+            member_call_uuid="leg-2",
+            client=nexmo_client,
+        )
+        background.wait()
+
+        nexmo_client.update_call.assert_not_called()
+
+        voice.handle_member_answer(
+            event_number="+5678",
+            member_number="+101",
+            origin_conversation_uuid="conversation",
+            origin_call_uuid="call",
+            member_call_uuid="leg-1",
+            client=nexmo_client,
+        )
+        background.wait()
+
+        nexmo_client.update_call.assert_called_once_with("leg-3", action="hangup")
+    finally:
+        injector.reset()
+
+
+def create_nexmo_client():
+    nexmo_client = mock.create_autospec(nexmo.Client)
+    uuids = itertools.count(1)
+    nexmo_client.create_call.side_effect = lambda params: {"uuid": f"leg-{next(uuids)}"}
+    return nexmo_client
+
+
+def add_many_members(event, count):
+    for n in range(count):
+        db.EventMember.create(
+            event=event, name=f"Member {n}", number=f"+10{n}", verified=True
+        )
+
+
+def start_call(nexmo_client, conversation_uuid="conversation", call_uuid="call"):
+    return voice.handle_inbound_call(
+        reporter_number="1234",
+        event_number="+5678",
+        conversation_uuid=conversation_uuid,
+        call_uuid=call_uuid,
+        host="example.com",
+        client=nexmo_client,
+    )
+
+
+def dialed_numbers(nexmo_client):
+    return [
+        call[1][0]["to"][0]["number"] for call in nexmo_client.create_call.mock_calls
+    ]
+
+
+def test_handle_inbound_call_tracks_conversation(database):
+    event = create_event()
+    add_members(event)
+
+    start_call(create_nexmo_client())
+
+    conversation = db.Conversation.get_by_id("conversation")
+    assert conversation.event == event
+    assert conversation.call_uuid == "call"
+    assert conversation.answer_url == (
+        "https://example.com/telephony/connect-to-conference/conversation/call"
+    )
+    assert conversation.finished is None
+
+
+def test_dialing_in_waves(database):
+    event = create_event()
+    event.dialing_strategy = db.DialingStrategy.WAVES
+    event.dialing_wave_size = 2
+    event.dialing_timeout = 15
+    event.save()
+    add_many_members(event, 5)
+
+    nexmo_client = create_nexmo_client()
+
+    ncco = start_call(nexmo_client)
+
+    # The reporter is put on hold while the first wave is dialed.
+    assert ncco[1]["action"] == "conversation"
+    assert dialed_numbers(nexmo_client) == ["+100", "+101"]
+    assert nexmo_client.create_call.mock_calls[0][1][0]["ringing_timer"] == 15
+
+    # The next wave isn't dialed until every call in this one has finished.
+    voice.handle_call_status("leg-1", "timeout", client=nexmo_client)
+    assert len(dialed_numbers(nexmo_client)) == 2
+
+    voice.handle_call_status("leg-2", "rejected", client=nexmo_client)
+    assert dialed_numbers(nexmo_client)[2:] == ["+102", "+103"]
+
+    voice.handle_call_status("leg-3", "timeout", client=nexmo_client)
+    voice.handle_call_status("leg-4", "timeout", client=nexmo_client)
+    assert dialed_numbers(nexmo_client)[4:] == ["+104"]
+
+    # Once there's nobody left to dial, the conversation is finished.
+    voice.handle_call_status("leg-5", "unanswered", client=nexmo_client)
+    assert len(dialed_numbers(nexmo_client)) == 5
+    assert db.Conversation.get_by_id("conversation").finished is not None
+
+
+def test_dialing_in_waves_concurrent_finishes(database):
+    event = create_event()
+    event.dialing_strategy = db.DialingStrategy.WAVES
+    event.dialing_wave_size = 2
+    event.save()
+    add_many_members(event, 4)
+
+    nexmo_client = create_nexmo_client()
+    start_call(nexmo_client)
+
+    # The calls in a wave time out together, so their events are handled at
+    # the same time. Make sure that both calls have finished before either
+    # handler looks for the next members to dial.
+    both_finished = threading.Barrier(2, timeout=5)
+    update_call_leg_status = highlevel.update_call_leg_status
+
+    def update_call_leg_status_together(call_uuid, status):
+        updated = update_call_leg_status(call_uuid, status)
+        both_finished.wait()
+        return updated
+
+    def finish(call_uuid):
+        with db.db.connection_context():
+            voice.handle_call_status(call_uuid, "timeout", client=nexmo_client)
+
+    with mock.patch.object(
+        highlevel, "update_call_leg_status", update_call_leg_status_together
+    ):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [
+                executor.submit(finish, "leg-1"),
+                executor.submit(finish, "leg-2"),
+            ]:
+                future.result()
+
+    # The next wave is only dialed once.
+    assert dialed_numbers(nexmo_client) == ["+100", "+101", "+102", "+103"]
+    assert db.CallLeg.select().count() == 4
+    assert db.Conversation.get_by_id("conversation").dialing_until is None
+
+
+def test_dialing_in_waves_stops_when_answered(database):
+    event = create_event()
+    event.dialing_strategy = db.DialingStrategy.WAVES
+    event.dialing_wave_size = 2
+    event.save()
+    add_many_members(event, 4)
+
+    nexmo_client = create_nexmo_client()
+
+    start_call(nexmo_client)
+
+    voice.handle_member_answer(
+        event_number="+5678",
+        member_number="+100",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        member_call_uuid="leg-1",
+        client=nexmo_client,
+    )
+    voice.handle_call_status("leg-1", "completed", client=nexmo_client)
+
+    assert dialed_numbers(nexmo_client) == ["+100", "+101"]
+
+
+def test_dialing_round_robin(database):
+    event = create_event()
+    event.dialing_strategy = db.DialingStrategy.ROUND_ROBIN
+    event.save()
+    add_many_members(event, 3)
+
+    nexmo_client = create_nexmo_client()
+
+    start_call(nexmo_client, conversation_uuid="first", call_uuid="first-call")
+    start_call(nexmo_client, conversation_uuid="second", call_uuid="second-call")
+
+    # Each call starts with the next member.
+    assert dialed_numbers(nexmo_client) == ["+100", "+101"]
+
+    # And moves on to the member after that.
+    voice.handle_call_status("leg-2", "timeout", client=nexmo_client)
+
+    assert dialed_numbers(nexmo_client) == ["+100", "+101", "+102"]
+    assert db.CallLeg.get_by_id("leg-3").conversation_uuid == "second"
+
+
+def test_dialing_respects_concurrent_call_limit(database):
+    event = create_event()
+    add_many_members(event, 2)
+
+    nexmo_client = create_nexmo_client()
+
+    injector.set("secrets", {"voice": {"max_concurrent_calls": 1}})
+
+    try:
+        start_call(nexmo_client, conversation_uuid="first", call_uuid="first-call")
+        start_call(nexmo_client, conversation_uuid="second", call_uuid="second-call")
+
+        # Only one call can be placed, so the second reporter is on hold
+        # without anyone being dialed.
+        assert dialed_numbers(nexmo_client) == ["+100"]
+
+        # Once it finishes, the oldest waiting conversation gets the capacity.
+        voice.handle_call_status("leg-1", "timeout", client=nexmo_client)
+
+        assert dialed_numbers(nexmo_client) == ["+100", "+101"]
+        assert db.CallLeg.get_by_id("leg-2").conversation_uuid == "first"
+
+        voice.handle_call_status("leg-2", "timeout", client=nexmo_client)
+
+        # The first conversation has nobody left to dial.
+        assert db.Conversation.get_by_id("first").finished is not None
+        assert db.CallLeg.get_by_id("leg-3").conversation_uuid == "second"
+    finally:
+        injector.reset()
+
+
+def test_reporter_hanging_up_stops_dialing(database):
+    event = create_event()
+    add_members(event)
+
+    nexmo_client = create_nexmo_client()
+
+    start_call(nexmo_client)
+
+    voice.handle_call_status("call", "completed", client=nexmo_client)
+
+    assert db.Conversation.get_by_id("conversation").finished is not None
+    assert sorted(call[1][0] for call in nexmo_client.update_call.mock_calls) == [
+        "leg-1",
+        "leg-2",
+    ]
+
+
+def test_handle_call_status_ignores_unfinished_calls(database):
+    nexmo_client = create_nexmo_client()
+
+    voice.handle_call_status("leg-1", "ringing", client=nexmo_client)
+    voice.handle_call_status("unknown", "completed", client=nexmo_client)
+
+    nexmo_client.create_call.assert_not_called()
+    nexmo_client.update_call.assert_not_called()
+
+
+def test_handle_inbound_call_dials_members_on_call(database):
+    event = create_event()
+    add_members(event)
+
+    alice = db.EventMember.get(db.EventMember.name == "Alice")
+    now = datetime.datetime.utcnow()
+    highlevel.add_shift(
+        event,
+        alice,
+        now - datetime.timedelta(hours=1),
+        now + datetime.timedelta(hours=1),
+    )
+
+    nexmo_client = create_nexmo_client()
+
+    start_call(nexmo_client)
+
+    assert dialed_numbers(nexmo_client) == ["+202"]
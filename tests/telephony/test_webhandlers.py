@@ -0,0 +1,156 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import pytest
+from hotline import injector, jsoncodec
+from hotline.app import app
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.telephony import background, call_events, voice
+
+
+@pytest.fixture
+def client(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+    create_tables.create_tables()
+
+    call_events._pending.clear()
+    call_events.flush()
+
+    injector.set("secrets", {})
+    injector.set("nexmo.client", mock.create_autospec(object))
+    app.config["TESTING"] = True
+    yield app.test_client()
+    injector.reset()
+
+
+@mock.patch.object(voice, "handle_inbound_call", autospec=True)
+def test_inbound_call_responds_with_ncco(handle_inbound_call, client):
+    ncco = [{"action": "talk", "text": "Hello ☃"}]
+    handle_inbound_call.return_value = ncco
+
+    response = client.post(
+        "/telephony/inbound-call",
+        data=jsoncodec.dumps(
+            {
+                "to": "14155550199",
+                "from": "14155550100",
+                "conversation_uuid": "conversation",
+                "uuid": "call",
+            }
+        ),
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.get_data() == jsoncodec.dumps(ncco)
+    handle_inbound_call.assert_called_once_with(
+        reporter_number="+14155550100",
+        event_number="+14155550199",
+        conversation_uuid="conversation",
+        call_uuid="call",
+        host="localhost",
+    )
+
+
+def test_inbound_call_invalid_json(client):
+    response = client.post(
+        "/telephony/inbound-call",
+        data=b"{",
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 400
+
+
+@mock.patch.object(call_events, "FLUSH_INTERVAL", 3600)
+def test_event_updates_call_leg(client):
+    with db.db:
+        event = db.Event.create(name="Test event", slug="test")
+        highlevel.add_call_leg(event, "conversation", "+101", "leg")
+
+    response = client.post(
+        "/telephony/event",
+        data=jsoncodec.dumps(
+            {"uuid": "leg", "conversation_uuid": "other", "status": "ringing"}
+        ),
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 204
+
+    with db.db:
+        # The event is buffered until there are enough to write.
+        assert db.CallLeg.get_by_id("leg").status == "started"
+
+        call_events.flush()
+
+        assert db.CallLeg.get_by_id("leg").status == "ringing"
+
+
+def test_event_ignores_other_events(client):
+    response = client.post(
+        "/telephony/event",
+        data=jsoncodec.dumps({"type": "transfer", "conversation_uuid_to": "other"}),
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 204
+
+
+@mock.patch.object(voice, "handle_member_answer", autospec=True)
+def test_connect_to_conference_passes_member_call(handle_member_answer, client):
+    handle_member_answer.return_value = []
+
+    response = client.post(
+        "/telephony/connect-to-conference/conversation/call",
+        data=jsoncodec.dumps(
+            {"to": "14155550100", "from": "14155550199", "uuid": "leg"}
+        ),
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 200
+    handle_member_answer.assert_called_once_with(
+        event_number="+14155550199",
+        member_number="+14155550100",
+        origin_conversation_uuid="conversation",
+        origin_call_uuid="call",
+        member_call_uuid="leg",
+    )
+
+
+@mock.patch.object(voice, "handle_call_status", autospec=True)
+def test_event_handles_call_status(handle_call_status, client):
+    response = client.post(
+        "/telephony/event",
+        data=jsoncodec.dumps({"uuid": "leg", "status": "timeout"}),
+        content_type="application/json",
+        base_url="https://localhost",
+    )
+
+    assert response.status_code == 204
+
+    # Placing the next calls can be slow, so it's done in the background.
+    background.wait()
+    handle_call_status.assert_called_once_with(call_uuid="leg", status="timeout")
@@ -0,0 +1,32 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import sys
+
+
+def test_app_import_does_not_load_heavy_dependencies():
+    # This has to happen in a fresh interpreter, as other tests import these.
+    code = (
+        "import json, sys, hotline.app; "
+        "print(json.dumps(sorted(name for name in "
+        "('firebase_admin', 'nexmo', 'google.api_core', 'cmarkgfm') "
+        "if name in sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+
+    assert json.loads(output) == []
@@ -0,0 +1,72 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from hotline import audit_log
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    with db.db:
+        yield db
+
+
+def test_log_stores_structured_fields(database):
+    audit_log.log(
+        audit_log.Kind.NUMBER_BLOCKED,
+        user="abc123",
+        user_name="Alice",
+        number_suffix="1234",
+    )
+
+    entry = db.AuditLog.get()
+
+    assert entry.description is None
+    assert entry.user == "abc123"
+    assert entry.metadata == {"user_name": "Alice", "number_suffix": "1234"}
+    assert audit_log.describe(entry) == "Alice blocked the number ending in 1234."
+
+
+def test_describe_uses_reporter_number(database):
+    audit_log.log(
+        audit_log.Kind.SMS_CONVERSATION_STARTED, reporter_number="+15555551234"
+    )
+
+    entry = db.AuditLog.get()
+
+    assert entry.metadata is None
+    assert audit_log.describe(entry).endswith("number is 1234.")
+
+
+def test_describe_missing_field(database):
+    audit_log.log(audit_log.Kind.MEMBER_ADDED, user_name="Alice")
+
+    entry = db.AuditLog.get()
+
+    assert audit_log.describe(entry) == "Alice added unknown."
+
+
+def test_describe_legacy_description(database):
+    db.AuditLog.create(kind=audit_log.Kind.EVENT_MODIFIED, description="Legacy.")
+
+    entry = db.AuditLog.get()
+
+    assert audit_log.describe(entry) == "Legacy."
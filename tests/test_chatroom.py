@@ -68,3 +68,16 @@ def test_serialize_deserialize():
     roundtripped = room.deserialize(room.serialize())
 
     assert list(roundtripped.users) == list(room.users)
+
+
+def test_deserialize_stdlib_json():
+    # Chatrooms saved before the JSON codec was introduced.
+    data = (
+        '{"__class__": "Chatroom", "_users": '
+        '{"1234": ["A", "1234", "1"], "5678": ["B", "5678", "2"]}}'
+    )
+
+    room = chatroom.Chatroom.deserialize(data)
+
+    assert [user.name for user in room.users] == ["A", "B"]
+    assert room.get_user_by_name("B") == ("B", "5678", "2")
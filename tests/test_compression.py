@@ -0,0 +1,136 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import os
+from unittest import mock
+
+import flask
+import pytest
+from hotline import compression
+
+BODY = "<p>Hello</p>" * 100
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask("hotline.app")
+    compression.init_app(app)
+    compression._compressed.clear()
+
+    @app.route("/page")
+    def page():
+        response = flask.make_response(BODY)
+        response.set_etag("abc")
+        return response.make_conditional(flask.request)
+
+    @app.route("/small")
+    def small():
+        return "<p>Hello</p>"
+
+    @app.route("/json")
+    def json():
+        return flask.jsonify(items=[BODY])
+
+    @app.route("/binary")
+    def binary():
+        return flask.Response(b"\0" * 1000, mimetype="application/octet-stream")
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def no_brotli():
+    with mock.patch.object(compression, "brotli", None):
+        yield
+
+
+def test_gzip(client, no_brotli):
+    response = client.get("/page", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"] == 'W/"abc"'
+    assert gzip.decompress(response.data).decode() == BODY
+
+
+def test_brotli(client):
+    brotli = mock.Mock()
+    brotli.compress.return_value = b"compressed"
+
+    with mock.patch.object(compression, "brotli", brotli):
+        response = client.get("/page", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.data == b"compressed"
+
+
+def test_not_accepted(client):
+    response = client.get("/page")
+
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"] == '"abc"'
+
+
+def test_below_threshold(client, no_brotli):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_json(client, no_brotli):
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_not_compressible(client, no_brotli):
+    response = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compressed_bodies_are_cached_by_etag(client, no_brotli):
+    with mock.patch.object(
+        compression, "_compress", wraps=compression._compress
+    ) as compress:
+        client.get("/page", headers={"Accept-Encoding": "gzip"})
+        client.get("/page", headers={"Accept-Encoding": "gzip"})
+
+    compress.assert_called_once()
+
+
+def test_conditional_request_with_weak_etag(client, no_brotli):
+    response = client.get(
+        "/page", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"abc"'}
+    )
+
+    assert response.status_code == 304
+
+
+def test_static_file(app, client, no_brotli):
+    response = client.get("/static/cookie.js", headers={"Accept-Encoding": "gzip"})
+    response.close()
+
+    with open(os.path.join(app.static_folder, "cookie.js"), "rb") as fh:
+        expected = fh.read()
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == expected
@@ -0,0 +1,114 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from unittest import mock
+
+import pytest
+from hotline import injector
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    yield
+    injector.reset()
+
+
+def test_needs():
+    injector.set("secrets", {"nexmo": {"api-key": "key"}})
+
+    @injector.needs("secrets.nexmo.api-key")
+    def func(api_key):
+        return api_key
+
+    assert func() == "key"
+    assert func(api_key="other") == "other"
+
+
+def test_needs_explicit_arguments_are_not_resolved():
+    @injector.needs("missing")
+    def func(missing):
+        return missing
+
+    assert func(missing="value") == "value"
+
+    with pytest.raises(KeyError):
+        func()
+
+
+def test_needs_caches_values():
+    injector.set("secrets", {"value": 1})
+
+    @injector.needs("secrets.value")
+    def func(value):
+        return value
+
+    with mock.patch.object(injector, "get", wraps=injector.get) as get:
+        assert func() == 1
+        assert func() == 1
+
+    get.assert_called_once_with("secrets.value")
+
+
+def test_needs_invalidated_by_set_and_reset():
+    injector.set("secrets", {"value": 1})
+
+    @injector.needs("secrets.value")
+    def func(value):
+        return value
+
+    assert func() == 1
+
+    injector.set("secrets", {"value": 2})
+    assert func() == 2
+
+    injector.reset()
+    with pytest.raises(KeyError):
+        func()
+
+
+def test_factory_invoked_once_under_concurrency():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        # Give other threads a chance to race this one.
+        time.sleep(0.05)
+        return object()
+
+    injector.set("client", factory)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(injector.get("client")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(set(id(result) for result in results)) == 1
+
+
+def test_provides_with_needs():
+    injector.set("secrets", {"name": "world"})
+
+    @injector.provides("greeting", needs=["secrets.name"])
+    def make_greeting(name):
+        return f"Hello, {name}"
+
+    assert injector.get("greeting") == "Hello, world"
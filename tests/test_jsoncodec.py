@@ -0,0 +1,76 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from hotline import jsoncodec
+
+NCCO = [
+    {
+        "action": "talk",
+        "text": "Thank you for calling the Code of Conduct hotline for PyCon ☃.",
+    },
+    {
+        "action": "conversation",
+        "name": "conversation-uuid",
+        "eventMethod": "POST",
+        "musicOnHoldUrl": ["https://example.com/hold.mp3"],
+        "startOnEnter": False,
+        "endOnExit": True,
+    },
+]
+
+EXPECTED_NCCO = (
+    '[{"action":"talk","text":"Thank you for calling the Code of Conduct '
+    'hotline for PyCon ☃."},{"action":"conversation","name":"conversation-uuid",'
+    '"eventMethod":"POST","musicOnHoldUrl":["https://example.com/hold.mp3"],'
+    '"startOnEnter":false,"endOnExit":true}]'
+).encode("utf-8")
+
+
+@pytest.fixture(params=jsoncodec.available_backends())
+def backend(request):
+    previous = jsoncodec.backend
+    jsoncodec.use(request.param)
+    yield request.param
+    jsoncodec.use(previous)
+
+
+def test_dumps_ncco(backend):
+    assert jsoncodec.dumps(NCCO) == EXPECTED_NCCO
+
+
+def test_loads(backend):
+    assert jsoncodec.loads(EXPECTED_NCCO) == NCCO
+    assert jsoncodec.loads(EXPECTED_NCCO.decode("utf-8")) == NCCO
+
+
+def test_loads_invalid(backend):
+    with pytest.raises(ValueError):
+        jsoncodec.loads(b"{")
+
+
+def test_dumps_matches_stdlib(backend):
+    webhook = {"msisdn": "14155550100", "to": "14155550199", "text": "Hi é"}
+
+    assert jsoncodec.dumps(webhook) == json.dumps(
+        webhook, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def test_use_unknown_backend():
+    with pytest.raises(KeyError):
+        jsoncodec.use("simplejson")
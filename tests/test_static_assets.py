@@ -0,0 +1,73 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+
+import flask
+import pytest
+from hotline import static_assets
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask("hotline.app")
+    static_assets.init_app(app)
+    static_assets._fingerprints.clear()
+    return app
+
+
+def test_static_url(app):
+    with open(os.path.join(app.static_folder, "style.css"), "rb") as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()[:12]
+
+    with app.test_request_context("/"):
+        url = static_assets.static_url("style.css")
+
+    assert url == f"/static/style.css?v={digest}"
+
+
+def test_fingerprinted_cache_headers(app):
+    client = app.test_client()
+
+    with app.test_request_context("/"):
+        url = static_assets.static_url("style.css")
+
+    response = client.get(url)
+    response.close()
+
+    assert "immutable" in response.headers["Cache-Control"]
+    assert f"max-age={static_assets.FINGERPRINTED_MAX_AGE}" in (
+        response.headers["Cache-Control"]
+    )
+    assert "Expires" not in response.headers
+
+
+def test_unfingerprinted_cache_headers(app):
+    client = app.test_client()
+
+    response = client.get("/static/style.css")
+    response.close()
+
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+
+
+def test_wrong_fingerprint_cache_headers(app):
+    client = app.test_client()
+
+    response = client.get("/static/style.css?v=abc")
+    response.close()
+
+    assert response.status_code == 200
+    assert "immutable" not in response.headers.get("Cache-Control", "")
@@ -0,0 +1,83 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+from hotline import injector, static_export
+from hotline.app import app
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.pages import webhandlers as pages
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    with db.db:
+        yield db
+
+
+@pytest.fixture
+def export_dir(tmpdir):
+    directory = tmpdir.join("export")
+    injector.set("secrets", {"static_export": {"directory": str(directory)}})
+    pages._rendered_pages.clear()
+    yield directory
+    injector.reset()
+
+
+def create_event(slug="test"):
+    event = db.Event()
+    event.name = "Test event"
+    event.slug = slug
+    event.save()
+
+    return event
+
+
+def test_export_all(database, export_dir):
+    create_event()
+
+    written = static_export.export_all(app, str(export_dir))
+
+    assert "e/test/index.html" in written
+    assert "pages/about/index.html" in written
+    assert "static/style.css" in written
+    assert "Test event" in export_dir.join("e/test/index.html").read()
+
+
+def test_export_all_is_incremental(database, export_dir):
+    event = create_event()
+    static_export.export_all(app, str(export_dir))
+
+    assert static_export.export_all(app, str(export_dir)) == []
+
+    event.name = "Renamed event"
+    event.save()
+
+    assert static_export.export_all(app, str(export_dir)) == ["e/test/index.html"]
+
+
+def test_export_all_removes_stale_pages(database, export_dir):
+    event = create_event()
+    static_export.export_all(app, str(export_dir))
+
+    event.delete_instance()
+    static_export.export_all(app, str(export_dir))
+
+    assert not export_dir.join("e/test/index.html").exists()
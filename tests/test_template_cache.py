@@ -0,0 +1,101 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import tempfile
+from unittest import mock
+
+import flask
+from hotline import template_cache
+from hotline.pages import webhandlers as pages
+
+
+def make_app(directory):
+    app = flask.Flask("hotline.app")
+    app.register_blueprint(pages.blueprint)
+    template_cache.init_app(app, directory=str(directory))
+    return app
+
+
+def test_precompile_fills_cache(tmpdir):
+    app = make_app(tmpdir)
+
+    count = template_cache.precompile(app)
+
+    assert count > 0
+    assert len(tmpdir.listdir()) == count
+
+
+def test_cached_templates_are_not_compiled(tmpdir):
+    template_cache.precompile(make_app(tmpdir))
+
+    app = make_app(tmpdir)
+    with mock.patch.object(
+        app.jinja_env, "compile", wraps=app.jinja_env.compile
+    ) as compile:
+        app.jinja_env.get_template("page.html")
+
+    compile.assert_not_called()
+
+
+def test_corrupt_entry_is_replaced(tmpdir):
+    template_cache.precompile(make_app(tmpdir))
+    for entry in tmpdir.listdir():
+        entry.write_binary(entry.read_binary()[:20])
+
+    app = make_app(tmpdir)
+    app.jinja_env.get_template("page.html")
+
+    sizes = [len(entry.read_binary()) for entry in tmpdir.listdir()]
+    assert len([size for size in sizes if size > 20]) == 1
+
+
+def test_unwritable_cache(tmpdir, caplog):
+    # The cache directory can't be created inside of a file.
+    directory = tmpdir.join("file")
+    directory.write("")
+
+    app = make_app(directory.join("cache"))
+    app.jinja_env.get_template("page.html")
+
+    assert "Unable to write" in caplog.text
+
+
+def test_default_directory_is_private(tmpdir, monkeypatch):
+    # Jinja makes its default directory in the temporary directory.
+    monkeypatch.setattr(tempfile, "tempdir", str(tmpdir))
+    monkeypatch.delenv("TEMPLATE_CACHE_DIR", raising=False)
+
+    app = flask.Flask("hotline.app")
+    template_cache.init_app(app)
+
+    directory = app.jinja_env.bytecode_cache.directory
+    assert os.path.dirname(directory) == str(tmpdir)
+    assert os.stat(directory).st_uid == os.getuid()
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_default_directory_owned_by_another_user(tmpdir, monkeypatch, caplog):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmpdir))
+    monkeypatch.delenv("TEMPLATE_CACHE_DIR", raising=False)
+    tmpdir.mkdir(f"_jinja2-cache-{os.getuid()}")
+
+    app = flask.Flask("hotline.app")
+    # Only the owner can change the directory's permissions.
+    with mock.patch.object(os, "chmod", side_effect=PermissionError):
+        template_cache.init_app(app)
+
+    assert app.jinja_env.bytecode_cache is None
+    assert "Unable to use the template cache" in caplog.text
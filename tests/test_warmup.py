@@ -0,0 +1,96 @@
+# Copyright 2019 Alethea Katherine Flowers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import flask
+import pytest
+from hotline import injector, static_assets, warmup
+from hotline.database import create_tables, highlevel
+from hotline.database import models as db
+from hotline.pages import webhandlers as pages
+from hotline.telephony import lowlevel
+
+
+@pytest.fixture
+def database(tmpdir):
+    db_file = tmpdir.join("database.sqlite")
+    highlevel.initialize_db(database=f"sqlite:///{db_file}")
+
+    create_tables.create_tables()
+
+    with db.db:
+        yield db
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask("hotline.app")
+    static_assets.init_app(app)
+    app.register_blueprint(warmup.blueprint)
+    app.register_blueprint(pages.blueprint)
+    return app
+
+
+@pytest.fixture
+def secrets():
+    injector.set("secrets", {"firebase": {"development_mode": True}})
+    yield
+    injector.reset()
+
+
+def test_preload_compiles_templates(app):
+    with mock.patch.object(pages, "render_all"):
+        with mock.patch.object(app.jinja_env, "get_template") as get_template:
+            warmup.preload(app)
+
+    loaded = [call[1][0] for call in get_template.mock_calls]
+    assert "layout.html" in loaded
+
+
+def test_preload_leaves_client_imports_to_warmup(database, app, secrets):
+    with mock.patch.object(pages, "render_all"):
+        with mock.patch.object(warmup, "_import_lazy_modules") as import_lazy_modules:
+            warmup.preload(app)
+
+            import_lazy_modules.assert_not_called()
+
+            warmup.warmup(app)
+
+            import_lazy_modules.assert_called_once_with()
+
+
+def test_warmup(database, app, secrets):
+    injector.set("nexmo.client", mock.sentinel.nexmo_client)
+
+    with mock.patch.object(highlevel, "prime_organizer_cache") as prime:
+        warmup.warmup(app)
+
+    prime.assert_called_once_with()
+
+
+def test_warmup_tolerates_client_errors(database, app, secrets, caplog):
+    # There's no Nexmo configuration, so the client can't be created.
+    warmup.warmup(app)
+
+    assert "Unable to create the Nexmo client." in caplog.text
+
+
+def test_warmup_preloads_number_metadata_for_used_countries(database, app, secrets):
+    db.Number.create(number="+445555550000", country="GB")
+
+    with mock.patch.object(lowlevel, "preload_number_metadata") as preload:
+        warmup.warmup(app)
+
+    assert preload.mock_calls == [mock.call(["US"]), mock.call({"GB"})]